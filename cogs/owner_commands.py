@@ -1,8 +1,11 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
+import io
 import logging
 from typing import Optional, Dict, List, Any
+from utils.profiler import Profiler
+from utils.snapshots import SnapshotError
 
 logger = logging.getLogger('owner_commands')
 
@@ -40,6 +43,7 @@ class OwnerCommands(commands.Cog):
     
     def __init__(self, bot):
         self.bot = bot
+        self.profiler = Profiler()
     
     def is_owner_or_has_manage_server(self, ctx):
         """Check if the user is the bot owner or has manage server permissions"""
@@ -106,7 +110,7 @@ class OwnerCommands(commands.Cog):
             )
             
             # Add usage information
-            prefix = self.bot.prefixes.get(str(interaction.guild_id), self.bot.default_prefix) if interaction.guild else self.bot.default_prefix
+            prefix = self.bot.get_guild_prefix(interaction.guild_id)
             usage = f"{prefix}{cmd.name}"
             if cmd.signature:
                 usage += f" {cmd.signature}"
@@ -141,7 +145,7 @@ class OwnerCommands(commands.Cog):
             prefix = ctx_or_interaction.prefix
             user = ctx_or_interaction.author
         else:  # discord.Interaction
-            prefix = self.bot.prefixes.get(str(ctx_or_interaction.guild_id), self.bot.default_prefix) if ctx_or_interaction.guild else self.bot.default_prefix
+            prefix = self.bot.get_guild_prefix(ctx_or_interaction.guild_id)
             user = ctx_or_interaction.user
         
         main_page.add_field(
@@ -167,7 +171,19 @@ class OwnerCommands(commands.Cog):
         
         trigger_page.add_field(
             name=f"{prefix}trigger create <name> [content]",
-            value="Create a new trigger with optional text content and/or attachment\n(Requires: Bot Owner or Manage Server)",
+            value="Create a new trigger with optional text content and/or attachment. The content may use `{user}`, `{channel}`, `{guild}` and `{args}`\n(Requires: Bot Owner or Manage Server)",
+            inline=False
+        )
+        
+        trigger_page.add_field(
+            name=f"{prefix}trigger addresponse <name> [weight] [content]",
+            value="Add another response; one is picked at random by weight each time the trigger fires. Remove one with `trigger removeresponse <name> <number>`\n(Requires: Bot Owner or Manage Server)",
+            inline=False
+        )
+        
+        trigger_page.add_field(
+            name=f"{prefix}trigger schedule add <name> <interval> [#channel]",
+            value="Post a trigger every interval, e.g. `daily` or `30m`. See `trigger schedule list` and `trigger schedule remove <id>`\n(Requires: Bot Owner or Manage Server)",
             inline=False
         )
         
@@ -189,6 +205,12 @@ class OwnerCommands(commands.Cog):
             inline=False
         )
         
+        trigger_page.add_field(
+            name=f"{prefix}trigger stats [count]",
+            value="Show the most used and never used triggers\n(Requires: Bot Owner or Manage Server)",
+            inline=False
+        )
+        
         trigger_page.add_field(
             name="Automatic Triggering",
             value="Just type a trigger name in any message and the bot will respond with the trigger content!",
@@ -233,7 +255,7 @@ class OwnerCommands(commands.Cog):
         """Get or set the server prefix"""
         # If no new prefix is provided, show the current prefix
         if new_prefix is None:
-            current_prefix = self.bot.prefixes.get(str(ctx.guild.id), self.bot.default_prefix) if ctx.guild else self.bot.default_prefix
+            current_prefix = self.bot.get_guild_prefix(ctx.guild.id if ctx.guild else None)
             embed = discord.Embed(
                 title="Server Prefix",
                 description=f"The current prefix for this server is: `{current_prefix}`",
@@ -271,7 +293,7 @@ class OwnerCommands(commands.Cog):
         """Slash command to get or set the server prefix"""
         # If no new prefix is provided, show the current prefix
         if new_prefix is None:
-            current_prefix = self.bot.prefixes.get(str(interaction.guild_id), self.bot.default_prefix) if interaction.guild else self.bot.default_prefix
+            current_prefix = self.bot.get_guild_prefix(interaction.guild_id)
             embed = discord.Embed(
                 title="Server Prefix",
                 description=f"The current prefix for this server is: `{current_prefix}`",
@@ -304,6 +326,245 @@ class OwnerCommands(commands.Cog):
         else:
             await interaction.response.send_message("You can't change the prefix in DMs.", ephemeral=True)
 
+    @commands.group(name="profile", invoke_without_command=True)
+    async def profile(self, ctx):
+        """Profile the running bot (owner only)"""
+        await ctx.send(f"Please specify `cpu` or `memory`. Usage: `{ctx.prefix}profile cpu [seconds] [sort]`")
+    
+    @profile.command(name="cpu")
+    async def profile_cpu(self, ctx, seconds: float = 10.0, sort: str = "cumulative"):
+        """Run cProfile on the event loop for a number of seconds and send the report"""
+        # Check if user is authorized (owner only)
+        if ctx.author.id != self.bot.owner_id:
+            await ctx.send("This command is only available to the bot owner.")
+            return
+        
+        if self.profiler.busy:
+            await ctx.send("A profiling session is already running.")
+            return
+        
+        if sort not in ("cumulative", "tottime", "calls", "ncalls"):
+            await ctx.send("Sort must be one of: cumulative, tottime, calls, ncalls.")
+            return
+        
+        seconds = max(1.0, min(seconds, 300.0))
+        await ctx.send(f"Profiling CPU for {seconds:g} seconds...")
+        
+        report = await self.profiler.profile_cpu(seconds, sort=sort)
+        await ctx.send(file=discord.File(io.BytesIO(report.encode('utf-8')), filename="cpu_profile.txt"))
+    
+    @profile.command(name="memory")
+    async def profile_memory(self, ctx, seconds: float = 10.0):
+        """Diff tracemalloc snapshots taken a number of seconds apart and send the report"""
+        # Check if user is authorized (owner only)
+        if ctx.author.id != self.bot.owner_id:
+            await ctx.send("This command is only available to the bot owner.")
+            return
+        
+        if self.profiler.busy:
+            await ctx.send("A profiling session is already running.")
+            return
+        
+        seconds = max(1.0, min(seconds, 300.0))
+        await ctx.send(f"Tracing memory allocations for {seconds:g} seconds...")
+        
+        report = await self.profiler.profile_memory(seconds)
+        await ctx.send(file=discord.File(io.BytesIO(report.encode('utf-8')), filename="memory_profile.txt"))
+
+    @commands.command(name="lag")
+    async def lag(self, ctx):
+        """Show event loop lag percentiles and message routing times (owner only)"""
+        # Check if user is authorized (owner only)
+        if ctx.author.id != self.bot.owner_id:
+            await ctx.send("This command is only available to the bot owner.")
+            return
+        
+        monitor = self.bot.loop_monitor
+        lag = monitor.percentiles()
+        
+        embed = discord.Embed(
+            title="Event Loop Lag",
+            description=f"Over the last {lag['samples']} samples, taken every {monitor.interval:g}s",
+            color=discord.Color.blue()
+        )
+        embed.add_field(name="p50", value=f"{lag['p50']:.1f} ms")
+        embed.add_field(name="p95", value=f"{lag['p95']:.1f} ms")
+        embed.add_field(name="p99", value=f"{lag['p99']:.1f} ms")
+        embed.add_field(name="Max", value=f"{lag['max']:.1f} ms")
+        embed.add_field(name="Stalls", value=f"{monitor.stalls} over {monitor.threshold:g}s")
+        
+        # Guild settings cache effectiveness
+        cache = self.bot.guild_settings
+        embed.add_field(
+            name="Guild cache",
+            value=f"{len(cache)}/{cache.max_size} guilds\n{cache.hits} hits, {cache.misses} misses\n{cache.evictions} evictions"
+        )
+        
+        # Scheduled trigger queue and how late jobs fire
+        scheduler = self.bot.scheduler
+        embed.add_field(
+            name="Scheduler",
+            value=f"{scheduler.depth} queued\n{scheduler.lag.count} fired\nlag avg {scheduler.lag.average * 1000:.0f} ms, max {scheduler.lag.max * 1000:.0f} ms"
+        )
+        
+        # Per-guild trigger queues and how they coped with bursts
+        dispatcher = self.bot.router.dispatcher
+        busiest = ", ".join(f"{guild}: {depth}" for guild, depth in dispatcher.deepest(3)) or "none"
+        embed.add_field(
+            name="Trigger queues",
+            value=f"{dispatcher.depth} queued in {dispatcher.active_guilds} guilds (peak {dispatcher.peak_depth})\n"
+                  f"wait avg {dispatcher.average_wait * 1000:.1f} ms\n{dispatcher.dropped} dropped, {dispatcher.coalesced} coalesced\n"
+                  f"deepest: {busiest}",
+            inline=False
+        )
+        
+        # Slash command run times and how often they had to be deferred
+        for name, timing in self.bot.interaction_timings.commands.items():
+            embed.add_field(
+                name=f"/{name}",
+                value=f"{timing.count} runs, {timing.deferred} deferred\navg {timing.average * 1000:.1f} ms, max {timing.max * 1000:.0f} ms\n{timing.late} answered late"
+            )
+        
+        # Per-branch message routing times
+        for branch, timing in self.bot.router.timings.items():
+            embed.add_field(
+                name=f"Route: {branch}",
+                value=f"{timing.count} msgs\navg {timing.average * 1000:.2f} ms\nmax {timing.max * 1000:.1f} ms"
+            )
+        
+        await ctx.send(embed=embed)
+
+    @commands.command(name="traces")
+    async def traces(self, ctx, count: int = 5):
+        """Show the slowest recently sampled traces, broken down by stage (owner only)"""
+        # Check if user is authorized (owner only)
+        if ctx.author.id != self.bot.owner_id:
+            await ctx.send("This command is only available to the bot owner.")
+            return
+        
+        tracer = self.bot.tracer
+        if tracer.sample_rate <= 0:
+            await ctx.send("Tracing is disabled. Set `trace_sample_rate` in config.json to enable it.")
+            return
+        
+        slowest = tracer.slowest(max(1, min(count, 10)))
+        if not slowest:
+            await ctx.send("No traces sampled yet.")
+            return
+        
+        embed = discord.Embed(
+            title="Slowest Traces",
+            description=f"Out of the last {len(tracer.recent)} sampled at {tracer.sample_rate:.2%}, written to `{tracer.path}`",
+            color=discord.Color.blue()
+        )
+        for trace in slowest:
+            stages = "\n".join(f"{stage}: {duration * 1000:.2f} ms" for stage, duration in trace.stage_totals().items())
+            age = f", received {trace.age * 1000:.0f} ms after sending" if trace.age is not None else ""
+            embed.add_field(
+                name=f"{trace.label}: {trace.duration * 1000:.1f} ms",
+                value=f"<t:{int(trace.wall_time)}:R>{age}\n{stages or 'no stages recorded'}",
+                inline=False
+            )
+        
+        await ctx.send(embed=embed)
+
+    @commands.command(name="links")
+    async def check_links(self, ctx):
+        """Check every stored attachment link now, re-signing expiring ones and flagging dead ones (owner only)"""
+        # Check if user is authorized (owner only)
+        if ctx.author.id != self.bot.owner_id:
+            await ctx.send("This command is only available to the bot owner.")
+            return
+        
+        async with ctx.typing():
+            report = await self.bot.link_health.check_all(force=True)
+        
+        embed = discord.Embed(
+            title="Attachment Link Health",
+            description=f"Checked {report}",
+            color=discord.Color.red() if report.dead else discord.Color.green()
+        )
+        embed.add_field(name="Dead links flagged", value=str(self.bot.link_health.dead_count))
+        
+        await ctx.send(embed=embed)
+
+    @commands.command(name="gc")
+    async def collect_guild_data(self, ctx):
+        """Purge the data of guilds the bot left more than the grace period ago (owner only)"""
+        # Check if user is authorized (owner only)
+        if ctx.author.id != self.bot.owner_id:
+            await ctx.send("This command is only available to the bot owner.")
+            return
+        
+        collector = self.bot.guild_collector
+        report = await collector.collect()
+        
+        embed = discord.Embed(
+            title="Guild Data Collection",
+            description=f"Reclaimed data of {report}",
+            color=discord.Color.green()
+        )
+        embed.add_field(name="Departed guilds in grace period", value=str(collector.pending))
+        embed.add_field(name="Grace period", value=f"{collector.grace_period / 86400:g} days")
+        
+        await ctx.send(embed=embed)
+
+    @commands.group(name="snapshot", invoke_without_command=True)
+    async def snapshot(self, ctx):
+        """Create, list and restore data snapshots (owner only)"""
+        await ctx.send(f"Please specify `create`, `list` or `restore`. Usage: `{ctx.prefix}snapshot restore <name>`")
+    
+    @snapshot.command(name="create")
+    async def snapshot_create(self, ctx):
+        """Take a snapshot of all data files now"""
+        # Check if user is authorized (owner only)
+        if ctx.author.id != self.bot.owner_id:
+            await ctx.send("This command is only available to the bot owner.")
+            return
+        
+        try:
+            name = await self.bot.snapshots.create()
+        except Exception as e:
+            await ctx.send(f"Snapshot failed: {str(e)}")
+            return
+        await ctx.send(f"Snapshot `{name}` created.")
+    
+    @snapshot.command(name="list")
+    async def snapshot_list(self, ctx):
+        """List the stored snapshots, newest first"""
+        # Check if user is authorized (owner only)
+        if ctx.author.id != self.bot.owner_id:
+            await ctx.send("This command is only available to the bot owner.")
+            return
+        
+        snapshots = self.bot.snapshots.list()
+        if not snapshots:
+            await ctx.send("No snapshots found.")
+            return
+        
+        embed = discord.Embed(
+            title="Snapshots",
+            description="\n".join(f"`{name}` ({size / 1024:.1f} KiB)" for name, size, _ in snapshots),
+            color=discord.Color.blue()
+        )
+        embed.set_footer(text=f"Keeping the newest {self.bot.snapshots.keep}")
+        await ctx.send(embed=embed)
+    
+    @snapshot.command(name="restore")
+    async def snapshot_restore(self, ctx, name: str):
+        """Validate a snapshot and swap it in for the live data"""
+        # Check if user is authorized (owner only)
+        if ctx.author.id != self.bot.owner_id:
+            await ctx.send("This command is only available to the bot owner.")
+            return
+        
+        try:
+            safety = await self.bot.snapshots.restore(name)
+        except SnapshotError as e:
+            await ctx.send(f"Restore refused: {str(e)}")
+            return
+        await ctx.send(f"Restored `{name}`. The previous data was saved as `{safety}`.")
+
 async def setup(bot):
     await bot.add_cog(OwnerCommands(bot))
     # Register app commands
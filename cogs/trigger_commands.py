@@ -1,27 +1,68 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-import aiohttp
+from utils.http_client import FetchError
 import io
 import json
 import logging
 import datetime
 import asyncio
-from typing import Optional, List, Dict, Any, Union, Literal
+import re
+from typing import Optional, List, Dict, Any, Union, Literal, Mapping, Tuple
 from utils.db_manager import DatabaseManager
+from utils.trigger_record import TriggerRecord, TriggerResponse, TriggerScope
+from utils.templates import TemplateError, compile_template
+from utils.scheduler import ScheduledJob
+from utils.tracing import span
+from utils.normalize import OPTIONAL_STEPS, STANDARD, Normalizer, get_normalizer
 
 logger = logging.getLogger('trigger_commands')
 
+# Limits for multi-response triggers
+MAX_RESPONSES = 100
+MAX_WEIGHT = 1000
+MAX_SHOWN_RESPONSES = 15
+
+# Most channels or roles in each allow or deny list of a trigger
+MAX_SCOPE_ENTRIES = 100
+SCOPE_ACTIONS = ("allow", "deny", "remove", "clear")
+
+INTERVAL_NAMES = {"hourly": 3600, "daily": 86400, "weekly": 604800}
+INTERVAL_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+INTERVAL_PATTERN = re.compile(r'(\d+)\s*([smhdw])')
+
+def parse_interval(text: str) -> Optional[int]:
+    """Parse an interval such as `daily`, `30m` or `1h30m` into seconds"""
+    text = text.strip().lower()
+    if text in INTERVAL_NAMES:
+        return INTERVAL_NAMES[text]
+    
+    parts = INTERVAL_PATTERN.findall(text)
+    if not parts or INTERVAL_PATTERN.sub('', text).strip():
+        return None
+    return sum(int(amount) * INTERVAL_UNITS[unit] for amount, unit in parts)
+
+def format_interval(seconds: int) -> str:
+    """Format seconds as the largest whole units, e.g. `1h 30m`"""
+    parts = []
+    for unit, size in (("w", 604800), ("d", 86400), ("h", 3600), ("m", 60), ("s", 1)):
+        if seconds >= size:
+            parts.append(f"{seconds // size}{unit}")
+            seconds %= size
+    return " ".join(parts) or "0s"
+
 class TriggerView(discord.ui.View):
     """Pagination view for trigger list command"""
 
-    def __init__(self, triggers: Dict[str, Dict], author_id: int):
+    def __init__(self, triggers: Mapping[str, TriggerRecord], author_id: int):
         super().__init__(timeout=60)
-        self.triggers = list(triggers.items())
+        # Only names are listed up front; records are looked up one page at a time
+        self.triggers = triggers
+        self.names = list(triggers)
         self.author_id = author_id
         self.current_page = 0
         self.items_per_page = 5
-        self.total_pages = max(1, (len(self.triggers) + self.items_per_page - 1) // self.items_per_page)
+        self.total_pages = max(1, (len(self.names) + self.items_per_page - 1) // self.items_per_page)
 
     @discord.ui.button(label="◀️", style=discord.ButtonStyle.primary)
     async def previous_button(self, interaction: discord.Interaction, button: discord.ui.Button):
@@ -44,7 +85,7 @@ class TriggerView(discord.ui.View):
     def get_current_page(self) -> discord.Embed:
         """Get the current page of triggers"""
         start_idx = self.current_page * self.items_per_page
-        end_idx = min(start_idx + self.items_per_page, len(self.triggers))
+        end_idx = min(start_idx + self.items_per_page, len(self.names))
         
         embed = discord.Embed(
             title="Trigger List",
@@ -53,17 +94,20 @@ class TriggerView(discord.ui.View):
             timestamp=datetime.datetime.now()
         )
         
-        if len(self.triggers) == 0:
+        if len(self.names) == 0:
             embed.add_field(name="No triggers found", value="Use the trigger create command to add triggers")
             return embed
         
-        current_triggers = self.triggers[start_idx:end_idx]
-        
-        for name, data in current_triggers:
-            created_at = datetime.datetime.fromtimestamp(data.get('created_at', 0))
-            has_attachment = "Yes" if data.get('attachment_url') else "No"
-            has_content = "Yes" if data.get('content') else "No"
-            creator = data.get('creator_name', 'Unknown')
+        for name in self.names[start_idx:end_idx]:
+            # Skip triggers deleted since the list was opened
+            record = self.triggers.get(name)
+            if record is None:
+                continue
+            
+            created_at = datetime.datetime.fromtimestamp(record.created_at)
+            has_attachment = "Yes" if record.attachment_url else "No"
+            has_content = "Yes" if record.content else "No"
+            creator = record.creator_name or 'Unknown'
             
             embed.add_field(
                 name=name,
@@ -79,17 +123,13 @@ class TriggerCommands(commands.Cog):
     
     def __init__(self, bot):
         self.bot = bot
-        self.db = DatabaseManager()
-        self.session = None
-    
-    async def cog_load(self):
-        """Called when the cog is loaded"""
-        self.session = aiohttp.ClientSession()
+        # Share the bot's manager so hot reloads and writes see the same state
+        self.db: DatabaseManager = bot.db_manager
     
     async def cog_unload(self):
         """Called when the cog is unloaded"""
-        if self.session:
-            await self.session.close()
+        self.bot.router.trigger_handler = None
+        self.bot.scheduler.fire_handler = None
     
     def is_owner_or_has_manage_server(self, ctx):
         """Check if the user is the bot owner or has manage server permissions"""
@@ -122,67 +162,93 @@ class TriggerCommands(commands.Cog):
             await ctx.send("You don't have permission to create triggers. You need to be the bot owner or have 'Manage Server' permission.")
             return
         
-        # Check if trigger already exists
-        if self.db.trigger_exists(name):
-            await ctx.send(f"A trigger with the name `{name}` already exists.")
-            return
-        
-        # Process attachment if provided
-        attachment_url = None
-        if ctx.message.attachments:
-            attachment = ctx.message.attachments[0]
-            try:
-                # Download attachment
-                attachment_bytes = await attachment.read()
-                
-                # Store the URL directly (Discord CDN URLs are persistent)
-                attachment_url = attachment.url
-                
-                logger.info(f"Attachment processed for trigger {name}: {attachment_url}")
-            except Exception as e:
-                logger.error(f"Error processing attachment: {str(e)}")
-                await ctx.send(f"Error processing attachment: {str(e)}")
+        # Hold the name's writer lock from the check to the write, across any awaits
+        async with self.db.trigger_lock(name):
+            # Check if trigger already exists
+            if self.db.trigger_exists(name):
+                await ctx.send(f"A trigger with the name `{name}` already exists.")
                 return
-        
-        # Validate that at least content or attachment is provided
-        if not content and not attachment_url:
-            await ctx.send("You must provide either text content or an attachment for the trigger.")
-            return
-        
-        # Create trigger data
-        trigger_data = {
-            "creator_id": ctx.author.id,
-            "creator_name": str(ctx.author),
-            "created_at": datetime.datetime.now().timestamp(),
-            "guild_id": ctx.guild.id if ctx.guild else None,
-            "attachment_url": attachment_url,
-            "content": content
-        }
-        
-        # Save trigger to database
-        success = self.db.add_trigger(name, trigger_data)
-        
-        if success:
-            embed = discord.Embed(
-                title="Trigger Created",
-                description=f"Trigger `{name}` has been created successfully.",
-                color=discord.Color.green()
+            
+            # Check if another trigger would match the same messages
+            collision = self.db.find_collision(name)
+            if collision is not None:
+                await ctx.send(f"`{name}` would match the same messages as the existing trigger `{collision}`.")
+                return
+            
+            # Process attachment if provided
+            attachment_url = None
+            if ctx.message.attachments:
+                attachment = ctx.message.attachments[0]
+                fetcher = self.bot.fetcher
+                if attachment.size > fetcher.max_bytes:
+                    await ctx.send(f"Attachments can be at most {fetcher.max_bytes / 2**20:.1f} MiB.")
+                    return
+                try:
+                    # Make sure the attachment can be downloaded through the shared, bounded client
+                    await fetcher.fetch(attachment.url)
+                    
+                    # Store the URL; the link health check re-signs it before it expires
+                    attachment_url = attachment.url
+                    
+                    logger.info(f"Attachment processed for trigger {name}: {attachment_url}")
+                except FetchError as e:
+                    logger.error(f"Error processing attachment: {str(e)}")
+                    await ctx.send(f"Error processing attachment: {str(e)}")
+                    return
+            
+            # Validate that at least content or attachment is provided
+            if not content and not attachment_url:
+                await ctx.send("You must provide either text content or an attachment for the trigger.")
+                return
+            
+            # Validate the placeholders in the content
+            if content:
+                try:
+                    compile_template(content, strict=True)
+                except TemplateError as e:
+                    await ctx.send(f"Invalid trigger content: {str(e)}")
+                    return
+            
+            # Create trigger data
+            trigger_record = TriggerRecord(
+                creator_id=ctx.author.id,
+                creator_name=str(ctx.author),
+                created_at=int(datetime.datetime.now().timestamp()),
+                guild_id=ctx.guild.id if ctx.guild else None,
+                attachment_url=attachment_url,
+                content=content
             )
-            embed.add_field(name="Created by", value=str(ctx.author))
-            embed.add_field(name="Has attachment", value="Yes" if attachment_url else "No")
-            embed.add_field(name="Has content", value="Yes" if content else "No")
             
-            await ctx.send(embed=embed)
-        else:
-            await ctx.send("Error creating trigger. Please try again later.")
+            # Save trigger to database
+            success = self.db.add_trigger(name, trigger_record)
+            
+            if success:
+                embed = discord.Embed(
+                    title="Trigger Created",
+                    description=f"Trigger `{name}` has been created successfully.",
+                    color=discord.Color.green()
+                )
+                embed.add_field(name="Created by", value=str(ctx.author))
+                embed.add_field(name="Has attachment", value="Yes" if attachment_url else "No")
+                embed.add_field(name="Has content", value="Yes" if content else "No")
+                
+                await ctx.send(embed=embed)
+            elif self.db.trigger_exists(name):
+                # Created by a path that does not take the lock, e.g. a hot reload of the file
+                await ctx.send(f"A trigger with the name `{name}` already exists.")
+            else:
+                await ctx.send("Error creating trigger. Please try again later.")
     
     @app_commands.command(name="create", description="Create a new trigger with optional content and attachment")
     @app_commands.describe(
         name="The name of the trigger to create",
         content="Text content for the trigger (optional)",
-        attachment="Optional attachment for the trigger"
+        attachment="Optional attachment for the trigger",
+        channel="Only fire in this channel (more can be added with scope)",
+        role="Only fire for members with this role (more can be added with scope)"
     )
-    async def slash_trigger_create(self, interaction: discord.Interaction, name: str, content: Optional[str] = None, attachment: Optional[discord.Attachment] = None):
+    async def slash_trigger_create(self, interaction: discord.Interaction, name: str, content: Optional[str] = None, attachment: Optional[discord.Attachment] = None,
+                                   channel: Optional[discord.abc.GuildChannel] = None, role: Optional[discord.Role] = None):
         """Slash command to create a new trigger"""
         # Check if user is authorized (owner or has manage guild permission)
         if not (interaction.user.id == self.bot.owner_id or 
@@ -190,114 +256,77 @@ class TriggerCommands(commands.Cog):
             await interaction.response.send_message("You don't have permission to create triggers. You need to be the bot owner or have 'Manage Server' permission.", ephemeral=True)
             return
         
-        # Check if trigger already exists
-        if self.db.trigger_exists(name):
-            await interaction.response.send_message(f"A trigger with the name `{name}` already exists.", ephemeral=True)
-            return
-        
-        # Process attachment if provided
-        attachment_url = None
-        if attachment:
-            try:
-                # Store the URL directly (Discord CDN URLs are persistent)
-                attachment_url = attachment.url
-                
-                logger.info(f"Attachment processed for trigger {name}: {attachment_url}")
-            except Exception as e:
-                logger.error(f"Error processing attachment: {str(e)}")
-                await interaction.response.send_message(f"Error processing attachment: {str(e)}", ephemeral=True)
+        # Hold the name's writer lock from the check to the write, across any awaits
+        async with self.db.trigger_lock(name):
+            # Check if trigger already exists
+            if self.db.trigger_exists(name):
+                await interaction.response.send_message(f"A trigger with the name `{name}` already exists.", ephemeral=True)
                 return
-        
-        # Validate that at least content or attachment is provided
-        if not content and not attachment_url:
-            await interaction.response.send_message("You must provide either text content or an attachment for the trigger.", ephemeral=True)
-            return
-        
-        # Create trigger data
-        trigger_data = {
-            "creator_id": interaction.user.id,
-            "creator_name": str(interaction.user),
-            "created_at": datetime.datetime.now().timestamp(),
-            "guild_id": interaction.guild.id if interaction.guild else None,
-            "attachment_url": attachment_url,
-            "content": content
-        }
-        
-        # Save trigger to database
-        success = self.db.add_trigger(name, trigger_data)
-        
-        if success:
-            embed = discord.Embed(
-                title="Trigger Created",
-                description=f"Trigger `{name}` has been created successfully.",
-                color=discord.Color.green()
-            )
-            embed.add_field(name="Created by", value=str(interaction.user))
-            embed.add_field(name="Has attachment", value="Yes" if attachment_url else "No")
-            embed.add_field(name="Has content", value="Yes" if content else "No")
             
-            await interaction.response.send_message(embed=embed)
-        else:
-            await interaction.response.send_message("Error creating trigger. Please try again later.", ephemeral=True)
-    
-    @app_commands.command(name="create", description="Create a new trigger with optional content and attachment")
-    @app_commands.describe(
-        name="The name of the trigger to create",
-        content="Text content for the trigger",
-        attachment="Optional attachment for the trigger"
-    )
-    async def slash_trigger_create(self, interaction: discord.Interaction, name: str, content: Optional[str] = None, attachment: Optional[discord.Attachment] = None):
-        """Slash command to create a new trigger"""
-        # Check if user is authorized (owner or has manage guild permission)
-        if not (interaction.user.id == self.bot.owner_id or 
-                (interaction.guild and interaction.user.guild_permissions.manage_guild)):
-            await interaction.response.send_message("You don't have permission to create triggers. You need to be the bot owner or have 'Manage Server' permission.", ephemeral=True)
-            return
-        
-        # Check if trigger already exists
-        if self.db.trigger_exists(name):
-            await interaction.response.send_message(f"A trigger with the name `{name}` already exists.", ephemeral=True)
-            return
-        
-        # Process attachment if provided
-        attachment_url = None
-        if attachment:
-            try:
-                # Store the URL directly (Discord CDN URLs are persistent)
-                attachment_url = attachment.url
-                
-                logger.info(f"Attachment processed for trigger {name}: {attachment_url}")
-            except Exception as e:
-                logger.error(f"Error processing attachment: {str(e)}")
-                await interaction.response.send_message(f"Error processing attachment: {str(e)}", ephemeral=True)
+            # Check if another trigger would match the same messages
+            collision = self.db.find_collision(name)
+            if collision is not None:
+                await interaction.response.send_message(f"`{name}` would match the same messages as the existing trigger `{collision}`.", ephemeral=True)
                 return
-        
-        # Create trigger data
-        trigger_data = {
-            "creator_id": interaction.user.id,
-            "creator_name": str(interaction.user),
-            "created_at": datetime.datetime.now().timestamp(),
-            "guild_id": interaction.guild.id if interaction.guild else None,
-            "attachment_url": attachment_url,
-            "content": content
-        }
-        
-        # Save trigger to database
-        success = self.db.add_trigger(name, trigger_data)
-        
-        if success:
-            embed = discord.Embed(
-                title="Trigger Created",
-                description=f"Trigger `{name}` has been created successfully.",
-                color=discord.Color.green()
+            
+            # Process attachment if provided
+            attachment_url = None
+            if attachment:
+                if attachment.size > self.bot.fetcher.max_bytes:
+                    await interaction.response.send_message(f"Attachments can be at most {self.bot.fetcher.max_bytes / 2**20:.1f} MiB.", ephemeral=True)
+                    return
+                try:
+                    # Store the URL directly (Discord CDN URLs are persistent)
+                    attachment_url = attachment.url
+                    
+                    logger.info(f"Attachment processed for trigger {name}: {attachment_url}")
+                except Exception as e:
+                    logger.error(f"Error processing attachment: {str(e)}")
+                    await interaction.response.send_message(f"Error processing attachment: {str(e)}", ephemeral=True)
+                    return
+            
+            # Validate that at least content or attachment is provided
+            if not content and not attachment_url:
+                await interaction.response.send_message("You must provide either text content or an attachment for the trigger.", ephemeral=True)
+                return
+            
+            # Validate the placeholders in the content
+            if content:
+                try:
+                    compile_template(content, strict=True)
+                except TemplateError as e:
+                    await interaction.response.send_message(f"Invalid trigger content: {str(e)}", ephemeral=True)
+                    return
+            
+            # Create trigger data
+            trigger_record = TriggerRecord(
+                creator_id=interaction.user.id,
+                creator_name=str(interaction.user),
+                created_at=int(datetime.datetime.now().timestamp()),
+                guild_id=interaction.guild.id if interaction.guild else None,
+                attachment_url=attachment_url,
+                content=content,
+                scope=TriggerScope(allow_channels=[channel.id] if channel else (), allow_roles=[role.id] if role else ())
             )
-            embed.add_field(name="Created by", value=str(interaction.user))
-            embed.add_field(name="Has attachment", value="Yes" if attachment_url else "No")
-            embed.add_field(name="Has content", value="Yes" if content else "No")
             
-            await interaction.response.send_message(embed=embed)
-        else:
-            await interaction.response.send_message("Error creating trigger. Please try again later.", ephemeral=True)
+            # Save trigger to database
+            success = self.db.add_trigger(name, trigger_record)
+            
+            if success:
+                embed = discord.Embed(
+                    title="Trigger Created",
+                    description=f"Trigger `{name}` has been created successfully.",
+                    color=discord.Color.green()
+                )
+                embed.add_field(name="Created by", value=str(interaction.user))
+                embed.add_field(name="Has attachment", value="Yes" if attachment_url else "No")
+                embed.add_field(name="Has content", value="Yes" if content else "No")
+                
+                await interaction.response.send_message(embed=embed)
+            elif self.db.trigger_exists(name):
+                await interaction.response.send_message(f"A trigger with the name `{name}` already exists.", ephemeral=True)
+            else:
+                await interaction.response.send_message("Error creating trigger. Please try again later.", ephemeral=True)
     
     @trigger.command(name="delete")
     async def trigger_delete(self, ctx, name: Optional[str] = None):
@@ -328,6 +357,7 @@ class TriggerCommands(commands.Cog):
         success = self.db.delete_trigger(name)
         
         if success:
+            self.bot.trigger_stats.forget(name)
             await ctx.send(f"Trigger `{name}` has been deleted successfully.")
         else:
             await ctx.send("Error deleting trigger. Please try again later.")
@@ -341,37 +371,42 @@ class TriggerCommands(commands.Cog):
             await interaction.response.send_message("This command is only available to the bot owner.", ephemeral=True)
             return
         
-        # If no name is provided, list all triggers
-        if name is None:
-            triggers = self.db.get_all_triggers()
-            if not triggers:
-                await interaction.response.send_message("There are no triggers to delete.", ephemeral=True)
+        # Defer if the work below runs past the response budget
+        async with self.bot.interaction_timings.responder(interaction) as responder:
+            # If no name is provided, list all triggers
+            if name is None:
+                triggers = self.db.get_all_triggers()
+                if not triggers:
+                    await responder.send("There are no triggers to delete.", ephemeral=True)
+                    return
+                
+                # Show triggers with a paginated view
+                await responder.checkpoint()
+                view = TriggerView(triggers, interaction.user.id)
+                await responder.send(embed=view.get_current_page(), view=view)
                 return
             
-            # Show triggers with a paginated view
-            view = TriggerView(triggers, interaction.user.id)
-            await interaction.response.send_message(embed=view.get_current_page(), view=view)
-            return
-        
-        # Check if trigger exists
-        if not self.db.trigger_exists(name):
-            await interaction.response.send_message(f"No trigger found with the name `{name}`.", ephemeral=True)
-            return
-        
-        # Delete the trigger
-        success = self.db.delete_trigger(name)
-        
-        if success:
-            await interaction.response.send_message(f"Trigger `{name}` has been deleted successfully.")
-        else:
-            await interaction.response.send_message("Error deleting trigger. Please try again later.", ephemeral=True)
+            # Check if trigger exists
+            if not self.db.trigger_exists(name):
+                await responder.send(f"No trigger found with the name `{name}`.", ephemeral=True)
+                return
+            
+            # Delete the trigger
+            await responder.checkpoint()
+            success = self.db.delete_trigger(name)
+            
+            if success:
+                self.bot.trigger_stats.forget(name)
+                await responder.send(f"Trigger `{name}` has been deleted successfully.")
+            else:
+                await responder.send("Error deleting trigger. Please try again later.", ephemeral=True)
     
     @trigger.command(name="get")
     async def trigger_get(self, ctx, name: str):
         """Get information about a specific trigger"""
         # Check if trigger exists
-        trigger_data = self.db.get_trigger(name)
-        if not trigger_data:
+        trigger_record = self.db.get_trigger(name)
+        if not trigger_record:
             await ctx.send(f"No trigger found with the name `{name}`.")
             return
         
@@ -380,29 +415,36 @@ class TriggerCommands(commands.Cog):
             title=f"Trigger: {name}",
             description="Trigger information",
             color=discord.Color.blue(),
-            timestamp=datetime.datetime.fromtimestamp(trigger_data.get('created_at', 0))
+            timestamp=datetime.datetime.fromtimestamp(trigger_record.created_at)
         )
         
         # Add fields to embed
-        embed.add_field(name="Created by", value=trigger_data.get('creator_name', 'Unknown'))
+        embed.add_field(name="Created by", value=trigger_record.creator_name or 'Unknown')
         
         # Format creation time
-        created_time = datetime.datetime.fromtimestamp(trigger_data.get('created_at', 0))
+        created_time = datetime.datetime.fromtimestamp(trigger_record.created_at)
         embed.add_field(name="Created at", value=created_time.strftime('%Y-%m-%d %H:%M:%S'))
         
         # Add guild information if available
-        if trigger_data.get('guild_id'):
-            guild = self.bot.get_guild(trigger_data['guild_id'])
+        if trigger_record.guild_id:
+            guild = self.bot.get_guild(trigger_record.guild_id)
             embed.add_field(name="Server", value=guild.name if guild else "Unknown")
         
         # Add content information if available
-        if trigger_data.get('content'):
-            embed.add_field(name="Content", value=trigger_data['content'], inline=False)
+        if trigger_record.responses:
+            self.add_response_fields(embed, name, trigger_record)
+        elif trigger_record.content:
+            embed.add_field(name="Content", value=trigger_record.content, inline=False)
+        
+        # Add the channels and roles it is limited to
+        if trigger_record.scope:
+            embed.add_field(name="Scope", value=self.describe_scope(trigger_record.scope), inline=False)
         
         # Add attachment information if available
-        if trigger_data.get('attachment_url'):
-            embed.add_field(name="Attachment", value="Yes")
-            embed.set_image(url=trigger_data['attachment_url'])
+        if trigger_record.attachment_url:
+            dead = self.bot.link_health.is_dead(trigger_record.attachment_url)
+            embed.add_field(name="Attachment", value="Yes (broken link, not posted)" if dead else "Yes")
+            embed.set_image(url=trigger_record.attachment_url)
         else:
             embed.add_field(name="Attachment", value="No")
         
@@ -413,45 +455,500 @@ class TriggerCommands(commands.Cog):
     @app_commands.describe(name="The name of the trigger to get information about")
     async def slash_trigger_get(self, interaction: discord.Interaction, name: str):
         """Slash command to get information about a specific trigger"""
-        # Check if trigger exists
-        trigger_data = self.db.get_trigger(name)
-        if not trigger_data:
-            await interaction.response.send_message(f"No trigger found with the name `{name}`.", ephemeral=True)
+        # Defer if the work below runs past the response budget
+        async with self.bot.interaction_timings.responder(interaction) as responder:
+            # Check if trigger exists; this only consults the index
+            if not self.db.trigger_exists(name):
+                await responder.send(f"No trigger found with the name `{name}`.", ephemeral=True)
+                return
+            
+            # Compact storage decodes the record here and its responses may need compiling
+            await responder.checkpoint()
+            trigger_record = self.db.get_trigger(name)
+            
+            # Create embed with trigger information
+            embed = discord.Embed(
+                title=f"Trigger: {name}",
+                description="Trigger information",
+                color=discord.Color.blue(),
+                timestamp=datetime.datetime.fromtimestamp(trigger_record.created_at)
+            )
+            
+            # Add fields to embed
+            embed.add_field(name="Created by", value=trigger_record.creator_name or 'Unknown')
+            
+            # Format creation time
+            created_time = datetime.datetime.fromtimestamp(trigger_record.created_at)
+            embed.add_field(name="Created at", value=created_time.strftime('%Y-%m-%d %H:%M:%S'))
+            
+            # Add guild information if available
+            if trigger_record.guild_id:
+                guild = self.bot.get_guild(trigger_record.guild_id)
+                embed.add_field(name="Server", value=guild.name if guild else "Unknown")
+            
+            # Add content information if available
+            if trigger_record.responses:
+                self.add_response_fields(embed, name, trigger_record)
+            elif trigger_record.content:
+                embed.add_field(name="Content", value=trigger_record.content, inline=False)
+            
+            # Add the channels and roles it is limited to
+            if trigger_record.scope:
+                embed.add_field(name="Scope", value=self.describe_scope(trigger_record.scope), inline=False)
+            
+            # Add attachment information if available
+            if trigger_record.attachment_url:
+                dead = self.bot.link_health.is_dead(trigger_record.attachment_url)
+                embed.add_field(name="Attachment", value="Yes (broken link, not posted)" if dead else "Yes")
+                embed.set_image(url=trigger_record.attachment_url)
+            else:
+                embed.add_field(name="Attachment", value="No")
+            
+            # Send the embed
+            await responder.send(embed=embed)
+    
+    def add_response_fields(self, embed: discord.Embed, name: str, trigger_record: TriggerRecord):
+        """Add one field per response of a multi-response trigger, with its chance of being picked"""
+        responses = trigger_record.all_responses()
+        chances = self.db.get_picker(name, trigger_record).chances()
+        
+        # Embeds hold at most 25 fields and a few are already used
+        for number, (response, chance) in enumerate(zip(responses[:MAX_SHOWN_RESPONSES], chances), start=1):
+            value = response.content or ''
+            if response.attachment_url:
+                value = f"{value}\n[Attachment]({response.attachment_url})".strip()
+            embed.add_field(
+                name=f"Response {number} (weight {response.weight}, {chance:.0%})",
+                value=value[:1024],
+                inline=False
+            )
+        
+        if len(responses) > MAX_SHOWN_RESPONSES:
+            embed.add_field(name="More responses", value=f"{len(responses) - MAX_SHOWN_RESPONSES} more not shown", inline=False)
+    
+    def add_response(self, name: str, content: Optional[str], attachment_url: Optional[str], weight: int) -> Tuple[bool, str]:
+        """Append a weighted response to a trigger; returns whether it worked and a message for the user"""
+        if not 1 <= weight <= MAX_WEIGHT:
+            return False, f"The weight must be between 1 and {MAX_WEIGHT}."
+        
+        if not content and not attachment_url:
+            return False, "You must provide either text content or an attachment for the response."
+        
+        if content:
+            try:
+                compile_template(content, strict=True)
+            except TemplateError as e:
+                return False, f"Invalid response content: {str(e)}"
+        
+        trigger_record = self.db.get_trigger(name)
+        if not trigger_record:
+            return False, f"No trigger found with the name `{name}`."
+        
+        responses = trigger_record.all_responses()
+        if len(responses) >= MAX_RESPONSES:
+            return False, f"A trigger can have at most {MAX_RESPONSES} responses."
+        
+        responses += (TriggerResponse(content, attachment_url, weight),)
+        
+        # Refuse to overwrite a change made since the record was read
+        if not self.db.update_trigger(name, TriggerRecord.response_fields(responses), expected_version=trigger_record.version):
+            return False, "The trigger was changed at the same time. Please try again."
+        return True, f"Added response {len(responses)} to `{name}` with weight {weight}."
+    
+    def remove_response(self, name: str, number: int) -> Tuple[bool, str]:
+        """Remove a response from a trigger by its 1-based number"""
+        trigger_record = self.db.get_trigger(name)
+        if not trigger_record:
+            return False, f"No trigger found with the name `{name}`."
+        
+        responses = trigger_record.all_responses()
+        if len(responses) == 1:
+            return False, "A trigger needs at least one response. Delete the trigger instead."
+        if not 1 <= number <= len(responses):
+            return False, f"`{name}` has responses 1 to {len(responses)}."
+        
+        responses = responses[:number - 1] + responses[number:]
+        if not self.db.update_trigger(name, TriggerRecord.response_fields(responses), expected_version=trigger_record.version):
+            return False, "The trigger was changed at the same time. Please try again."
+        return True, f"Removed response {number} from `{name}`."
+    
+    @trigger.command(name="addresponse")
+    async def trigger_add_response(self, ctx, name: str, weight: Optional[int] = 1, *, content: Optional[str] = None):
+        """Add another response to a trigger; one response is picked at random by weight each time it fires
+        
+        Usage:
+        - !trigger addresponse name Another text response
+        - !trigger addresponse name 3 A response picked three times as often
+        """
+        # Check if user is authorized (owner or has manage guild permission)
+        if not self.is_owner_or_has_manage_server(ctx):
+            await ctx.send("You don't have permission to edit triggers. You need to be the bot owner or have 'Manage Server' permission.")
             return
         
-        # Create embed with trigger information
+        attachment_url = ctx.message.attachments[0].url if ctx.message.attachments else None
+        async with self.db.trigger_lock(name):
+            success, reply = self.add_response(name, content, attachment_url, weight)
+        await ctx.send(reply)
+    
+    @app_commands.command(name="addresponse", description="Add another weighted response to a trigger")
+    @app_commands.describe(
+        name="The name of the trigger",
+        content="Text content for the response (optional)",
+        weight="How likely this response is relative to the others (default 1)",
+        attachment="Optional attachment for the response"
+    )
+    async def slash_trigger_add_response(self, interaction: discord.Interaction, name: str, content: Optional[str] = None, weight: int = 1, attachment: Optional[discord.Attachment] = None):
+        """Slash command to add a response to a trigger"""
+        # Check if user is authorized (owner or has manage guild permission)
+        if not (interaction.user.id == self.bot.owner_id or 
+                (interaction.guild and interaction.user.guild_permissions.manage_guild)):
+            await interaction.response.send_message("You don't have permission to edit triggers. You need to be the bot owner or have 'Manage Server' permission.", ephemeral=True)
+            return
+        
+        async with self.db.trigger_lock(name):
+            success, reply = self.add_response(name, content, attachment.url if attachment else None, weight)
+        await interaction.response.send_message(reply, ephemeral=not success)
+    
+    @trigger.command(name="removeresponse")
+    async def trigger_remove_response(self, ctx, name: str, number: int):
+        """Remove a response from a trigger by its number in trigger get"""
+        # Check if user is authorized (owner or has manage guild permission)
+        if not self.is_owner_or_has_manage_server(ctx):
+            await ctx.send("You don't have permission to edit triggers. You need to be the bot owner or have 'Manage Server' permission.")
+            return
+        
+        async with self.db.trigger_lock(name):
+            success, reply = self.remove_response(name, number)
+        await ctx.send(reply)
+    
+    @app_commands.command(name="removeresponse", description="Remove a response from a trigger")
+    @app_commands.describe(
+        name="The name of the trigger",
+        number="The number of the response, as shown by get"
+    )
+    async def slash_trigger_remove_response(self, interaction: discord.Interaction, name: str, number: int):
+        """Slash command to remove a response from a trigger"""
+        # Check if user is authorized (owner or has manage guild permission)
+        if not (interaction.user.id == self.bot.owner_id or 
+                (interaction.guild and interaction.user.guild_permissions.manage_guild)):
+            await interaction.response.send_message("You don't have permission to edit triggers. You need to be the bot owner or have 'Manage Server' permission.", ephemeral=True)
+            return
+        
+        async with self.db.trigger_lock(name):
+            success, reply = self.remove_response(name, number)
+        await interaction.response.send_message(reply, ephemeral=not success)
+    
+    @staticmethod
+    def describe_scope(scope: Optional[TriggerScope]) -> str:
+        """List the channels and roles a trigger is limited to"""
+        if not scope:
+            return "Fires in every channel, for everyone."
+        
+        lines = []
+        for label, ids, mention in (("Only in", scope.allow_channels, "<#{}>"), ("Never in", scope.deny_channels, "<#{}>"),
+                                    ("Only for", scope.allow_roles, "<@&{}>"), ("Never for", scope.deny_roles, "<@&{}>")):
+            if ids:
+                lines.append(f"{label}: {', '.join(mention.format(value) for value in sorted(ids))}")
+        return "\n".join(lines)[:1024]
+    
+    def scope_trigger(self, guild, name: str, action: str, channels: List[Any], roles: List[discord.Role]) -> Tuple[bool, str]:
+        """Allow, deny or stop limiting a trigger to some channels and roles; returns whether it worked and a message"""
+        if guild is None:
+            return False, "Triggers can only be scoped in a server."
+        
+        action = action.lower()
+        if action not in SCOPE_ACTIONS:
+            return False, f"Unknown action `{action}`. Use {', '.join(f'`{value}`' for value in SCOPE_ACTIONS)}."
+        if action != "clear" and not channels and not roles:
+            return False, "Name at least one channel or role."
+        if any(target.guild.id != guild.id for target in channels + roles):
+            return False, "The channels and roles must be in this server."
+        
+        trigger_record = self.db.get_trigger(name)
+        if not trigger_record:
+            return False, f"No trigger found with the name `{name}`."
+        
+        scope = trigger_record.scope or TriggerScope()
+        channel_ids = {channel.id for channel in channels}
+        role_ids = {role.id for role in roles}
+        if action == "clear":
+            scope = None
+        elif action == "allow":
+            scope = scope.replace(allow_channels=scope.allow_channels | channel_ids, deny_channels=scope.deny_channels - channel_ids,
+                                  allow_roles=scope.allow_roles | role_ids, deny_roles=scope.deny_roles - role_ids)
+        elif action == "deny":
+            scope = scope.replace(allow_channels=scope.allow_channels - channel_ids, deny_channels=scope.deny_channels | channel_ids,
+                                  allow_roles=scope.allow_roles - role_ids, deny_roles=scope.deny_roles | role_ids)
+        else:
+            scope = scope.replace(allow_channels=scope.allow_channels - channel_ids, deny_channels=scope.deny_channels - channel_ids,
+                                  allow_roles=scope.allow_roles - role_ids, deny_roles=scope.deny_roles - role_ids)
+        
+        if scope and any(len(getattr(scope, field)) > MAX_SCOPE_ENTRIES for field in TriggerScope.FIELDS):
+            return False, f"Each allow or deny list can hold at most {MAX_SCOPE_ENTRIES} channels or roles."
+        
+        # Refuse to overwrite a change made since the record was read
+        if not self.db.update_trigger(name, {"scope": scope}, expected_version=trigger_record.version):
+            return False, "The trigger was changed at the same time. Please try again."
+        return True, f"Updated the scope of `{name}`.\n{self.describe_scope(scope)}"
+    
+    @trigger.command(name="scope")
+    async def trigger_scope(self, ctx, name: str, action: Optional[str] = None, *targets: Union[discord.abc.GuildChannel, discord.Role]):
+        """Show or change the channels and roles a trigger fires for
+        
+        Usage:
+        - !trigger scope name (shows the scope)
+        - !trigger scope name allow #channel @role (only fire there or for them)
+        - !trigger scope name deny #channel @role (never fire there or for them)
+        - !trigger scope name remove #channel @role
+        - !trigger scope name clear
+        """
+        if action is None:
+            trigger_record = self.db.get_trigger(name)
+            if not trigger_record:
+                await ctx.send(f"No trigger found with the name `{name}`.")
+                return
+            await ctx.send(self.describe_scope(trigger_record.scope), allowed_mentions=discord.AllowedMentions.none())
+            return
+        
+        # Check if user is authorized (owner or has manage guild permission)
+        if not self.is_owner_or_has_manage_server(ctx):
+            await ctx.send("You don't have permission to edit triggers. You need to be the bot owner or have 'Manage Server' permission.")
+            return
+        
+        channels = [target for target in targets if not isinstance(target, discord.Role)]
+        roles = [target for target in targets if isinstance(target, discord.Role)]
+        async with self.db.trigger_lock(name):
+            success, reply = self.scope_trigger(ctx.guild, name, action, channels, roles)
+        await ctx.send(reply, allowed_mentions=discord.AllowedMentions.none())
+    
+    @app_commands.command(name="scope", description="Show or change the channels and roles a trigger fires for")
+    @app_commands.describe(
+        name="The name of the trigger",
+        action="allow: only fire there or for them; deny: never; remove: drop from both lists; clear: fire everywhere",
+        channel="The channel to allow, deny or remove",
+        role="The role to allow, deny or remove"
+    )
+    async def slash_trigger_scope(self, interaction: discord.Interaction, name: str,
+                                  action: Optional[Literal["allow", "deny", "remove", "clear"]] = None,
+                                  channel: Optional[discord.abc.GuildChannel] = None, role: Optional[discord.Role] = None):
+        """Slash command to show or change a trigger's scope"""
+        if action is None:
+            trigger_record = self.db.get_trigger(name)
+            if not trigger_record:
+                await interaction.response.send_message(f"No trigger found with the name `{name}`.", ephemeral=True)
+                return
+            await interaction.response.send_message(self.describe_scope(trigger_record.scope), ephemeral=True)
+            return
+        
+        # Check if user is authorized (owner or has manage guild permission)
+        if not (interaction.user.id == self.bot.owner_id or 
+                (interaction.guild and interaction.user.guild_permissions.manage_guild)):
+            await interaction.response.send_message("You don't have permission to edit triggers. You need to be the bot owner or have 'Manage Server' permission.", ephemeral=True)
+            return
+        
+        async with self.db.trigger_lock(name):
+            success, reply = self.scope_trigger(interaction.guild, name, action, [channel] if channel else [], [role] if role else [])
+        await interaction.response.send_message(reply, ephemeral=not success, allowed_mentions=discord.AllowedMentions.none())
+    
+    def schedule_trigger(self, guild, channel, name: str, interval: str, user_id: int) -> Tuple[bool, str]:
+        """Schedule a trigger in a channel; returns whether it worked and a message for the user"""
+        if guild is None:
+            return False, "Schedules can only be created in a server."
+        if channel.guild.id != guild.id:
+            return False, "The channel must be in this server."
+        if not self.db.trigger_exists(name):
+            return False, f"No trigger found with the name `{name}`."
+        
+        seconds = parse_interval(interval)
+        if seconds is None:
+            return False, "Invalid interval. Use `hourly`, `daily`, `weekly` or a duration such as `30m` or `1h30m`."
+        
+        try:
+            job = self.bot.scheduler.add(name, guild.id, channel.id, seconds, created_by=user_id)
+        except ValueError as e:
+            return False, f"{str(e)}."
+        return True, f"Schedule `{job.job_id}` will post `{name}` in {channel.mention} every {format_interval(seconds)}, starting <t:{job.next_run}:R>."
+    
+    def build_schedule_embed(self, guild_id: int) -> discord.Embed:
+        """Build the list of a server's schedules"""
+        scheduler = self.bot.scheduler
+        jobs = scheduler.for_guild(guild_id)
+        
         embed = discord.Embed(
-            title=f"Trigger: {name}",
-            description="Trigger information",
-            color=discord.Color.blue(),
-            timestamp=datetime.datetime.fromtimestamp(trigger_data.get('created_at', 0))
+            title="Scheduled Triggers",
+            description=f"{len(jobs)}/{scheduler.max_per_guild} schedules in this server",
+            color=discord.Color.blue()
         )
+        for job in jobs[:25]:
+            embed.add_field(
+                name=f"#{job.job_id}: {job.trigger_name}",
+                value=f"<#{job.channel_id}> every {format_interval(job.interval)}\nNext <t:{job.next_run}:R>",
+                inline=False
+            )
+        return embed
+    
+    def unschedule_trigger(self, guild_id: Optional[int], job_id: int, user_id: int) -> Tuple[bool, str]:
+        """Cancel a schedule of this server; the bot owner may cancel any"""
+        job = self.bot.scheduler.get(job_id)
+        if job is None or (job.guild_id != guild_id and user_id != self.bot.owner_id):
+            return False, f"No schedule found with the ID `{job_id}`."
         
-        # Add fields to embed
-        embed.add_field(name="Created by", value=trigger_data.get('creator_name', 'Unknown'))
+        self.bot.scheduler.remove(job_id)
+        return True, f"Schedule `{job_id}` for `{job.trigger_name}` has been removed."
+    
+    @trigger.group(name="schedule", invoke_without_command=True)
+    async def trigger_schedule(self, ctx):
+        """Post triggers in a channel on a schedule"""
+        await ctx.send(f"Please specify `add`, `list` or `remove`. Usage: `{ctx.prefix}trigger schedule add <name> <interval> [#channel]`")
+    
+    @trigger_schedule.command(name="add")
+    async def trigger_schedule_add(self, ctx, name: str, interval: str, channel: Optional[discord.TextChannel] = None):
+        """Post a trigger every interval, e.g. `daily` or `30m`, in this or another channel"""
+        # Check if user is authorized (owner or has manage guild permission)
+        if not self.is_owner_or_has_manage_server(ctx):
+            await ctx.send("You don't have permission to schedule triggers. You need to be the bot owner or have 'Manage Server' permission.")
+            return
         
-        # Format creation time
-        created_time = datetime.datetime.fromtimestamp(trigger_data.get('created_at', 0))
-        embed.add_field(name="Created at", value=created_time.strftime('%Y-%m-%d %H:%M:%S'))
+        success, reply = self.schedule_trigger(ctx.guild, channel or ctx.channel, name, interval, ctx.author.id)
+        await ctx.send(reply)
+    
+    @trigger_schedule.command(name="list")
+    async def trigger_schedule_list(self, ctx):
+        """List this server's schedules"""
+        if not ctx.guild:
+            await ctx.send("Schedules only exist in servers.")
+            return
         
-        # Add guild information if available
-        if trigger_data.get('guild_id'):
-            guild = self.bot.get_guild(trigger_data['guild_id'])
-            embed.add_field(name="Server", value=guild.name if guild else "Unknown")
+        await ctx.send(embed=self.build_schedule_embed(ctx.guild.id))
+    
+    @trigger_schedule.command(name="remove")
+    async def trigger_schedule_remove(self, ctx, job_id: int):
+        """Stop a schedule by its ID"""
+        # Check if user is authorized (owner or has manage guild permission)
+        if not self.is_owner_or_has_manage_server(ctx):
+            await ctx.send("You don't have permission to remove schedules. You need to be the bot owner or have 'Manage Server' permission.")
+            return
         
-        # Add content information if available
-        if trigger_data.get('content'):
-            embed.add_field(name="Content", value=trigger_data['content'], inline=False)
+        success, reply = self.unschedule_trigger(ctx.guild.id if ctx.guild else None, job_id, ctx.author.id)
+        await ctx.send(reply)
+    
+    # Slash commands under /trigger schedule; a group keeps their names apart from /trigger list and the like
+    slash_trigger_schedule = app_commands.Group(name="schedule", description="Post triggers on a schedule")
+    
+    @slash_trigger_schedule.command(name="add", description="Post a trigger in a channel on a schedule")
+    @app_commands.describe(
+        name="The name of the trigger to post",
+        interval="How often, e.g. daily, hourly, 30m or 1h30m",
+        channel="The channel to post in (defaults to this one)"
+    )
+    async def slash_trigger_schedule_add(self, interaction: discord.Interaction, name: str, interval: str, channel: Optional[discord.TextChannel] = None):
+        """Slash command to schedule a trigger"""
+        # Check if user is authorized (owner or has manage guild permission)
+        if not (interaction.user.id == self.bot.owner_id or 
+                (interaction.guild and interaction.user.guild_permissions.manage_guild)):
+            await interaction.response.send_message("You don't have permission to schedule triggers. You need to be the bot owner or have 'Manage Server' permission.", ephemeral=True)
+            return
         
-        # Add attachment information if available
-        if trigger_data.get('attachment_url'):
-            embed.add_field(name="Attachment", value="Yes")
-            embed.set_image(url=trigger_data['attachment_url'])
-        else:
-            embed.add_field(name="Attachment", value="No")
+        success, reply = self.schedule_trigger(interaction.guild, channel or interaction.channel, name, interval, interaction.user.id)
+        await interaction.response.send_message(reply, ephemeral=not success)
+    
+    @slash_trigger_schedule.command(name="list", description="List this server's scheduled triggers")
+    async def slash_trigger_schedule_list(self, interaction: discord.Interaction):
+        """Slash command to list scheduled triggers"""
+        if not interaction.guild:
+            await interaction.response.send_message("Schedules only exist in servers.", ephemeral=True)
+            return
         
-        # Send the embed
-        await interaction.response.send_message(embed=embed)
+        await interaction.response.send_message(embed=self.build_schedule_embed(interaction.guild.id))
+    
+    @slash_trigger_schedule.command(name="remove", description="Stop a scheduled trigger")
+    @app_commands.describe(job_id="The ID of the schedule, as shown by list")
+    async def slash_trigger_schedule_remove(self, interaction: discord.Interaction, job_id: int):
+        """Slash command to remove a scheduled trigger"""
+        # Check if user is authorized (owner or has manage guild permission)
+        if not (interaction.user.id == self.bot.owner_id or 
+                (interaction.guild and interaction.user.guild_permissions.manage_guild)):
+            await interaction.response.send_message("You don't have permission to remove schedules. You need to be the bot owner or have 'Manage Server' permission.", ephemeral=True)
+            return
+        
+        success, reply = self.unschedule_trigger(interaction.guild_id, job_id, interaction.user.id)
+        await interaction.response.send_message(reply, ephemeral=not success)
+    
+    def set_matching(self, guild, steps: List[str]) -> Tuple[bool, str]:
+        """Choose how a server's messages are normalized before matching; returns whether it worked and a message"""
+        if guild is None:
+            return False, "Matching can only be configured in a server."
+        
+        steps = [step.lower() for step in steps]
+        if steps == ['standard']:
+            steps = []
+        unknown = [step for step in steps if step not in OPTIONAL_STEPS]
+        if unknown:
+            return False, f"Unknown steps: {', '.join(unknown)}. Choose from {', '.join(OPTIONAL_STEPS)}, or `standard` to reset."
+        
+        self.db.set_matching(guild.id, steps)
+        self.bot.guild_settings.invalidate(guild.id)
+        normalizer = get_normalizer(steps)
+        
+        reply = f"Messages in this server are now matched with the `{normalizer.name}` pipeline."
+        collisions = self.db.collisions(normalizer)
+        if collisions:
+            shown = [f"`{owner}` hides {', '.join(f'`{other}`' for other in others)}" for owner, others in list(collisions.items())[:10]]
+            reply += "\nSome triggers now match the same messages, and only the first of each can fire:\n" + "\n".join(shown)
+        return True, reply
+    
+    def describe_matching(self, guild_id: Optional[int]) -> str:
+        """Describe the pipeline a server's messages go through"""
+        normalizer = get_normalizer(self.db.get_matching(guild_id)) if guild_id else STANDARD
+        return (f"This server uses the `{normalizer.name}` matching pipeline. Messages are always NFKC normalized, "
+                f"casefolded and whitespace collapsed; optional steps are {', '.join(OPTIONAL_STEPS)}.")
+    
+    @trigger.command(name="matching")
+    async def trigger_matching(self, ctx, *steps: str):
+        """Show or choose how messages are normalized before matching triggers
+        
+        Usage:
+        - !trigger matching (shows the current pipeline)
+        - !trigger matching accents punctuation emoji
+        - !trigger matching standard (resets)
+        """
+        if not steps:
+            await ctx.send(self.describe_matching(ctx.guild.id if ctx.guild else None))
+            return
+        
+        # Check if user is authorized (owner or has manage guild permission)
+        if not self.is_owner_or_has_manage_server(ctx):
+            await ctx.send("You don't have permission to change matching. You need to be the bot owner or have 'Manage Server' permission.")
+            return
+        
+        success, reply = self.set_matching(ctx.guild, list(steps))
+        await ctx.send(reply)
+    
+    @app_commands.command(name="matching", description="Show or choose how messages are normalized before matching triggers")
+    @app_commands.describe(
+        accents="Ignore accents, so café matches cafe",
+        punctuation="Ignore punctuation, so hello! matches hello",
+        emoji="Ignore emoji"
+    )
+    async def slash_trigger_matching(self, interaction: discord.Interaction, accents: Optional[bool] = None,
+                                     punctuation: Optional[bool] = None, emoji: Optional[bool] = None):
+        """Slash command to show or choose the matching pipeline"""
+        chosen = {"accents": accents, "punctuation": punctuation, "emoji": emoji}
+        if all(value is None for value in chosen.values()):
+            await interaction.response.send_message(self.describe_matching(interaction.guild_id), ephemeral=True)
+            return
+        
+        # Check if user is authorized (owner or has manage guild permission)
+        if not (interaction.user.id == self.bot.owner_id or 
+                (interaction.guild and interaction.user.guild_permissions.manage_guild)):
+            await interaction.response.send_message("You don't have permission to change matching. You need to be the bot owner or have 'Manage Server' permission.", ephemeral=True)
+            return
+        
+        # Options left out keep their current setting
+        current = set(self.db.get_matching(interaction.guild_id)) if interaction.guild_id else set()
+        steps = [step for step, value in chosen.items() if value or (value is None and step in current)]
+        success, reply = self.set_matching(interaction.guild, steps)
+        await interaction.response.send_message(reply, ephemeral=not success)
     
     @trigger.command(name="list")
     async def trigger_list(self, ctx):
@@ -470,53 +967,187 @@ class TriggerCommands(commands.Cog):
     @app_commands.command(name="list", description="List all triggers")
     async def slash_trigger_list(self, interaction: discord.Interaction):
         """Slash command to list all triggers"""
-        # Get all triggers
-        triggers = self.db.get_all_triggers()
+        # Defer if the work below runs past the response budget
+        async with self.bot.interaction_timings.responder(interaction) as responder:
+            # Get all triggers
+            triggers = self.db.get_all_triggers()
+            
+            if not triggers:
+                await responder.send("No triggers have been created yet.")
+                return
+            
+            # Create a paginated view
+            await responder.checkpoint()
+            view = TriggerView(triggers, interaction.user.id)
+            await responder.send(embed=view.get_current_page(), view=view)
+
+    def build_stats_embed(self, guild_id: Optional[int], count: int) -> discord.Embed:
+        """Build the usage statistics embed from the in-memory counters"""
+        stats = self.bot.trigger_stats
+        count = max(1, min(count, 25))
         
-        if not triggers:
-            await interaction.response.send_message("No triggers have been created yet.")
+        embed = discord.Embed(
+            title="Trigger Statistics",
+            color=discord.Color.blue(),
+            timestamp=datetime.datetime.now()
+        )
+        
+        # Most used triggers overall
+        lines = []
+        for name, hits in stats.top(count):
+            usage = stats.get(name)
+            lines.append(f"`{name}` - {hits} hits, last used <t:{usage.last_used}:R>")
+        embed.add_field(name=f"Top {count}", value="\n".join(lines) or "No trigger has been used yet.", inline=False)
+        
+        # Most used triggers in this server
+        if guild_id is not None:
+            lines = [f"`{name}` - {hits} hits" for name, hits in stats.top(count, guild_id)]
+            embed.add_field(name=f"Top {count} in this server", value="\n".join(lines) or "No trigger has been used here yet.", inline=False)
+        
+        # Triggers that never fired
+        never_used = stats.never_used(self.db.get_all_triggers())
+        value = ", ".join(f"`{name}`" for name in never_used[:30]) or "Every trigger has been used."
+        if len(never_used) > 30:
+            value += f" and {len(never_used) - 30} more"
+        embed.add_field(name=f"Never used ({len(never_used)})", value=value[:1024], inline=False)
+        
+        return embed
+    
+    @trigger.command(name="stats")
+    async def trigger_stats(self, ctx, count: int = 10):
+        """Show the most used and never used triggers"""
+        # Check if user is authorized (owner or has manage guild permission)
+        if not self.is_owner_or_has_manage_server(ctx):
+            await ctx.send("You don't have permission to view trigger statistics. You need to be the bot owner or have 'Manage Server' permission.")
             return
         
-        # Create a paginated view
-        view = TriggerView(triggers, interaction.user.id)
-        await interaction.response.send_message(embed=view.get_current_page(), view=view)
-
+        await ctx.send(embed=self.build_stats_embed(ctx.guild.id if ctx.guild else None, count))
+    
+    @app_commands.command(name="stats", description="Show the most used and never used triggers")
+    @app_commands.describe(count="How many of the most used triggers to show")
+    async def slash_trigger_stats(self, interaction: discord.Interaction, count: int = 10):
+        """Slash command to show trigger usage statistics"""
+        # Check if user is authorized (owner or has manage guild permission)
+        if not (interaction.user.id == self.bot.owner_id or 
+                (interaction.guild and interaction.user.guild_permissions.manage_guild)):
+            await interaction.response.send_message("You don't have permission to view trigger statistics. You need to be the bot owner or have 'Manage Server' permission.", ephemeral=True)
+            return
+        
+        await interaction.response.send_message(embed=self.build_stats_embed(interaction.guild_id, count))
+    
     # For handling message events and responding with trigger content
-    async def check_and_respond_to_trigger(self, message):
-        """Check if message content matches a trigger and respond if it does"""
-        if message.author.bot:
-            return  # Ignore bot messages
-        
-        # Get the message content and strip whitespace
-        content = message.content.strip().lower()
-        
-        # Get all triggers for case-insensitive matching
-        all_triggers = self.db.get_all_triggers()
-        
-        # Check if the content matches any trigger name (case-insensitive)
-        trigger_data = None
-        for trigger_name, data in all_triggers.items():
-            if content.lower() == trigger_name.lower():
-                trigger_data = data
-                break
-        
-        # If trigger exists, respond with only the content
-        if trigger_data:
-            # Send response text if there is any
-            if trigger_data.get('content'):
-                await message.channel.send(trigger_data['content'])
-            
-            # Send attachment if there is one
-            if trigger_data.get('attachment_url'):
+    async def check_and_respond_to_trigger(self, message, key: str, normalizer: Normalizer = STANDARD):
+        """Check if a message matches a trigger and respond if it does
+        
+        Called by the bot's message router for non-command messages from
+        users, with the content already run through the guild's
+        normalization pipeline as key.
+        """
+        with span('lookup'):
+            # Look the key up in the pipeline's precomputed trigger index
+            match = self.db.find_trigger(key, normalizer)
+            args = ''
+            
+            # Otherwise the first word may name a trigger that takes {args}
+            if match is None and ' ' in key:
+                first, rest = key.split(' ', 1)
+                match = self.db.find_trigger(first, normalizer)
+                if match is None or not self.db.get_picker(*match).uses_args:
+                    match = None
+                else:
+                    # Keep the author's original text when its first word is the trigger name,
+                    # else fall back to the normalized rest, e.g. when normalization added a space
+                    words = message.content.split(None, 1)
+                    args = words[1].strip() if len(words) == 2 and normalizer(words[0]) == first else rest
+            
+            # Triggers limited to some channels or roles are checked against their precomputed sets.
+            # Only the scope's roles are looked up on the member; authors that are not guild
+            # members (webhooks, users in DMs) have no roles
+            if match is not None and match[1].scope is not None:
+                author = message.author
+                if isinstance(author, discord.Member):
+                    has_role = lambda role_id: author.get_role(role_id) is not None
+                else:
+                    has_role = lambda role_id: False
+                if not match[1].scope.allows(message.channel.id, getattr(message.channel, 'parent_id', None), has_role):
+                    match = None
+        
+        # If trigger exists, respond with one of its responses
+        if match:
+            # Count the hit in memory; it is flushed to disk in batches
+            self.bot.trigger_stats.record_hit(match[0], message.guild.id if message.guild else None)
+            logger.debug("Trigger %s fired in channel %s", match[0], message.channel.id, extra={"event": "trigger_fired"})
+            await self.send_response(message.channel, match, message.guild, message.author, args)
+    
+    async def send_response(self, channel, match: Tuple[str, TriggerRecord], guild, author=None, args: str = ''):
+        """Pick one of a trigger's responses and post it to a channel"""
+        with span('payload'):
+            # Pick a response by weight in constant time
+            response, template = self.db.get_picker(*match).pick()
+            
+            # Render the response text if there is any from its compiled template
+            content = None
+            allowed_mentions = None
+            if template is not None:
+                if template.static is not None:
+                    content = template.static
+                else:
+                    content = template.render({
+                        "user": author.mention if author else '',
+                        "channel": getattr(channel, 'mention', ''),
+                        "guild": guild.name if guild else '',
+                        "args": args
+                    })
+                    # Filled-in text must not ping anyone but the author
+                    mentioned = [author] if author else []
+                    allowed_mentions = discord.AllowedMentions(everyone=False, roles=False, users=mentioned)
+        
+        # Send response text if there is any
+        if content is not None:
+            with span('send'):
+                if allowed_mentions is not None:
+                    await channel.send(content, allowed_mentions=allowed_mentions)
+                else:
+                    await channel.send(content)
+        
+        # Send attachment if there is one, unless the link health check found it gone
+        if response.attachment_url and self.bot.link_health.is_dead(response.attachment_url):
+            logger.warning(f"Skipping the dead attachment of trigger {match[0]}: {response.attachment_url}", extra={"event": "dead_attachment"})
+        elif response.attachment_url:
+            with span('send'):
                 # For files, just send the URL directly or as an embed with no text
-                if trigger_data.get('content'):
+                if response.content:
                     # If we already sent content, use an embed for the image
                     embed = discord.Embed()
-                    embed.set_image(url=trigger_data['attachment_url'])
-                    await message.channel.send(embed=embed)
+                    embed.set_image(url=response.attachment_url)
+                    await channel.send(embed=embed)
                 else:
                     # If no content, just send the image directly
-                    await message.channel.send(trigger_data['attachment_url'])
+                    await channel.send(response.attachment_url)
+    
+    async def post_scheduled_trigger(self, job: ScheduledJob) -> bool:
+        """Post a scheduled trigger; called by the bot's scheduler
+        
+        Returns False when the trigger or channel is gone for good, so the
+        schedule is dropped. A channel missing from the cache only counts as
+        gone when its guild is cached and available.
+        """
+        record = self.db.get_trigger(job.trigger_name)
+        if record is None:
+            return False
+        
+        guild = self.bot.get_guild(job.guild_id)
+        if guild is None or guild.unavailable or not self.bot.is_ready():
+            # During an outage or while the cache refills after a reconnect; try again next time
+            logger.info(f"Skipping schedule {job.job_id}: guild {job.guild_id} is not available")
+            return True
+        
+        channel = guild.get_channel_or_thread(job.channel_id)
+        if channel is None:
+            return False
+        
+        await self.send_response(channel, (job.trigger_name, record), guild)
+        return True
 
 async def setup(bot):
     await bot.add_cog(TriggerCommands(bot))
@@ -528,9 +1159,18 @@ async def setup(bot):
     trigger_group.add_command(trigger_cog.slash_trigger_delete)
     trigger_group.add_command(trigger_cog.slash_trigger_get)
     trigger_group.add_command(trigger_cog.slash_trigger_list)
+    trigger_group.add_command(trigger_cog.slash_trigger_stats)
+    trigger_group.add_command(trigger_cog.slash_trigger_add_response)
+    trigger_group.add_command(trigger_cog.slash_trigger_remove_response)
+    trigger_group.add_command(trigger_cog.slash_trigger_matching)
+    trigger_group.add_command(trigger_cog.slash_trigger_scope)
+    trigger_group.add_command(trigger_cog.slash_trigger_schedule)
     
     bot.tree.add_command(trigger_group)
     await bot.tree.sync()
     
-    # Add message listener to the bot
-    bot.add_listener(trigger_cog.check_and_respond_to_trigger, "on_message")
+    # Route non-command messages to the trigger handler
+    bot.router.trigger_handler = trigger_cog.check_and_respond_to_trigger
+    
+    # Post scheduled triggers
+    bot.scheduler.fire_handler = trigger_cog.post_scheduled_trigger
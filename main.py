@@ -6,9 +6,24 @@ import discord
 from discord.ext import commands
 import asyncio
 import logging
+import signal
 import sys
 from typing import Optional, Dict, List, Any
+from utils import codec
 from utils.db_manager import DatabaseManager
+from utils.file_watcher import DataFileWatcher
+from utils.trigger_stats import TriggerStats
+from utils.loop_monitor import LoopMonitor
+from utils.message_router import MessageRouter
+from utils.guild_settings import GuildSettingsCache
+from utils.maintenance import GuildDataCollector
+from utils.snapshots import SnapshotManager
+from utils.scheduler import TriggerScheduler
+from utils.log_pipeline import setup_logging
+from utils.tracing import Tracer, TracedCommandTree
+from utils.http_client import HttpClient
+from utils.link_health import LinkHealthChecker
+from utils.interactions import InteractionTimings
 import utils
 import time
 from colorama import init, Fore
@@ -28,12 +43,8 @@ ascii_art = f"""
 for line in ascii_art.split('\n'):
     print(line)
     time.sleep(0.05)
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler(sys.stdout)]
-)
+# Set up logging; records are written to stdout by a background thread
+setup_logging()
 logger = logging.getLogger('trigger_bot')
 
 # Define intents
@@ -41,12 +52,27 @@ intents = discord.Intents.default()
 intents.message_content = True  # Needed to read message content for prefix commands
 intents.guilds = True
 
+def lean_gateway_options() -> Dict[str, Any]:
+    """Client options for lean mode: only the events and caches the bot actually uses"""
+    lean_intents = discord.Intents.none()
+    lean_intents.guilds = True  # Guild cache, joins and removals
+    lean_intents.guild_messages = True  # Messages for commands and triggers
+    lean_intents.dm_messages = True  # Commands in DMs
+    lean_intents.message_content = True  # Needed to read message content for prefix commands
+    
+    return {
+        "intents": lean_intents,
+        "member_cache_flags": discord.MemberCacheFlags.none(),
+        "chunk_guilds_at_startup": False,
+        "max_messages": None
+    }
+
 async def get_prefix(bot, message):
     """Get the prefix for the guild"""
     if not message.guild:
         return commands.when_mentioned_or(bot.default_prefix)(bot, message)
     
-    prefix = bot.prefixes.get(str(message.guild.id), bot.default_prefix)
+    prefix = bot.get_guild_prefix(message.guild.id)
     return commands.when_mentioned_or(prefix)(bot, message)
 
 class TriggerBot(commands.Bot):
@@ -61,23 +87,95 @@ class TriggerBot(commands.Bot):
         elif isinstance(self.owner_id, str):
             self.owner_id = int(self.owner_id)
         
-        self.prefixes: Dict[str, str] = {}
-        self.db_manager = DatabaseManager()
+        self.lean_mode = self.config.get('lean_mode', False)
+        
+        # Fast mode swaps in orjson for the data files when it is installed
+        if codec.configure(fast=self.config.get('fast_mode', False)):
+            logger.info("Fast mode: using orjson for data files")
+        
+        self.db_manager = DatabaseManager(
+            storage_format=self.config.get('storage_format', 'json'),
+            compress_threshold=self.config.get('compress_threshold', 1024)
+        )
+        
+        # Per-guild settings, loaded on first use and bounded in size
+        self.guild_settings = GuildSettingsCache(
+            self.db_manager,
+            self.default_prefix,
+            max_size=self.config.get('guild_cache_size', 10000),
+            ttl=self.config.get('guild_cache_ttl', 3600.0)
+        )
+        
+        # Purges the data of guilds we left once the grace period is over
+        self.guild_collector = GuildDataCollector(
+            self,
+            interval=self.config.get('gc_interval', 3600.0),
+            grace_period=self.config.get('gc_grace_period', 7 * 86400),
+            archive=self.config.get('gc_archive', True)
+        )
+        
+        # Applies hand edits of the data files without a restart
+        self.file_watcher = DataFileWatcher(self, interval=self.config.get('hot_reload_interval', 2.0))
+        
+        # Trigger usage counters, kept in memory and flushed in batches
+        self.trigger_stats = TriggerStats(flush_interval=self.config.get('stats_flush_interval', 60.0))
+        
+        # Pooled HTTP client for attachment downloads and link checks
+        self.fetcher = HttpClient(
+            pool_size=self.config.get('http_pool_size', 20),
+            timeout=self.config.get('http_timeout', 10.0),
+            max_bytes=self.config.get('attachment_max_bytes', 10 * 2**20)
+        )
+        
+        # Re-signs expiring attachment links and flags dead ones
+        self.link_health = LinkHealthChecker(
+            self,
+            interval=self.config.get('link_check_interval', 21600.0),
+            concurrency=self.config.get('link_check_concurrency', 4)
+        )
+        
+        # Posts triggers on schedules from a single timer wheel
+        self.scheduler = TriggerScheduler(self)
+        
+        # Compressed point-in-time backups of all data files
+        self.snapshots = SnapshotManager(
+            self,
+            interval=self.config.get('snapshot_interval', 86400.0),
+            keep=self.config.get('snapshot_keep', 7)
+        )
+        
+        # Watches for event loop stalls and records lag percentiles
+        self.loop_monitor = LoopMonitor(threshold=self.config.get('stall_threshold', 0.5))
+        
+        # Samples per-message latency traces to a JSONL file
+        self.tracer = Tracer(sample_rate=self.config.get('trace_sample_rate', 0.01))
+        
+        # Slash command timings; heavy commands defer once they pass the budget
+        self.interaction_timings = InteractionTimings(budget=self.config.get('interaction_defer_budget', 1.0))
+        
+        # Single pass command/trigger classification for every message
+        self.router = MessageRouter(self)
+        
+        # Lean mode drops the member/message caches and unused intents
+        gateway_options = lean_gateway_options() if self.lean_mode else {"intents": intents}
         
         super().__init__(
             command_prefix=get_prefix,
-            intents=intents,
             case_insensitive=True,
-            help_command=None  # We'll implement our own help command
+            help_command=None,  # We'll implement our own help command
+            tree_cls=TracedCommandTree,
+            **gateway_options
         )
         
+        # Seconds in-flight work gets to finish when shutting down
+        self.shutdown_timeout = self.config.get('shutdown_timeout', 10.0)
+        self._shutdown_task: Optional[asyncio.Task] = None
+        
         # Initialize database files if they don't exist
         self.initialize_data_files()
-        
-        # Load prefixes
-        self.load_prefixes()
     
-    def load_config(self) -> Dict[str, Any]:
+    @staticmethod
+    def load_config() -> Dict[str, Any]:
         """Load the bot configuration"""
         try:
             with open('config.json', 'r') as f:
@@ -99,9 +197,9 @@ class TriggerBot(commands.Bot):
         # Make sure directories exist
         utils.check_directories()
     
-    def load_prefixes(self):
-        """Load server prefixes from the database"""
-        self.prefixes = self.db_manager.get_all_prefixes()
+    def get_guild_prefix(self, guild_id: Optional[int]) -> str:
+        """Get the prefix for a guild, or the default prefix for DMs"""
+        return self.guild_settings.get(guild_id).prefix
     
     async def save_prefixes(self):
         """Save server prefixes to the database"""
@@ -111,8 +209,8 @@ class TriggerBot(commands.Bot):
     
     async def update_prefix(self, guild_id: int, prefix: str):
         """Update the prefix for a guild"""
-        self.prefixes[str(guild_id)] = prefix
         self.db_manager.set_prefix(guild_id, prefix)
+        self.guild_settings.invalidate(guild_id)
     
     async def setup_hook(self):
         """Setup hook that runs before the bot starts"""
@@ -124,6 +222,75 @@ class TriggerBot(commands.Bot):
                     logger.info(f"Loaded extension: {filename[:-3]}")
                 except Exception as e:
                     logger.error(f"Failed to load extension {filename[:-3]}: {str(e)}")
+        
+        # Start watching the data files for external edits
+        self.file_watcher.start()
+        
+        # Start flushing trigger usage counters
+        self.trigger_stats.start()
+        
+        # Start measuring event loop lag
+        self.loop_monitor.start()
+        
+        # Start collecting data of departed guilds
+        self.guild_collector.start()
+        
+        # Start taking scheduled snapshots
+        self.snapshots.start()
+        
+        # Start posting scheduled triggers
+        self.scheduler.start()
+        
+        # Start the per-guild trigger workers
+        self.router.start()
+        
+        # Start writing sampled traces
+        self.tracer.start()
+        
+        # Start checking stored attachment links
+        self.link_health.start()
+    
+    def request_shutdown(self, reason: str):
+        """Start a graceful shutdown, e.g. from a signal handler"""
+        if self._shutdown_task is None:
+            logger.info(f"Received {reason}, shutting down")
+            self._shutdown_task = asyncio.create_task(self._shutdown(), name="shutdown-sequence")
+    
+    async def close(self):
+        """Shut down gracefully; later calls wait for the first one to finish"""
+        if self._shutdown_task is None:
+            self._shutdown_task = asyncio.create_task(self._shutdown(), name="shutdown-sequence")
+        await asyncio.shield(self._shutdown_task)
+    
+    async def _shutdown(self):
+        """Stop taking work, drain in-flight responses, flush state and disconnect"""
+        started = time.monotonic()
+        
+        # Stop new scheduled posts, then let running commands and queued triggers finish
+        await self.scheduler.stop()
+        dropped = await self.router.drain(self.shutdown_timeout)
+        
+        # Stop the background jobs
+        await self.link_health.stop()
+        await self.snapshots.stop()
+        await self.guild_collector.stop()
+        await self.loop_monitor.stop()
+        
+        # Flush everything that is only in memory
+        await self.trigger_stats.stop()
+        stats_saved = await self.trigger_stats.flush()
+        data_saved = await self.db_manager.flush()
+        await self.tracer.stop()
+        
+        # Close network resources
+        await self.fetcher.close()
+        await super().close()
+        
+        dispatcher = self.router.dispatcher
+        logger.info(f"Shutdown finished in {time.monotonic() - started:.1f}s: {dispatcher.processed} triggers handled, "
+                    f"{dropped} queued triggers dropped at the deadline")
+        if not (stats_saved and data_saved):
+            logger.error("Some data could not be saved during shutdown, see the errors above")
     
     async def on_ready(self):
         """Event that triggers when the bot is ready"""
@@ -131,6 +298,14 @@ class TriggerBot(commands.Bot):
         logger.info(f'Using discord.py version {discord.__version__}')
         logger.info(f'Owner ID: {self.owner_id}')
         
+        # Log memory per guild so lean and default mode can be compared
+        rss = utils.resident_memory_bytes()
+        if rss:
+            guild_count = len(self.guilds)
+            per_thousand = rss / max(guild_count, 1) * 1000
+            logger.info(f"Resident memory: {rss / 2**20:.1f} MiB for {guild_count} guilds "
+                        f"({per_thousand / 2**20:.1f} MiB per 1k guilds, lean mode {'on' if self.lean_mode else 'off'})")
+        
         # Set bot activity
         await self.change_presence(activity=discord.Activity(
             type=discord.ActivityType.listening, 
@@ -140,20 +315,29 @@ class TriggerBot(commands.Bot):
     async def on_guild_join(self, guild):
         """Event that triggers when the bot joins a guild"""
         logger.info(f"Joined new guild: {guild.name} (ID: {guild.id})")
+        
+        # Keep the guild's data if we left it recently
+        await self.guild_collector.mark_returned(guild.id)
     
     async def on_guild_remove(self, guild):
         """Event that triggers when the bot leaves a guild"""
         logger.info(f"Left guild: {guild.name} (ID: {guild.id})")
         
-        # Remove guild prefix if it exists
-        if str(guild.id) in self.prefixes:
-            self.db_manager.delete_prefix(guild.id)
-            del self.prefixes[str(guild.id)]
+        # Remove guild prefix if it exists and drop the cached settings
+        self.db_manager.delete_prefix(guild.id)
+        self.guild_settings.invalidate(guild.id)
+        
+        # Triggers and stats are purged by the collector after the grace period
+        await self.guild_collector.mark_departed(guild.id)
+    
+    async def on_app_command_completion(self, interaction, command):
+        """Event that triggers when a slash command finishes"""
+        self.tracer.finish(interaction.extras.pop('trace', None))
     
     async def on_command_error(self, ctx, error):
         """Global error handler for commands"""
         if isinstance(error, commands.CommandNotFound):
-            logger.debug(f"Command not found: {ctx.message.content}")
+            logger.debug(f"Command not found: {ctx.message.content}", extra={"event": "command_not_found"})
             return  # Ignore command not found errors
         
         if isinstance(error, commands.MissingRequiredArgument):
@@ -173,12 +357,21 @@ class TriggerBot(commands.Bot):
         await ctx.send(f"An error occurred: {str(error)}")
     
     async def on_message(self, message):
-        # Process commands first
-        await self.process_commands(message)
-        
-        # We need to check if this is a trigger after processing commands
-        # to avoid executing bot commands inadvertently
-        # This will be handled by the TriggerCommands cog's listener
+        # The router sends each message to either a command or the trigger
+        # handler registered by the TriggerCommands cog, never both
+        await self.router.route(message)
+def install_uvloop() -> bool:
+    """Run the bot on uvloop if it is installed"""
+    try:
+        import uvloop
+    except ImportError:
+        logger.warning("Fast mode requested but uvloop is not installed, using the default event loop")
+        return False
+    
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    logger.info("Fast mode: using the uvloop event loop")
+    return True
+
 async def main():
     # Create bot instance
     bot = TriggerBot()
@@ -190,6 +383,15 @@ async def main():
         logger.error("Please set your bot token in config.json")
         sys.exit(1)
     
+    # Shut down gracefully on SIGTERM (rolling restarts) and Ctrl+C
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, bot.request_shutdown, sig.name)
+        except (NotImplementedError, RuntimeError):
+            # Not supported on Windows; Ctrl+C still closes the bot through async with
+            pass
+    
     try:
         # Start the bot
         logger.info("Starting bot...")
@@ -203,4 +405,17 @@ async def main():
         sys.exit(1)
 
 if __name__ == "__main__":
+    config = TriggerBot.load_config()
+    
+    # Apply the configured log level, format and sampling
+    setup_logging(
+        level=config.get('log_level', 'INFO'),
+        json_output=config.get('log_format', 'text') == 'json',
+        sampling=config.get('log_sampling'),
+        rate_limit=config.get('log_rate_limit', 50)
+    )
+    
+    # The event loop has to be chosen before it is created
+    if config.get('fast_mode', False):
+        install_uvloop()
     asyncio.run(main())
@@ -0,0 +1,22 @@
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+@pytest.fixture
+def make_bot(tmp_path, monkeypatch):
+    """Build the real bot in a scratch directory, without connecting"""
+    import main
+
+    def build(**config):
+        monkeypatch.chdir(tmp_path)
+        for directory in ('cogs', 'utils', 'data'):
+            os.makedirs(directory, exist_ok=True)
+        with open('config.json', 'w') as f:
+            json.dump({"token": "x", "prefix": "!", "owner_id": "1", **config}, f)
+        return main.TriggerBot()
+    return build
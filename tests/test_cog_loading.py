@@ -0,0 +1,29 @@
+import asyncio
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+def test_trigger_cog_loads(make_bot, monkeypatch):
+    """The trigger cog must load into the bot, or it runs without its commands and handlers"""
+    async def run():
+        bot = make_bot()
+
+        async def sync(*args, **kwargs):
+            return []
+        monkeypatch.setattr(bot.tree, 'sync', sync)
+
+        await bot.load_extension('cogs.trigger_commands')
+
+        assert bot.get_cog('TriggerCommands') is not None
+        assert bot.router.trigger_handler is not None
+        assert bot.scheduler.fire_handler is not None
+
+        trigger_group = bot.tree.get_command('trigger')
+        assert trigger_group is not None
+        schedule_group = trigger_group.get_command('schedule')
+        assert sorted(command.name for command in schedule_group.commands) == ['add', 'list', 'remove']
+        assert trigger_group.get_command('list') is not None
+
+    asyncio.run(run())
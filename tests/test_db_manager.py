@@ -0,0 +1,88 @@
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.db_manager import DatabaseManager
+from utils.normalize import get_normalizer
+from utils.prefix_store import PrefixStore
+from utils.schema import wrap_triggers
+from utils.trigger_record import TriggerRecord
+
+def test_unloadable_file_is_not_changed_in_memory(tmp_path, monkeypatch):
+    """Writes refused because the file failed to load leave memory matching the disk"""
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('data')
+    with open('data/triggers.json', 'w') as f:
+        f.write('{"hello": {"content": "hi"')
+    with open('data/prefixes.json', 'w') as f:
+        f.write('not json')
+
+    db = DatabaseManager()
+    assert db.load_failed(db.trigger_path)
+
+    assert not db.add_trigger("new", TriggerRecord(content="x"))
+    assert not db.trigger_exists("new")
+    assert db.find_trigger("new") is None
+    assert db.find_collision("new") is None
+
+    assert not db.set_prefix(1, "?")
+    assert db.get_prefix(1) == '!'
+
+    with open('data/triggers.json') as f:
+        assert f.read() == '{"hello": {"content": "hi"'
+
+def test_deleting_hands_the_key_to_the_next_trigger(tmp_path, monkeypatch):
+    """Removing the trigger that owns a key lets the next one with the same key match"""
+    monkeypatch.chdir(tmp_path)
+    db = DatabaseManager()
+    normalizer = get_normalizer(['punctuation'])
+    for name in ("hi!", "hi?", "hi."):
+        db.add_trigger(name, TriggerRecord(content=name))
+
+    assert db.find_trigger("hi", normalizer)[0] == "hi!"
+    assert db.collisions(normalizer) == {"hi!": ["hi?", "hi."]}
+    assert db.delete_trigger("hi!")
+    assert db.find_trigger("hi", normalizer)[0] == "hi?"
+    assert db.delete_triggers(["hi?", "hi."]) == 2
+    assert db.find_trigger("hi", normalizer) is None
+
+def test_batch_delete_does_not_rescan(tmp_path, monkeypatch):
+    """Deleting from a large set of triggers costs the same whatever the set's size"""
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('data')
+    names = [f"trigger {number}" for number in range(20000)]
+    with open('data/triggers.json', 'w') as f:
+        json.dump(wrap_triggers({name: {"content": "hi"} for name in names}), f)
+    db = DatabaseManager()
+    normalizer = get_normalizer(['punctuation'])
+    db.set_matching(1, ['punctuation'])
+    db.find_trigger("x", normalizer)
+
+    start = time.perf_counter()
+    assert db.delete_triggers(names[:200]) == 200
+    assert db.find_collision("trigger 5") is None
+    assert time.perf_counter() - start < 0.5
+
+def test_compact_prefixes_are_read_on_demand(tmp_path, monkeypatch):
+    """In compact storage, prefixes are imported once into the prefix store and read per guild"""
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('data')
+    with open('data/prefixes.json', 'w') as f:
+        json.dump({"1": "?", "2": "$"}, f)
+
+    db = DatabaseManager(storage_format='compact')
+    assert isinstance(db._prefixes, PrefixStore)
+    assert db.get_prefix(1) == "?" and db.get_prefix(3) == "!"
+    assert db.set_prefix(3, ">") and db.delete_prefix(2)
+    db.prefix_store.close()
+
+    # The JSON file is only the source of the first import
+    with open('data/prefixes.json', 'w') as f:
+        json.dump({"9": "%"}, f)
+    db = DatabaseManager(storage_format='compact')
+    assert db.get_all_prefixes() == {"1": "?", "3": ">"}
+    db.prefix_store.close()
@@ -0,0 +1,65 @@
+import asyncio
+import datetime
+import os
+import sys
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cogs.trigger_commands import TriggerCommands
+from utils.db_manager import DatabaseManager
+from utils.interactions import InteractionTimings
+from utils.trigger_record import TriggerRecord
+
+class FakeInteraction:
+    """Records how an interaction was answered"""
+
+    def __init__(self):
+        self.calls = []
+        self.done = False
+        self.user = SimpleNamespace(id=1)
+        self.command = SimpleNamespace(qualified_name="trigger get")
+        self.created_at = datetime.datetime.now(datetime.timezone.utc)
+        self.response = SimpleNamespace(is_done=lambda: self.done, defer=self._defer, send_message=self._send_message)
+        self.followup = SimpleNamespace(send=self._followup)
+
+    async def _defer(self, ephemeral=False, thinking=False):
+        self.done = True
+        self.calls.append(("defer", ephemeral))
+
+    async def _send_message(self, content=None, ephemeral=False, **kwargs):
+        self.done = True
+        self.calls.append(("message", ephemeral))
+
+    async def _followup(self, content=None, ephemeral=False, **kwargs):
+        self.calls.append(("followup", ephemeral))
+
+def test_slow_command_defers_before_its_work(tmp_path, monkeypatch):
+    """A command that usually overruns defers before the slow part, with the visibility of its answer"""
+    monkeypatch.chdir(tmp_path)
+    db = DatabaseManager()
+    db.add_trigger("hello", TriggerRecord(content="hi"))
+    timings = InteractionTimings(budget=1.0)
+
+    cog = TriggerCommands.__new__(TriggerCommands)
+    cog.bot = SimpleNamespace(interaction_timings=timings, get_guild=lambda guild_id: None)
+    cog.db = db
+    lookups = []
+    get_trigger = db.get_trigger
+    monkeypatch.setattr(db, 'get_trigger', lambda name: lookups.append(interaction.calls[:]) or get_trigger(name))
+
+    async def run(name):
+        timings.get("trigger get").expected = 5.0
+        await TriggerCommands.slash_trigger_get.callback(cog, interaction, name)
+
+    # Unknown names are answered at once, privately, without a public defer
+    interaction = FakeInteraction()
+    asyncio.run(run("missing"))
+    assert interaction.calls == [("message", True)]
+
+    # The defer happens before the record is read, not after the embed is built
+    interaction = FakeInteraction()
+    asyncio.run(run("hello"))
+    assert lookups == [[("defer", False)]]
+    assert interaction.calls == [("defer", False), ("followup", False)]
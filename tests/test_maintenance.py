@@ -0,0 +1,77 @@
+import asyncio
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.maintenance import CollectionReport
+from utils.normalize import get_normalizer
+from utils.schema import wrap_triggers
+from utils.trigger_record import TriggerRecord
+
+def test_compact_store_collection(make_bot, monkeypatch):
+    """Collection passes in compact mode decode each trigger once, and archives are written whole"""
+    async def run():
+        bot = make_bot(storage_format='compact', gc_grace_period=3600)
+        db = bot.db_manager
+        for number in range(10):
+            db.add_trigger(f"t{number}", TriggerRecord(content="hi", guild_id=1 + number % 2))
+        db.compact_store.reopen()
+
+        reads = []
+        original = db.compact_store._read
+        monkeypatch.setattr(db.compact_store, '_read', lambda name: reads.append(name) or original(name))
+
+        for _ in range(3):
+            assert await bot.guild_collector._referenced_guilds() == {"1", "2"}
+        assert sorted(reads) == sorted(f"t{number}" for number in range(10))
+
+        # Guild 2 was left long ago; guild 1 only counts as departed from this pass on
+        await bot.guild_collector.mark_departed(2)
+        bot.guild_collector._departed["2"] = 0
+        report = await bot.guild_collector.collect()
+        assert report.triggers == 5 and report.archived == 5
+        assert sorted(db.get_all_triggers()) == [f"t{number}" for number in range(0, 10, 2)]
+
+        archives = os.listdir(bot.guild_collector.archive_dir)
+        assert len(archives) == 1 and not archives[0].endswith('.tmp')
+        with open(os.path.join(bot.guild_collector.archive_dir, archives[0])) as f:
+            assert len(json.load(f)) == 5
+
+    asyncio.run(run())
+
+def test_purge_keeps_the_loop_responsive(make_bot, tmp_path, monkeypatch):
+    """Purging many triggers never holds the event loop for long"""
+    async def run():
+        monkeypatch.chdir(tmp_path)
+        os.makedirs('data', exist_ok=True)
+        with open('data/triggers.json', 'w') as f:
+            json.dump(wrap_triggers({f"trigger {number}": {"content": "hi", "guild_id": 1 + number % 2}
+                                     for number in range(20000)}), f)
+        bot = make_bot(gc_grace_period=3600, gc_archive=False)
+        db = bot.db_manager
+        db.set_matching(1, ['punctuation'])
+        db.find_trigger("x", get_normalizer(['punctuation']))
+
+        longest = 0.0
+        async def watch():
+            nonlocal longest
+            while True:
+                before = time.perf_counter()
+                await asyncio.sleep(0)
+                longest = max(longest, time.perf_counter() - before)
+
+        watcher = asyncio.create_task(watch())
+        await asyncio.sleep(0)
+        report = CollectionReport()
+        await bot.guild_collector._purge({"2"}, report)
+        watcher.cancel()
+
+        assert report.triggers == 10000
+        assert len(db.get_all_triggers()) == 10000
+        assert longest < 0.1
+
+    asyncio.run(run())
@@ -0,0 +1,25 @@
+import asyncio
+import os
+import sys
+import threading
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.profiler import Profiler
+
+def test_memory_profile_snapshots_off_the_loop(monkeypatch):
+    """Snapshots and their comparison run in worker threads, not on the event loop"""
+    threads = []
+    take_snapshot = tracemalloc.take_snapshot
+
+    def recording_snapshot():
+        threads.append(threading.current_thread())
+        return take_snapshot()
+    monkeypatch.setattr(tracemalloc, 'take_snapshot', recording_snapshot)
+
+    report = asyncio.run(Profiler().profile_memory(0.01, limit=5))
+    assert report.startswith("Allocation changes over 0.01s")
+    assert len(threads) == 2 and threading.main_thread() not in threads
+    assert not tracemalloc.is_tracing()
@@ -0,0 +1,48 @@
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cogs.trigger_commands import TriggerCommands
+from utils.db_manager import DatabaseManager
+from utils.scheduler import ScheduledJob
+from utils.trigger_record import TriggerRecord
+
+def test_jobs_survive_an_unavailable_guild(tmp_path, monkeypatch):
+    """A schedule is only dropped when its guild is available and the channel is really gone"""
+    monkeypatch.chdir(tmp_path)
+    db = DatabaseManager()
+    db.add_trigger("hello", TriggerRecord(content="hi"))
+
+    channel = SimpleNamespace(id=10)
+    guilds = {
+        1: SimpleNamespace(unavailable=True, get_channel_or_thread=lambda channel_id: None),
+        2: SimpleNamespace(unavailable=False, get_channel_or_thread=lambda channel_id: None),
+        3: SimpleNamespace(unavailable=False, get_channel_or_thread=lambda channel_id: channel)
+    }
+    ready = [False]
+    cog = TriggerCommands.__new__(TriggerCommands)
+    cog.bot = SimpleNamespace(get_guild=guilds.get, is_ready=lambda: ready[0])
+    cog.db = db
+    posted = []
+
+    async def send_response(channel, match, guild, author=None, args=''):
+        posted.append((channel.id, match[0]))
+    cog.send_response = send_response
+
+    def fire(guild_id, trigger_name="hello"):
+        job = ScheduledJob(1, trigger_name, guild_id, 10, 60, 0)
+        return asyncio.run(cog.post_scheduled_trigger(job))
+
+    # Before the cache is ready nothing is dropped
+    assert fire(2)
+    ready[0] = True
+    # Unknown or unavailable guilds keep their jobs; an available guild without the channel does not
+    assert fire(4) and fire(1)
+    assert not fire(2)
+    assert fire(3)
+    assert not fire(3, "missing")
+    assert posted == [(10, "hello")]
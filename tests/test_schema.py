@@ -0,0 +1,88 @@
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.db_manager import DatabaseManager
+from utils.migrate import migrate_file
+from utils.schema import SCHEMA_VERSION
+from utils.trigger_record import TriggerRecord
+
+# A triggers.json as the bot wrote it before the schema header: no header and float timestamps
+BASELINE_TRIGGERS = {
+    "hello": {
+        "creator_id": 123456789012345678,
+        "creator_name": "someone#0001",
+        "created_at": 1700000000.123456,
+        "guild_id": 987654321098765432,
+        "attachment_url": None,
+        "content": "Hi there!"
+    },
+    "cat": {
+        "creator_id": 123456789012345678,
+        "creator_name": "someone#0001",
+        "created_at": 1700000100.5,
+        "guild_id": None,
+        "attachment_url": "https://cdn.discordapp.com/attachments/1/2/cat.png",
+        "content": None
+    }
+}
+
+def write_baseline():
+    """Write a baseline-format data directory into the current directory"""
+    os.makedirs('data', exist_ok=True)
+    with open('data/triggers.json', 'w') as f:
+        json.dump(BASELINE_TRIGGERS, f, indent=2)
+    with open('data/prefixes.json', 'w') as f:
+        json.dump({"987654321098765432": "?"}, f)
+
+def test_baseline_file_loads(tmp_path, monkeypatch):
+    """Every trigger of a baseline file is loaded and the file may be saved again"""
+    monkeypatch.chdir(tmp_path)
+    write_baseline()
+
+    db = DatabaseManager()
+    assert set(db.get_all_triggers()) == {"hello", "cat"}
+    assert db.get_trigger("hello").created_at == 1700000000
+    assert not db.load_failed(db.trigger_path)
+
+    assert db.delete_trigger("cat")
+    with open('data/triggers.json') as f:
+        saved = json.load(f)
+    assert saved["schema"] == SCHEMA_VERSION
+    assert list(saved["triggers"]) == ["hello"]
+
+def test_baseline_file_migrates(tmp_path, monkeypatch):
+    """The migration tool upgrades a baseline file without rejecting any record"""
+    monkeypatch.chdir(tmp_path)
+    write_baseline()
+
+    report = migrate_file('data/triggers.json')
+    assert (report.version, report.records, report.invalid) == (1, 2, 0)
+    assert report.written
+    with open('data/triggers.json') as f:
+        migrated = json.load(f)
+    assert migrated["triggers"]["hello"]["created_at"] == 1700000000
+
+def test_bad_record_does_not_fail_the_file(tmp_path, monkeypatch):
+    """An invalid record is moved aside while the rest load, and empty triggers are kept"""
+    monkeypatch.chdir(tmp_path)
+    write_baseline()
+    with open('data/triggers.json') as f:
+        triggers = json.load(f)
+    triggers["broken"] = {"content": "hi", "guild_id": "not an id"}
+    triggers["empty"] = {"creator_id": 1, "content": None, "attachment_url": None}
+    with open('data/triggers.json', 'w') as f:
+        json.dump(triggers, f)
+
+    db = DatabaseManager()
+    assert set(db.get_all_triggers()) == {"hello", "cat", "empty"}
+    assert not db.load_failed(db.trigger_path)
+    with open(db.invalid_path) as f:
+        assert json.load(f) == {"broken": triggers["broken"]}
+
+    # The file can still be written, and what was written loads again
+    assert db.add_trigger("new", TriggerRecord(content="hey"))
+    assert set(DatabaseManager().get_all_triggers()) == {"hello", "cat", "empty", "new"}
@@ -0,0 +1,95 @@
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import zipfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.snapshots import SnapshotError
+from utils.trigger_record import TriggerRecord
+
+def rewrite_member(path, member, content):
+    """Replace one member of a snapshot and fix up its checksum, as a valid but wrong snapshot"""
+    with zipfile.ZipFile(path) as archive:
+        members = {name: archive.read(name) for name in archive.namelist()}
+    members[member] = content
+    manifest = json.loads(members["manifest.json"])
+    manifest["checksums"][member] = hashlib.sha256(content).hexdigest()
+    members["manifest.json"] = json.dumps(manifest).encode()
+    with zipfile.ZipFile(path, 'w') as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+
+def test_restore_round_trip(make_bot):
+    """Matching settings and schedules come back with the triggers"""
+    async def run():
+        bot = make_bot()
+        bot.db_manager.add_trigger("hello", TriggerRecord(content="hi", guild_id=5))
+        bot.db_manager.set_matching(5, ["punctuation"])
+        job = bot.scheduler.add("hello", 5, 10, 3600)
+        name = await bot.snapshots.create()
+
+        bot.db_manager.delete_trigger("hello")
+        bot.db_manager.delete_matching(5)
+        bot.scheduler.remove(job.job_id)
+
+        await bot.snapshots.restore(name)
+        assert bot.db_manager.trigger_exists("hello")
+        assert bot.db_manager.get_matching(5) == ["punctuation"]
+        assert bot.scheduler.get(job.job_id).trigger_name == "hello"
+
+    asyncio.run(run())
+
+def test_bad_member_changes_nothing(make_bot):
+    """A snapshot with an invalid record is refused before any data is replaced"""
+    async def run():
+        bot = make_bot()
+        bot.db_manager.add_trigger("old", TriggerRecord(content="hi"))
+        name = await bot.snapshots.create()
+        rewrite_member(os.path.join(bot.snapshots.directory, name), "trigger_stats.json", b'{"old": {"hits": "many"}}')
+
+        bot.db_manager.add_trigger("new", TriggerRecord(content="hi"))
+        with pytest.raises(SnapshotError):
+            await bot.snapshots.restore(name)
+        assert bot.db_manager.trigger_exists("new")
+
+    asyncio.run(run())
+
+def test_restore_keeps_snapshots_at_the_retention_limit(make_bot):
+    """Restoring with the retention count full deletes neither the target nor the other good copy"""
+    async def run():
+        bot = make_bot(snapshot_keep=2)
+        bot.db_manager.add_trigger("hello", TriggerRecord(content="hi"))
+        oldest = await bot.snapshots.create("first")
+        newest = await bot.snapshots.create("second")
+        os.utime(os.path.join(bot.snapshots.directory, oldest), (1, 1))
+
+        for _ in range(3):
+            await bot.snapshots.restore(oldest)
+            await asyncio.sleep(0)
+
+        names = [name for name, _, _ in bot.snapshots.list()]
+        assert oldest in names and newest in names
+        assert len([name for name in names if name.endswith("-pre-restore.zip")]) == 1
+
+    asyncio.run(run())
+
+def test_compact_restore_refills_the_prefix_store(make_bot):
+    """Restoring in compact storage puts the snapshot's prefixes back into the prefix store"""
+    async def run():
+        bot = make_bot(storage_format='compact')
+        bot.db_manager.set_prefix(5, "?")
+        name = await bot.snapshots.create()
+
+        bot.db_manager.set_prefix(5, "$")
+        bot.db_manager.set_prefix(6, "%")
+        await bot.snapshots.restore(name)
+        assert bot.db_manager.get_all_prefixes() == {"5": "?"}
+        assert bot.get_guild_prefix(5) == "?"
+
+    asyncio.run(run())
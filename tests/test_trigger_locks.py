@@ -0,0 +1,71 @@
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cogs.trigger_commands import TriggerCommands
+from utils.db_manager import DatabaseManager
+
+class SlowFetcher:
+    """Stands in for the HTTP client; every download takes a while"""
+
+    max_bytes = 2**20
+
+    def __init__(self):
+        self.fetched = []
+
+    async def fetch(self, url):
+        self.fetched.append(url)
+        await asyncio.sleep(0.05)
+        return b''
+
+def test_concurrent_creates_of_one_name(tmp_path, monkeypatch):
+    """The second of two racing creates waits for the first, then is refused without downloading anything"""
+    monkeypatch.chdir(tmp_path)
+    db = DatabaseManager()
+    cog = TriggerCommands.__new__(TriggerCommands)
+    cog.bot = SimpleNamespace(owner_id=1, fetcher=SlowFetcher())
+    cog.db = db
+    replies = []
+
+    async def send(content=None, **kwargs):
+        replies.append(content if content is not None else kwargs['embed'].title)
+
+    def context(author_name):
+        attachment = SimpleNamespace(size=10, url=f"https://cdn.discordapp.com/attachments/1/2/{author_name}.png")
+        return SimpleNamespace(author=SimpleNamespace(id=1, __str__=lambda self: author_name), guild=None,
+                               message=SimpleNamespace(attachments=[attachment]), send=send)
+
+    async def run():
+        await asyncio.gather(*(TriggerCommands.trigger_create.callback(cog, context(author), "cat") for author in ("a", "b")))
+
+    asyncio.run(run())
+    assert sorted(replies) == ["A trigger with the name `cat` already exists.", "Trigger Created"]
+    assert db.get_trigger("cat").attachment_url.endswith("/a.png")
+    assert len(cog.bot.fetcher.fetched) == 1
+
+def test_slash_create_refuses_empty_triggers(tmp_path, monkeypatch):
+    """The slash create command needs content or an attachment, and checks the content's placeholders"""
+    monkeypatch.chdir(tmp_path)
+    db = DatabaseManager()
+    cog = TriggerCommands.__new__(TriggerCommands)
+    cog.bot = SimpleNamespace(owner_id=1, fetcher=SlowFetcher())
+    cog.db = db
+    replies = []
+
+    async def send_message(content=None, **kwargs):
+        replies.append(content)
+    interaction = SimpleNamespace(user=SimpleNamespace(id=1), guild=None,
+                                  response=SimpleNamespace(send_message=send_message))
+
+    async def run():
+        await TriggerCommands.slash_trigger_create.callback(cog, interaction, "empty")
+        await TriggerCommands.slash_trigger_create.callback(cog, interaction, "broken", content="hi {nope}")
+
+    asyncio.run(run())
+    assert replies[0] == "You must provide either text content or an attachment for the trigger."
+    assert replies[1].startswith("Invalid trigger content")
+    assert not db.trigger_exists("empty") and not db.trigger_exists("broken")
@@ -0,0 +1,78 @@
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+import discord
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cogs.trigger_commands import TriggerCommands
+from utils.db_manager import DatabaseManager
+from utils.normalize import get_normalizer
+from utils.trigger_record import TriggerRecord, TriggerScope
+
+def make_cog(tmp_path, monkeypatch):
+    """Build the trigger cog on a scratch database, recording what it would post"""
+    monkeypatch.chdir(tmp_path)
+    db = DatabaseManager()
+    bot = SimpleNamespace(db_manager=db, owner_id=1, trigger_stats=SimpleNamespace(record_hit=lambda *args: None))
+    cog = TriggerCommands.__new__(TriggerCommands)
+    cog.bot = bot
+    cog.db = db
+    cog.sent = []
+
+    async def send_response(channel, match, guild, author=None, args=''):
+        cog.sent.append((match[0], args))
+    cog.send_response = send_response
+    return cog
+
+class Member(discord.Member):
+    """A guild member with a fixed set of roles"""
+
+    def __init__(self, *role_ids):
+        self._role_ids = role_ids
+        self.role_lookups = 0
+
+    def get_role(self, role_id):
+        self.role_lookups += 1
+        return SimpleNamespace(id=role_id) if role_id in self._role_ids else None
+
+def message(content, author=None):
+    """A guild message as seen by the trigger handler"""
+    return SimpleNamespace(content=content, guild=SimpleNamespace(id=5),
+                           channel=SimpleNamespace(id=10, parent_id=None), author=author or Member())
+
+def test_args_follow_the_normalized_match(tmp_path, monkeypatch):
+    """Args come from the message even when normalization changes its words"""
+    cog = make_cog(tmp_path, monkeypatch)
+    cog.db.add_trigger("hug", TriggerRecord(content="{user} hugs {args}"))
+    normalizer = get_normalizer(['punctuation', 'emoji'])
+
+    async def run():
+        # NFKC turns "´" into a space and a combining accent, so the raw text is one word
+        for content in ("hug Someone", "hug! 🎉 Someone", "hug´x"):
+            await cog.check_and_respond_to_trigger(message(content), normalizer(content), normalizer)
+
+    asyncio.run(run())
+    assert cog.sent == [("hug", "Someone"), ("hug", "🎉 Someone"), ("hug", "\u0301x")]
+
+def test_role_scope_reads_member_roles(tmp_path, monkeypatch):
+    """Role-scoped triggers check a member's roles, and authors outside the guild have none"""
+    cog = make_cog(tmp_path, monkeypatch)
+    cog.db.add_trigger("vip", TriggerRecord(content="welcome", scope=TriggerScope(allow_roles=[7])))
+    cog.db.add_trigger("open", TriggerRecord(content="hi", scope=TriggerScope(deny_roles=[8])))
+    normalizer = get_normalizer([])
+
+    # However many roles the author has, only the scope's role is looked up
+    many = Member(7, *range(100, 400))
+
+    async def run():
+        for content, author in (("vip", many), ("vip", Member(8)), ("vip", SimpleNamespace(id=3)),
+                                ("open", Member(8)), ("open", SimpleNamespace(id=3))):
+            await cog.check_and_respond_to_trigger(message(content, author), normalizer(content), normalizer)
+
+    asyncio.run(run())
+    assert cog.sent == [("vip", ""), ("open", "")]
+    assert many.role_lookups == 1
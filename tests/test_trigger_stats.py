@@ -0,0 +1,42 @@
+import asyncio
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.trigger_stats import TriggerStats
+
+def test_failed_flush_keeps_previous_file(tmp_path, monkeypatch):
+    """A flush that fails midway leaves the last complete counters on disk"""
+    async def run():
+        path = str(tmp_path / 'trigger_stats.json')
+        stats = TriggerStats(path, flush_interval=0)
+        stats.record_hit('hello', 1)
+        assert await stats.flush()
+
+        def fail(*args):
+            raise OSError("disk full")
+        monkeypatch.setattr(os, 'replace', fail)
+        stats.record_hit('hello', 1)
+        assert not await stats.flush()
+
+        assert TriggerStats(path).get('hello').hits == 1
+        assert os.listdir(tmp_path) == ['trigger_stats.json']
+
+    asyncio.run(run())
+
+def test_concurrent_writes_use_separate_temp_files(tmp_path):
+    """Two writers of one file never interleave their data"""
+    async def run():
+        path = str(tmp_path / 'trigger_stats.json')
+        stats = TriggerStats(path)
+        payloads = [{f"trigger{number}": {"hits": number, "last_used": 0, "guilds": {}} for number in range(2000)},
+                    {"other": {"hits": 1, "last_used": 0, "guilds": {}}}]
+        for _ in range(20):
+            results = await asyncio.gather(*(asyncio.to_thread(stats._write, payload) for payload in payloads))
+            assert all(results)
+            assert TriggerStats(path).capture_snapshot() in payloads
+        assert os.listdir(tmp_path) == ['trigger_stats.json']
+
+    asyncio.run(run())
@@ -16,3 +16,60 @@ def check_directories():
         if not os.path.exists(init_file):
             with open(init_file, 'w') as f:
                 f.write('# This file is required to make Python treat directories as packages')
+
+
+def resident_memory_bytes():
+    """
+    Utility function to get the resident memory of this process, or None if unknown
+    """
+    import os
+    
+    # Current resident set size on Linux
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    
+    # Peak resident set size elsewhere (kilobytes on most systems, bytes on macOS)
+    try:
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except (ImportError, OSError):
+        return None
+
+
+def atomic_write(path, data):
+    """
+    Utility function to replace a file's contents without readers ever seeing a partial write
+    """
+    import os
+    import stat
+    import tempfile
+    
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    
+    # A unique temporary file per write, so concurrent writers of one file never share it
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f"{os.path.basename(path)}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        
+        # Keep the permissions of the file being replaced rather than the private ones of mkstemp
+        try:
+            mode = stat.S_IMODE(os.stat(path).st_mode)
+        except FileNotFoundError:
+            mode = 0o644
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
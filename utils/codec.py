@@ -0,0 +1,39 @@
+import json
+import logging
+from typing import Any, Union
+
+logger = logging.getLogger('codec')
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Switched on by configure() when fast mode is enabled and orjson is installed
+_use_orjson = False
+
+def configure(fast: bool) -> bool:
+    """Choose the JSON implementation for the data files; returns True if orjson is in use"""
+    global _use_orjson
+    if fast and orjson is None:
+        logger.warning("Fast mode requested but orjson is not installed, using the standard json module")
+    _use_orjson = bool(fast and orjson is not None)
+    return _use_orjson
+
+def dumps(data: Any) -> bytes:
+    """Serialize data in the on-disk format: UTF-8 JSON indented by two spaces"""
+    if _use_orjson:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    return json.dumps(data, indent=2).encode('utf-8')
+
+def dumps_compact(data: Any) -> bytes:
+    """Serialize data as UTF-8 JSON without whitespace"""
+    if _use_orjson:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Parse JSON; decode errors are raised as json.JSONDecodeError with either backend"""
+    if _use_orjson:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -0,0 +1,246 @@
+import mmap
+import os
+import struct
+import zlib
+import logging
+from collections.abc import MutableMapping
+from typing import Any, BinaryIO, Dict, Iterator, Optional, Tuple
+from utils import codec
+from utils.trigger_record import TriggerRecord
+
+logger = logging.getLogger('compact_store')
+
+# File header: magic bytes followed by the format version
+MAGIC = b'TRGS\x01'
+
+# Record header: flags, name length, body length
+RECORD_HEADER = struct.Struct('<BHI')
+
+FLAG_DELETED = 0x01
+FLAG_COMPRESSED = 0x02
+
+class CompactTriggerStore(MutableMapping):
+    """Append-only trigger file with a resident name->offset index
+
+    Only the index lives in Python memory; trigger bodies stay in the
+    memory-mapped data file and are decoded when they are looked up.
+    """
+
+    def __init__(self, path: str, compress_threshold: Optional[int] = 1024):
+        self.path = path
+        self.compress_threshold = compress_threshold
+
+        self._index: Dict[str, int] = {}
+        # Guild of each trigger read so far, so maintenance passes decode each body once
+        self._guilds: Dict[str, Optional[int]] = {}
+        self._dead_bytes = 0
+        self._size = 0
+        self._file = None
+        self._mmap: Optional[mmap.mmap] = None
+
+        self._open()
+
+    def _open(self):
+        """Open the data file, creating it if needed, and rebuild the index"""
+        if not os.path.exists(self.path):
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'wb') as f:
+                f.write(MAGIC)
+            logger.info(f"Created empty {self.path} file")
+
+        self._file = open(self.path, 'r+b')
+        self._size = os.fstat(self._file.fileno()).st_size
+        self._remap()
+
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{self.path} is not a compact trigger store")
+
+        self._scan()
+
+    def _remap(self):
+        """Map the whole data file, replacing any previous mapping"""
+        if self._mmap is not None:
+            self._mmap.close()
+        self._mmap = mmap.mmap(self._file.fileno(), self._size, access=mmap.ACCESS_READ)
+
+    def _record_length(self, offset: int) -> int:
+        """Get the total length of the record starting at offset"""
+        _, name_len, body_len = RECORD_HEADER.unpack_from(self._mmap, offset)
+        return RECORD_HEADER.size + name_len + body_len
+
+    def _scan(self):
+        """Rebuild the index by walking the record headers, skipping bodies"""
+        self._index = {}
+        self._guilds = {}
+        self._dead_bytes = 0
+        offset = len(MAGIC)
+
+        while offset + RECORD_HEADER.size <= self._size:
+            flags, name_len, body_len = RECORD_HEADER.unpack_from(self._mmap, offset)
+            name_start = offset + RECORD_HEADER.size
+            end = name_start + name_len + body_len
+            if end > self._size:
+                break
+
+            name = self._mmap[name_start:name_start + name_len].decode('utf-8')
+
+            # A later record for the same name supersedes the earlier one
+            previous = self._index.pop(name, None)
+            if previous is not None:
+                self._dead_bytes += self._record_length(previous)
+
+            if flags & FLAG_DELETED:
+                self._dead_bytes += end - offset
+            else:
+                self._index[name] = offset
+
+            offset = end
+
+        # Drop a partially written record left behind by a crash
+        if offset < self._size:
+            logger.warning(f"Truncating {self._size - offset} bytes of incomplete data in {self.path}")
+            self._file.truncate(offset)
+            self._size = offset
+            self._remap()
+
+    def _append(self, flags: int, name: str, body: bytes) -> int:
+        """Append a record to the data file and return its offset"""
+        name_bytes = name.encode('utf-8')
+        offset = self._size
+
+        self._file.seek(offset)
+        self._file.write(RECORD_HEADER.pack(flags, len(name_bytes), len(body)) + name_bytes + body)
+        self._file.flush()
+
+        self._size = self._file.tell()
+        self._remap()
+        return offset
+
+    def _encode(self, record: TriggerRecord) -> Tuple[int, bytes]:
+        """Encode a trigger body, compressing it if that pays off"""
+        body = codec.dumps_compact(record.to_dict())
+
+        if self.compress_threshold is not None and len(body) >= self.compress_threshold:
+            compressed = zlib.compress(body)
+            if len(compressed) < len(body):
+                return FLAG_COMPRESSED, compressed
+
+        return 0, body
+
+    def _read(self, name: str) -> Dict[str, Any]:
+        """Decode the stored form of a trigger"""
+        offset = self._index[name]
+        flags, name_len, body_len = RECORD_HEADER.unpack_from(self._mmap, offset)
+        body_start = offset + RECORD_HEADER.size + name_len
+        body = self._mmap[body_start:body_start + body_len]
+
+        if flags & FLAG_COMPRESSED:
+            body = zlib.decompress(body)
+        return codec.loads(body)
+
+    def guild_id(self, name: str) -> Optional[int]:
+        """Get the guild of a trigger without building its record, decoding the body only the first time"""
+        if name in self._guilds:
+            return self._guilds[name]
+        guild_id = self._guilds[name] = self._read(name).get('guild_id')
+        return guild_id
+
+    # ------ Mapping Interface ------
+
+    def __getitem__(self, name: str) -> TriggerRecord:
+        return TriggerRecord.from_dict(self._read(name))
+
+    def __setitem__(self, name: str, record: TriggerRecord):
+        flags, body = self._encode(record)
+        offset = self._append(flags, name, body)
+        self._guilds[name] = record.guild_id
+
+        previous = self._index.get(name)
+        if previous is not None:
+            self._dead_bytes += self._record_length(previous)
+        self._index[name] = offset
+
+        self._maybe_compact()
+
+    def __delitem__(self, name: str):
+        previous = self._index[name]
+        tombstone = self._append(FLAG_DELETED, name, b'')
+
+        self._dead_bytes += self._record_length(previous) + self._record_length(tombstone)
+        del self._index[name]
+        self._guilds.pop(name, None)
+
+        self._maybe_compact()
+
+    def __contains__(self, name: object) -> bool:
+        # Answer from the index without decoding the body
+        return name in self._index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._index))
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    # ------ Maintenance ------
+
+    def _maybe_compact(self):
+        """Compact once superseded records make up most of the file"""
+        if self._dead_bytes > 64 * 1024 and self._dead_bytes > self._size // 2:
+            self.compact()
+
+    def compact(self):
+        """Rewrite the data file with only the live records"""
+        tmp_path = f"{self.path}.tmp"
+        new_index: Dict[str, int] = {}
+
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC)
+            for name, offset in self._index.items():
+                new_index[name] = f.tell()
+                f.write(self._mmap[offset:offset + self._record_length(offset)])
+            f.flush()
+            os.fsync(f.fileno())
+
+        self._mmap.close()
+        self._mmap = None
+        self._file.close()
+        os.replace(tmp_path, self.path)
+
+        self._file = open(self.path, 'r+b')
+        self._size = os.fstat(self._file.fileno()).st_size
+        self._remap()
+        self._index = new_index
+
+        logger.info(f"Compacted {self.path}: reclaimed {self._dead_bytes} bytes")
+        self._dead_bytes = 0
+
+    def open_snapshot(self) -> Tuple[BinaryIO, int]:
+        """Open the current data file for a point-in-time copy
+
+        Records are only ever appended and compaction swaps in a new file, so
+        the first `size` bytes of the returned handle never change.
+        """
+        return open(self.path, 'rb'), self._size
+
+    def reopen(self):
+        """Re-read the data file after it was replaced on disk"""
+        self.close()
+        self._open()
+
+    def stats(self) -> Dict[str, int]:
+        """Get the size of the store"""
+        return {
+            "triggers": len(self._index),
+            "file_bytes": self._size,
+            "dead_bytes": self._dead_bytes
+        }
+
+    def close(self):
+        """Release the mapping and the file handle"""
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -1,19 +1,88 @@
+import asyncio
 import json
 import os
+import sqlite3
 import logging
-from typing import Dict, List, Optional, Any, Union
+import weakref
+from types import MappingProxyType
+from typing import Dict, List, Optional, Any, Union, Tuple, Mapping, MutableMapping, Set
+import utils
+from utils import codec
+from utils.compact_store import CompactTriggerStore
+from utils.prefix_store import PrefixStore
+from utils.trigger_record import TriggerRecord
+from utils.responses import ResponsePicker
+from utils.normalize import OPTIONAL_STEPS, STANDARD, Normalizer, get_normalizer
+from utils.schema import SchemaError, parse_triggers, wrap_triggers
+from utils.tracing import span
 
 logger = logging.getLogger('db_manager')
 
 class DatabaseManager:
-    """Manages the database for the trigger bot"""
+    """Manages the database for the trigger bot
     
-    def __init__(self, trigger_path: str = 'data/triggers.json', prefix_path: str = 'data/prefixes.json'):
+    Every mutation is applied to memory synchronously, so check-and-write
+    methods such as add_trigger and update_trigger are atomic on the event
+    loop. Saving is write-behind: bursts of writes are coalesced into one
+    atomic file replace per data file, serialized in a worker thread.
+    
+    A data file that exists but cannot be parsed is never overwritten: the
+    bot starts without its contents and refuses to save it until it has
+    been fixed and reloaded, or migrated with `python -m utils.migrate`.
+    """
+    
+    def __init__(self, trigger_path: str = 'data/triggers.json', prefix_path: str = 'data/prefixes.json',
+                 storage_format: str = 'json', compress_threshold: Optional[int] = 1024,
+                 save_delay: float = 0.5, matching_path: str = 'data/matching.json'):
         self.trigger_path = trigger_path
         self.prefix_path = prefix_path
+        self.matching_path = matching_path
+        # Records of the triggers file that fail validation are moved here instead of failing the whole file
+        self.invalid_path = os.path.splitext(trigger_path)[0] + '.invalid.json'
+        self.storage_format = storage_format
+        self.compact_store: Optional[CompactTriggerStore] = None
+        self.prefix_store: Optional[PrefixStore] = None
+        self.save_delay = save_delay
+        
+        # Write-behind state: files with unsaved changes, their flush tasks and write locks
+        self._dirty: Set[str] = set()
+        self._flush_tasks: Dict[str, asyncio.Task] = {}
+        self._write_locks: Dict[str, asyncio.Lock] = {}
+        
+        # Per-trigger writer locks, dropped once no writer holds a reference
+        self._trigger_locks: 'weakref.WeakValueDictionary[str, asyncio.Lock]' = weakref.WeakValueDictionary()
+        
+        # (mtime_ns, size) of each data file as of our last load or save
+        self._signatures: Dict[str, Optional[Tuple[int, int]]] = {}
+        
+        # Bumped on every save so a reload parsed before the save can be discarded
+        self.write_generation = 0
+        
+        # Data files that failed to load; saving them would destroy what they hold
+        self._load_failed: Set[str] = set()
         
         # Ensure the directories and files exist
         self._initialize_data_files()
+        
+        # In-memory state, kept in sync with the files on every save and reload
+        self._triggers: Dict[str, TriggerRecord] = {}
+        self._prefixes: MutableMapping[str, str] = {}
+        self._matching: Dict[str, List[str]] = {}
+        
+        # Normalized name -> trigger names claiming it in creation order, one index per normalization pipeline in use
+        self._indexes: Dict[Normalizer, Dict[str, List[str]]] = {}
+        
+        # Compiled responses, filled on create or on first use and dropped on change
+        self._pickers: Dict[str, ResponsePicker] = {}
+        if storage_format == 'compact':
+            self._set_triggers(self._open_compact_store(compress_threshold))
+        else:
+            self._set_triggers(self._load_triggers())
+        if storage_format == 'compact':
+            self._prefixes = self._open_prefix_store()
+        else:
+            self._prefixes = self._load_prefixes()
+        self._matching = self._load_matching()
     
     def _initialize_data_files(self):
         """Initialize necessary data files and directories"""
@@ -23,7 +92,7 @@ class DatabaseManager:
         # Initialize triggers.json if it doesn't exist
         if not os.path.exists(self.trigger_path):
             with open(self.trigger_path, 'w') as f:
-                json.dump({}, f, indent=2)
+                json.dump(wrap_triggers({}), f, indent=2)
                 logger.info(f"Created empty {self.trigger_path} file")
         
         # Initialize prefixes.json if it doesn't exist
@@ -32,149 +101,670 @@ class DatabaseManager:
                 json.dump({}, f, indent=2)
                 logger.info(f"Created empty {self.prefix_path} file")
     
-    def _load_triggers(self) -> Dict[str, Dict[str, Any]]:
-        """Load triggers from the database"""
+    @staticmethod
+    def _stat_signature(path: str) -> Optional[Tuple[int, int]]:
+        """Get the (mtime_ns, size) pair used to detect changes to a file"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+    
+    def _load_triggers(self) -> Dict[str, TriggerRecord]:
+        """Load triggers from the database, upgrading older schema versions in memory"""
         try:
-            with open(self.trigger_path, 'r') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError) as e:
-            logger.error(f"Error loading triggers: {str(e)}")
+            self._signatures[self.trigger_path] = self._stat_signature(self.trigger_path)
+            with open(self.trigger_path, 'rb') as f:
+                data = codec.loads(f.read())
+            invalid: Dict[str, Any] = {}
+            triggers = parse_triggers(data, invalid)
+            if invalid:
+                self._quarantine(invalid)
+            return triggers
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            # Covers decode errors and a file whose structure does not match the schema
+            self._refuse_saving(self.trigger_path, e)
             return {}
     
-    def _save_triggers(self, triggers: Dict[str, Dict[str, Any]]) -> bool:
+    def _quarantine(self, records: Dict[str, Any]):
+        """Keep the stored form of invalid triggers in a side file, so saving the triggers file does not lose them
+        
+        If the side file cannot be written, the triggers file is protected
+        from saving instead. Safe to call from a worker thread.
+        """
+        try:
+            try:
+                with open(self.invalid_path, 'rb') as f:
+                    kept = codec.loads(f.read())
+            except FileNotFoundError:
+                kept = {}
+            if not isinstance(kept, dict):
+                raise ValueError("Top level is not an object")
+            kept.update(records)
+            utils.atomic_write(self.invalid_path, codec.dumps(kept))
+        except (OSError, ValueError) as e:
+            self._refuse_saving(self.trigger_path, e)
+            return
+        logger.warning(f"Moved {len(records)} invalid triggers from {self.trigger_path} to {self.invalid_path}; "
+                       f"fix them there and add them back")
+    
+    def _save_triggers(self) -> bool:
         """Save triggers to the database"""
+        return self._schedule_save(self.trigger_path)
+    
+    def _open_compact_store(self, compress_threshold: Optional[int]) -> CompactTriggerStore:
+        """Open the compact trigger store, importing triggers.json the first time"""
+        store_path = os.path.splitext(self.trigger_path)[0] + '.dat'
+        self.compact_store = CompactTriggerStore(store_path, compress_threshold=compress_threshold)
+        
+        if len(self.compact_store) == 0:
+            triggers = self._load_triggers()
+            for name, data in triggers.items():
+                self.compact_store[name] = data
+            if triggers:
+                logger.info(f"Imported {len(triggers)} triggers from {self.trigger_path} into {store_path}")
+        
+        return self.compact_store
+    
+    def _open_prefix_store(self) -> PrefixStore:
+        """Open the prefix database, importing prefixes.json the first time"""
+        store_path = os.path.splitext(self.prefix_path)[0] + '.db'
+        self.prefix_store = PrefixStore(store_path)
+        
+        if not self.prefix_store:
+            prefixes = self._load_prefixes()
+            if prefixes:
+                self.prefix_store.replace_all(prefixes)
+                logger.info(f"Imported {len(prefixes)} prefixes from {self.prefix_path} into {store_path}")
+        
+        return self.prefix_store
+    
+    def _store_trigger(self, name: str, record: TriggerRecord) -> bool:
+        """Write a single trigger to storage; nothing changes if it cannot be saved"""
+        if self.compact_store is None:
+            if not self._writable(self.trigger_path):
+                return False
+            self._compile(name, record)
+            self._triggers[name] = record
+            return self._save_triggers()
+        
+        self._compile(name, record)
+        
         try:
-            # Ensure directory exists
-            os.makedirs(os.path.dirname(self.trigger_path), exist_ok=True)
-            
-            with open(self.trigger_path, 'w') as f:
-                json.dump(triggers, f, indent=2)
+            self.compact_store[name] = record
             return True
-        except Exception as e:
-            logger.error(f"Error saving triggers: {str(e)}")
+        except OSError as e:
+            logger.error(f"Error saving trigger {name}: {str(e)}")
+            return False
+    
+    def _remove_trigger(self, name: str) -> bool:
+        """Remove a single trigger from storage; nothing changes if it cannot be saved"""
+        if self.compact_store is None and not self._writable(self.trigger_path):
+            return False
+        self._pickers.pop(name, None)
+        if self.compact_store is None:
+            del self._triggers[name]
+            return self._save_triggers()
+        
+        try:
+            del self.compact_store[name]
+            return True
+        except OSError as e:
+            logger.error(f"Error deleting trigger {name}: {str(e)}")
             return False
     
     def _load_prefixes(self) -> Dict[str, str]:
         """Load server prefixes from the database"""
         try:
-            with open(self.prefix_path, 'r') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError) as e:
-            logger.error(f"Error loading prefixes: {str(e)}")
+            self._signatures[self.prefix_path] = self._stat_signature(self.prefix_path)
+            with open(self.prefix_path, 'rb') as f:
+                data = codec.loads(f.read())
+            if not isinstance(data, dict):
+                raise SchemaError("Top level is not an object")
+            return data
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            self._refuse_saving(self.prefix_path, e)
             return {}
     
-    def _save_prefixes(self, prefixes: Dict[str, str]) -> bool:
-        """Save server prefixes to the database"""
+    def _load_matching(self) -> Dict[str, List[str]]:
+        """Load the normalization steps of each guild"""
         try:
-            # Ensure directory exists
-            os.makedirs(os.path.dirname(self.prefix_path), exist_ok=True)
-            
-            with open(self.prefix_path, 'w') as f:
-                json.dump(prefixes, f, indent=2)
+            self._signatures[self.matching_path] = self._stat_signature(self.matching_path)
+            with open(self.matching_path, 'rb') as f:
+                data = codec.loads(f.read())
+            if not isinstance(data, dict):
+                raise SchemaError("Top level is not an object")
+            for guild_id, steps in data.items():
+                if not isinstance(steps, list) or not set(steps) <= set(OPTIONAL_STEPS):
+                    raise SchemaError(f"Invalid normalization steps for guild {guild_id}")
+            return data
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            self._refuse_saving(self.matching_path, e)
+            return {}
+    
+    def _refuse_saving(self, path: str, error: Exception):
+        """Stop a data file that failed to load from being overwritten"""
+        self._load_failed.add(path)
+        logger.error(f"Could not load {path}: {str(error)}. Starting without its data; it will not be saved "
+                     f"until it is fixed, so nothing in it is lost")
+    
+    def _writable(self, path: str) -> bool:
+        """Check that a data file may be saved before changing what it holds in memory"""
+        if path in self._load_failed:
+            logger.error(f"Not changing {path}: it failed to load and would be overwritten. Fix the file so it is reloaded")
+            return False
+        return True
+    
+    def load_failed(self, path: str) -> bool:
+        """Check whether a data file is protected from saving because it failed to load"""
+        return path in self._load_failed
+    
+    def _save_prefixes(self) -> bool:
+        """Save server prefixes to the database; the prefix store commits its own writes"""
+        if self.prefix_store is not None:
             return True
-        except Exception as e:
-            logger.error(f"Error saving prefixes: {str(e)}")
+        return self._schedule_save(self.prefix_path)
+    
+    def _save_matching(self) -> bool:
+        """Save the normalization steps of each guild"""
+        return self._schedule_save(self.matching_path)
+    
+    # ------ Write-behind Saving ------
+    
+    def _schedule_save(self, path: str) -> bool:
+        """Mark a data file as changed and save it shortly, off the event loop
+        
+        Without a running event loop (scripts, tools) the file is written
+        immediately instead. Files that failed to load are never written.
+        """
+        if path in self._load_failed:
+            logger.error(f"Not saving {path}: it failed to load and would be overwritten. Fix the file so it is reloaded")
             return False
+        
+        self._dirty.add(path)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._dirty.discard(path)
+            signature = self._write_data(path, self._capture(path))
+            self.write_generation += 1
+            if signature is None:
+                return False
+            self._signatures[path] = signature
+            return True
+        
+        if path not in self._flush_tasks:
+            self._flush_tasks[path] = loop.create_task(self._flush_later(path), name=f"save-{os.path.basename(path)}")
+        return True
+    
+    def _capture(self, path: str) -> Dict[str, Any]:
+        """Take a shallow copy of the state saved to a file; records are immutable, so this is consistent"""
+        if path == self.trigger_path:
+            return dict(self._triggers)
+        if path == self.matching_path:
+            return dict(self._matching)
+        return dict(self._prefixes)
+    
+    def _write_data(self, path: str, data: Dict[str, Any]) -> Optional[Tuple[int, int]]:
+        """Serialize and atomically write a data file; returns its new signature, or None on failure
+        
+        Safe to call from a worker thread.
+        """
+        try:
+            if path == self.trigger_path:
+                content = codec.dumps(wrap_triggers({name: record.to_dict() for name, record in data.items()}))
+            else:
+                content = codec.dumps(data)
+            utils.atomic_write(path, content)
+            return self._stat_signature(path)
+        except Exception as e:
+            logger.error(f"Error saving {path}: {str(e)}")
+            return None
+    
+    async def _flush_later(self, path: str):
+        """Wait for more writes to coalesce, then save; repeats while writes keep arriving"""
+        try:
+            while path in self._dirty:
+                await asyncio.sleep(self.save_delay)
+                if not await self._flush(path):
+                    # Back off instead of retrying a failing disk every few hundred milliseconds
+                    await asyncio.sleep(max(self.save_delay, 5.0))
+        finally:
+            self._flush_tasks.pop(path, None)
+    
+    async def _flush(self, path: str) -> bool:
+        """Write out a data file now if it has unsaved changes"""
+        lock = self._write_locks.setdefault(path, asyncio.Lock())
+        async with lock:
+            if path not in self._dirty:
+                return True
+            
+            self._dirty.discard(path)
+            data = self._capture(path)
+            
+            # Bumped before and after so a hot reload overlapping the write is discarded
+            self.write_generation += 1
+            signature = await asyncio.to_thread(self._write_data, path, data)
+            self.write_generation += 1
+            
+            if signature is None:
+                self._dirty.add(path)
+                return False
+            self._signatures[path] = signature
+            return True
+    
+    async def flush(self) -> bool:
+        """Write out every data file with unsaved changes; call before shutting down"""
+        success = True
+        for path in (self.trigger_path, self.prefix_path, self.matching_path):
+            success = await self._flush(path) and success
+        return success
+    
+    def save_pending(self, path: str) -> bool:
+        """Check whether a data file has changes that are not on disk yet"""
+        return path in self._dirty or path in self._flush_tasks
+    
+    def trigger_lock(self, name: str) -> asyncio.Lock:
+        """Get the writer lock of a trigger name
+        
+        Hold it across awaits in a read-modify-write, e.g. between checking a
+        name and creating it. Readers never take it, and writers to other
+        triggers are not held up.
+        """
+        lock = self._trigger_locks.get(name)
+        if lock is None:
+            lock = self._trigger_locks[name] = asyncio.Lock()
+        return lock
+    
+    # ------ In-memory State ------
+    
+    def _set_triggers(self, triggers: Union[Dict[str, TriggerRecord], CompactTriggerStore]):
+        """Replace the in-memory triggers and drop the lookup indexes, which are rebuilt on use"""
+        self._triggers = triggers
+        self._pickers = {}
+        self._indexes = {}
+        self._index_for(STANDARD)
+    
+    def _compile(self, name: str, record: TriggerRecord) -> ResponsePicker:
+        """Compile and cache a trigger's response templates and alias table"""
+        picker = self._pickers[name] = ResponsePicker(record)
+        return picker
+    
+    def _index_for(self, normalizer: Normalizer) -> Dict[str, List[str]]:
+        """Get the lookup index of a normalization pipeline, building it on first use
+        
+        Once built, an index is kept up to date on every write, so each
+        trigger name is normalized once per pipeline rather than per message.
+        The first trigger to claim a key matches; the others wait behind it,
+        so removing the first hands the key over without rescanning.
+        """
+        index = self._indexes.get(normalizer)
+        if index is None:
+            index = self._indexes[normalizer] = {}
+            for name in self._triggers:
+                key = normalizer(name)
+                if key:
+                    index.setdefault(key, []).append(name)
+        return index
+    
+    def _index_add(self, name: str):
+        """Add a trigger name to every lookup index"""
+        for normalizer, index in self._indexes.items():
+            key = normalizer(name)
+            if key:
+                names = index.setdefault(key, [])
+                if name not in names:
+                    names.append(name)
+    
+    def _index_remove(self, name: str):
+        """Remove a trigger name from every lookup index"""
+        for normalizer, index in self._indexes.items():
+            key = normalizer(name)
+            names = index.get(key)
+            if names is None or name not in names:
+                continue
+            names.remove(name)
+            if not names:
+                del index[key]
+    
+    def find_collision(self, name: str) -> Optional[str]:
+        """Find an existing trigger that would match the same messages as a new name
+        
+        Checks the standard pipeline and every distinct pipeline a guild has chosen.
+        """
+        pipelines = {STANDARD}
+        pipelines.update(get_normalizer(steps) for steps in {tuple(steps) for steps in self._matching.values()})
+        for normalizer in pipelines:
+            key = normalizer(name)
+            names = self._index_for(normalizer).get(key) if key else None
+            if names and names[0] != name:
+                return names[0]
+        return None
+    
+    def collisions(self, normalizer: Normalizer) -> Dict[str, List[str]]:
+        """Group the trigger names that share a key under a pipeline; only the first of each group can match"""
+        return {names[0]: names[1:] for names in self._index_for(normalizer).values() if len(names) > 1}
+    
+    # ------ Hot Reload Methods ------
+    
+    def file_changed(self, path: str) -> bool:
+        """Check whether a data file was modified since we last loaded or saved it"""
+        return self._stat_signature(path) != self._signatures.get(path)
+    
+    def read_data_file(self, path: str) -> Tuple[Optional[Dict[str, Any]], Optional[Tuple[int, int]]]:
+        """Parse a data file without touching the in-memory state
+        
+        Safe to call from a worker thread. Returns (None, None) if the file
+        could not be parsed, e.g. because it is being written.
+        """
+        signature = self._stat_signature(path)
+        try:
+            with open(path, 'rb') as f:
+                data = codec.loads(f.read())
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not reload {path}: {str(e)}")
+            return None, None
+        if not isinstance(data, dict):
+            logger.warning(f"Could not reload {path}: top level is not an object")
+            return None, None
+        return data, signature
+    
+    def read_trigger_file(self) -> Tuple[Optional[Dict[str, TriggerRecord]], Optional[Tuple[int, int]]]:
+        """Parse the triggers file into records without touching the in-memory state
+        
+        Safe to call from a worker thread, like read_data_file.
+        """
+        data, signature = self.read_data_file(self.trigger_path)
+        if data is None:
+            return None, None
+        try:
+            invalid: Dict[str, Any] = {}
+            triggers = parse_triggers(data, invalid)
+        except (AttributeError, TypeError, ValueError) as e:
+            logger.warning(f"Could not reload {self.trigger_path}: {str(e)}")
+            return None, None
+        if invalid:
+            self._quarantine(invalid)
+        return triggers, signature
+    
+    @staticmethod
+    def _diff(old: Dict[str, Any], new: Dict[str, Any]) -> Tuple[List[str], List[str], List[str]]:
+        """Compute the added, changed and removed keys between two mappings"""
+        added = [key for key in new if key not in old]
+        changed = [key for key in new if key in old and old[key] != new[key]]
+        removed = [key for key in old if key not in new]
+        return added, changed, removed
+    
+    def apply_trigger_snapshot(self, triggers: Dict[str, TriggerRecord], signature: Optional[Tuple[int, int]]) -> Tuple[List[str], List[str], List[str]]:
+        """Apply a freshly parsed triggers file, touching only the entries that differ"""
+        added, changed, removed = self._diff(self._triggers, triggers)
+        
+        for name in removed:
+            del self._triggers[name]
+            self._pickers.pop(name, None)
+            self._index_remove(name)
+        for name in added:
+            self._triggers[name] = triggers[name]
+            self._index_add(name)
+        for name in changed:
+            self._triggers[name] = triggers[name]
+            self._pickers.pop(name, None)
+        
+        # A file that parses again may be saved again
+        self._load_failed.discard(self.trigger_path)
+        self._signatures[self.trigger_path] = signature
+        return added, changed, removed
+    
+    def apply_prefix_snapshot(self, prefixes: Dict[str, str], signature: Optional[Tuple[int, int]]) -> Tuple[List[str], List[str], List[str]]:
+        """Apply a freshly parsed prefixes file, touching only the entries that differ"""
+        added, changed, removed = self._diff(self._prefixes, prefixes)
+        
+        for guild_id in removed:
+            del self._prefixes[guild_id]
+        for guild_id in added + changed:
+            self._prefixes[guild_id] = prefixes[guild_id]
+        
+        self._load_failed.discard(self.prefix_path)
+        self._signatures[self.prefix_path] = signature
+        return added, changed, removed
+    
+    # ------ Snapshot Methods ------
+    
+    @property
+    def trigger_store_path(self) -> str:
+        """Path of the file that holds the triggers in the active storage format"""
+        return self.compact_store.path if self.compact_store is not None else self.trigger_path
+    
+    def capture_snapshot(self) -> Dict[str, Any]:
+        """Capture a point-in-time view of the data without copying records
+        
+        Records are never mutated in place, so shallow copies stay consistent
+        while later writes go ahead. The compact store hands out a file handle
+        and the length valid at this moment instead.
+        """
+        if self.compact_store is not None:
+            handle, size = self.compact_store.open_snapshot()
+            triggers = {"handle": handle, "size": size}
+        else:
+            triggers = dict(self._triggers)
+        
+        return {
+            "storage_format": self.storage_format,
+            "triggers": triggers,
+            "prefixes": dict(self._prefixes),
+            "matching": dict(self._matching)
+        }
+    
+    def install_state(self, triggers: Optional[Dict[str, TriggerRecord]], prefixes: Dict[str, str],
+                      matching: Optional[Dict[str, List[str]]] = None):
+        """Adopt data restored onto disk; triggers is None for the compact format, which is re-read
+        
+        matching is None for snapshots taken before it was saved, which keep the current settings.
+        """
+        if self.compact_store is not None:
+            self.compact_store.reopen()
+            self._set_triggers(self.compact_store)
+        else:
+            self._set_triggers(triggers)
+        if self.prefix_store is not None:
+            self.prefix_store.replace_all(prefixes)
+        else:
+            self._prefixes = prefixes
+        if matching is not None:
+            self._matching = matching
+        self._load_failed.clear()
+        
+        # Make pending hot reloads discard what they parsed before the swap
+        self.write_generation += 1
+        self._signatures[self.trigger_path] = self._stat_signature(self.trigger_path)
+        self._signatures[self.prefix_path] = self._stat_signature(self.prefix_path)
+        self._signatures[self.matching_path] = self._stat_signature(self.matching_path)
+        
+        # A save that was already in flight may land on top of the restored files; save again after it
+        if any(lock.locked() for lock in self._write_locks.values()):
+            if self.compact_store is None:
+                self._save_triggers()
+            self._save_prefixes()
+            self._save_matching()
     
     # ------ Trigger Management Methods ------
     
     def trigger_exists(self, name: str) -> bool:
         """Check if a trigger exists"""
-        triggers = self._load_triggers()
-        return name in triggers
+        return name in self._triggers
     
-    def add_trigger(self, name: str, data: Dict[str, Any]) -> bool:
-        """Add a new trigger to the database"""
-        triggers = self._load_triggers()
-        
+    def add_trigger(self, name: str, record: TriggerRecord) -> bool:
+        """Add a new trigger to the database if no trigger has the name yet"""
         # Check if trigger already exists
-        if name in triggers:
+        if name in self._triggers:
             return False
         
-        # Add the trigger
-        triggers[name] = data
-        
-        # Save the updated triggers
-        return self._save_triggers(triggers)
+        # Add and save the trigger
+        success = self._store_trigger(name, record)
+        if name in self._triggers:
+            self._index_add(name)
+        return success
     
     def delete_trigger(self, name: str) -> bool:
         """Delete a trigger from the database"""
-        triggers = self._load_triggers()
-        
         # Check if trigger exists
-        if name not in triggers:
+        if name not in self._triggers:
             return False
         
-        # Delete the trigger
-        del triggers[name]
+        # Delete the trigger and save
+        success = self._remove_trigger(name)
+        if name not in self._triggers:
+            self._index_remove(name)
+        return success
+    
+    def delete_triggers(self, names: List[str]) -> int:
+        """Delete several triggers with a single save; returns how many were deleted"""
+        names = [name for name in names if name in self._triggers]
+        if not names:
+            return 0
+        
+        if self.compact_store is None:
+            if not self._writable(self.trigger_path):
+                return 0
+            for name in names:
+                del self._triggers[name]
+                self._pickers.pop(name, None)
+                self._index_remove(name)
+            return len(names) if self._save_triggers() else 0
         
-        # Save the updated triggers
-        return self._save_triggers(triggers)
+        deleted = 0
+        for name in names:
+            if self._remove_trigger(name):
+                deleted += 1
+            if name not in self._triggers:
+                self._index_remove(name)
+        return deleted
     
-    def update_trigger(self, name: str, data: Dict[str, Any]) -> bool:
-        """Update an existing trigger in the database"""
-        triggers = self._load_triggers()
+    def update_trigger(self, name: str, changes: Dict[str, Any], expected_version: Optional[int] = None) -> bool:
+        """Update fields of an existing trigger in the database
         
+        With expected_version, the update only applies if the trigger has not
+        changed since that version was read.
+        """
         # Check if trigger exists
-        if name not in triggers:
+        current = self._triggers.get(name)
+        if current is None:
             return False
         
-        # Update the trigger
-        triggers[name].update(data)
+        # Check that nobody else updated it in the meantime
+        if expected_version is not None and current.version != expected_version:
+            return False
         
-        # Save the updated triggers
-        return self._save_triggers(triggers)
+        # Update the trigger and save it
+        record = current.replace(**changes, version=current.version + 1)
+        return self._store_trigger(name, record)
     
-    def get_trigger(self, name: str) -> Optional[Dict[str, Any]]:
+    def get_trigger(self, name: str) -> Optional[TriggerRecord]:
         """Get a specific trigger from the database"""
-        triggers = self._load_triggers()
-        return triggers.get(name)
+        return self._triggers.get(name)
     
-    def get_all_triggers(self) -> Dict[str, Dict[str, Any]]:
-        """Get all triggers from the database"""
-        return self._load_triggers()
+    def find_trigger(self, key: str, normalizer: Normalizer = STANDARD) -> Optional[Tuple[str, TriggerRecord]]:
+        """Find the trigger whose name matches a message already run through the normalizer"""
+        names = self._index_for(normalizer).get(key)
+        if not names:
+            return None
+        name = names[0]
+        
+        # Compact storage decodes the record from the mapped file here
+        with span('storage'):
+            return name, self._triggers[name]
     
-    def get_triggers_by_creator(self, creator_id: int) -> Dict[str, Dict[str, Any]]:
+    def get_picker(self, name: str, record: TriggerRecord) -> ResponsePicker:
+        """Get the compiled responses of a trigger, compiling them on first use after a load"""
+        picker = self._pickers.get(name)
+        if picker is None:
+            picker = self._compile(name, record)
+        return picker
+    
+    def get_trigger_guild(self, name: str) -> Optional[int]:
+        """Get the guild a trigger was created in; compact storage decodes each trigger at most once for this"""
+        if self.compact_store is not None:
+            return self.compact_store.guild_id(name) if name in self.compact_store else None
+        record = self._triggers.get(name)
+        return record.guild_id if record is not None else None
+    
+    def get_all_triggers(self) -> Mapping[str, TriggerRecord]:
+        """Get a read-only view of all triggers; compact storage decodes entries on access"""
+        return MappingProxyType(self._triggers)
+    
+    def get_triggers_by_creator(self, creator_id: int) -> Dict[str, TriggerRecord]:
         """Get all triggers created by a specific user"""
-        triggers = self._load_triggers()
-        return {name: data for name, data in triggers.items() if data.get('creator_id') == creator_id}
+        return {name: record for name, record in self._triggers.items() if record.creator_id == creator_id}
     
-    def get_triggers_by_guild(self, guild_id: int) -> Dict[str, Dict[str, Any]]:
+    def get_triggers_by_guild(self, guild_id: int) -> Dict[str, TriggerRecord]:
         """Get all triggers created in a specific guild"""
-        triggers = self._load_triggers()
-        return {name: data for name, data in triggers.items() if data.get('guild_id') == guild_id}
+        return {name: record for name, record in self._triggers.items() if record.guild_id == guild_id}
     
     # ------ Server Prefix Methods ------
     
     def get_prefix(self, guild_id: Union[int, str], default_prefix: str = '!') -> str:
         """Get the prefix for a specific guild"""
-        prefixes = self._load_prefixes()
-        return prefixes.get(str(guild_id), default_prefix)
+        return self._prefixes.get(str(guild_id), default_prefix)
     
     def set_prefix(self, guild_id: Union[int, str], prefix: str) -> bool:
         """Set the prefix for a specific guild"""
-        prefixes = self._load_prefixes()
+        if not self._writable(self.prefix_path):
+            return False
         
         # Update the prefix
-        prefixes[str(guild_id)] = prefix
+        try:
+            self._prefixes[str(guild_id)] = prefix
+        except sqlite3.Error as e:
+            logger.error(f"Error saving prefix of guild {guild_id}: {str(e)}")
+            return False
         
         # Save the updated prefixes
-        return self._save_prefixes(prefixes)
+        return self._save_prefixes()
     
     def delete_prefix(self, guild_id: Union[int, str]) -> bool:
         """Delete the prefix for a specific guild (resets to default)"""
-        prefixes = self._load_prefixes()
-        
         # Check if prefix exists
-        if str(guild_id) not in prefixes:
+        if str(guild_id) not in self._prefixes or not self._writable(self.prefix_path):
             return False
         
         # Delete the prefix
-        del prefixes[str(guild_id)]
+        try:
+            del self._prefixes[str(guild_id)]
+        except sqlite3.Error as e:
+            logger.error(f"Error deleting prefix of guild {guild_id}: {str(e)}")
+            return False
         
         # Save the updated prefixes
-        return self._save_prefixes(prefixes)
+        return self._save_prefixes()
     
     def get_all_prefixes(self) -> Dict[str, str]:
         """Get all server prefixes"""
-        return self._load_prefixes()
+        return dict(self._prefixes)
+    
+    # ------ Match Normalization Methods ------
+    
+    def get_matching(self, guild_id: Union[int, str]) -> List[str]:
+        """Get the optional normalization steps of a guild; empty for the standard pipeline"""
+        return list(self._matching.get(str(guild_id), []))
+    
+    def set_matching(self, guild_id: Union[int, str], steps: List[str]) -> bool:
+        """Set the optional normalization steps of a guild; no steps resets it to the standard pipeline"""
+        if not steps:
+            return self.delete_matching(guild_id)
+        if not self._writable(self.matching_path):
+            return False
+        self._matching[str(guild_id)] = [step for step in OPTIONAL_STEPS if step in steps]
+        return self._save_matching()
+    
+    def delete_matching(self, guild_id: Union[int, str]) -> bool:
+        """Reset a guild to the standard normalization pipeline"""
+        if str(guild_id) not in self._matching or not self._writable(self.matching_path):
+            return False
+        del self._matching[str(guild_id)]
+        return self._save_matching()
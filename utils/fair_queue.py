@@ -0,0 +1,155 @@
+import asyncio
+import heapq
+import time
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, List, Set, Tuple
+
+logger = logging.getLogger('fair_queue')
+
+OVERLOAD_MODES = ('drop', 'coalesce')
+
+class FairDispatcher:
+    """Bounded per-guild queues served round-robin by a fixed pool of workers
+
+    Each guild has its own queue and at most one item in flight, so its work
+    runs in order and can never hold more than one worker. A guild goes to
+    the back of the line after every item, which keeps a busy guild from
+    delaying the others: it only waits behind its own backlog.
+
+    When a guild's queue is full, `drop` refuses the new item. `coalesce`
+    first merges an item into an identical one that is already waiting,
+    then drops the oldest waiting item so the newest work wins.
+    """
+
+    def __init__(self, handler: Callable[[Any], Awaitable[None]], workers: int = 8,
+                 max_depth: int = 50, overload: str = 'drop'):
+        if overload not in OVERLOAD_MODES:
+            raise ValueError(f"Overload mode must be one of {', '.join(OVERLOAD_MODES)}")
+
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.max_depth = max(1, max_depth)
+        self.overload = overload
+
+        # guild -> waiting (coalesce key, item, time queued)
+        self._queues: Dict[Hashable, Deque[Tuple[Hashable, Any, float]]] = {}
+        # Guilds waiting for a worker, in turn order
+        self._ready: 'asyncio.Queue[Hashable]' = asyncio.Queue()
+        # Guilds that are waiting for a worker or have an item in flight
+        self._scheduled: Set[Hashable] = set()
+        self._tasks: List[asyncio.Task] = []
+        self.accepting = True
+
+        self.depth = 0
+        self.in_flight = 0
+        self.peak_depth = 0
+        self.processed = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.wait_total = 0.0
+
+    def submit(self, guild: Hashable, item: Any, coalesce_key: Hashable = None) -> bool:
+        """Queue an item for a guild; returns False if it was dropped or merged"""
+        if not self.accepting:
+            self.dropped += 1
+            return False
+
+        queue = self._queues.get(guild)
+        if queue is None:
+            queue = self._queues[guild] = deque()
+
+        if self.overload == 'coalesce' and coalesce_key is not None:
+            # Queues are short, so a scan is cheaper than keeping an index
+            for waiting_key, _, _ in queue:
+                if waiting_key == coalesce_key:
+                    self.coalesced += 1
+                    return False
+
+        if len(queue) >= self.max_depth:
+            self.dropped += 1
+            if self.overload == 'drop':
+                if self.dropped % 100 == 1:
+                    logger.warning(f"Queue of {guild} is full, dropping work ({self.dropped} dropped so far)",
+                                   extra={"event": "queue_overload"})
+                return False
+            queue.popleft()
+            self.depth -= 1
+
+        queue.append((coalesce_key, item, time.perf_counter()))
+        self.depth += 1
+        if self.depth > self.peak_depth:
+            self.peak_depth = self.depth
+
+        if guild not in self._scheduled:
+            self._scheduled.add(guild)
+            self._ready.put_nowait(guild)
+        return True
+
+    def deepest(self, count: int = 5) -> List[Tuple[Hashable, int]]:
+        """Get the guilds with the longest queues"""
+        return heapq.nlargest(count, ((guild, len(queue)) for guild, queue in self._queues.items() if queue),
+                              key=lambda entry: entry[1])
+
+    @property
+    def active_guilds(self) -> int:
+        """Number of guilds with queued or running work"""
+        return len(self._scheduled)
+
+    @property
+    def average_wait(self) -> float:
+        """Mean time items waited in a queue, in seconds"""
+        return self.wait_total / self.processed if self.processed else 0.0
+
+    # ------ Workers ------
+
+    def start(self):
+        """Start the worker pool"""
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._work(), name=f"trigger-worker-{number}")
+                           for number in range(self.workers)]
+
+    async def stop(self):
+        """Stop the worker pool; anything still queued is discarded"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def drain(self, timeout: float) -> int:
+        """Stop taking work, let the workers finish what is queued, then stop them
+
+        Returns the number of items still queued or running when the timeout ran out.
+        """
+        self.accepting = False
+        deadline = time.monotonic() + timeout
+        while self._scheduled and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+
+        left = self.depth + self.in_flight
+        await self.stop()
+        return left
+
+    async def _work(self):
+        """Serve one item of the next guild in line, then send the guild to the back"""
+        while True:
+            guild = await self._ready.get()
+            queue = self._queues.get(guild)
+            if queue:
+                _, item, queued_at = queue.popleft()
+                self.depth -= 1
+                self.wait_total += time.perf_counter() - queued_at
+                self.in_flight += 1
+                try:
+                    await self.handler(item)
+                except Exception as e:
+                    logger.error(f"Error handling queued work for {guild}: {str(e)}")
+                finally:
+                    self.in_flight -= 1
+                self.processed += 1
+
+            if queue:
+                self._ready.put_nowait(guild)
+            else:
+                self._queues.pop(guild, None)
+                self._scheduled.discard(guild)
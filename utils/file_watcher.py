@@ -0,0 +1,81 @@
+import asyncio
+import logging
+from typing import Optional
+
+logger = logging.getLogger('file_watcher')
+
+class DataFileWatcher:
+    """Picks up external edits to the data files and applies them incrementally"""
+
+    def __init__(self, bot, interval: float = 2.0):
+        self.bot = bot
+        self.db = bot.db_manager
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start polling the data files in the background"""
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run(), name="data-file-watcher")
+
+    async def stop(self):
+        """Stop polling the data files"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        """Poll loop; a stat call per file per interval is the only steady-state cost"""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check_once()
+            except Exception as e:
+                logger.error(f"Error reloading data files: {str(e)}")
+
+    async def check_once(self):
+        """Reload whichever data files changed on disk since we last saw them"""
+        # The compact and prefix stores are only ever written by the bot itself.
+        # Files with unsaved changes are left alone until the pending save has landed.
+        trigger_path = self.db.trigger_path
+        if self.db.compact_store is None and not self.db.save_pending(trigger_path) and self.db.file_changed(trigger_path):
+            await self._reload_triggers()
+
+        prefix_path = self.db.prefix_path
+        if self.db.prefix_store is None and not self.db.save_pending(prefix_path) and self.db.file_changed(prefix_path):
+            await self._reload_prefixes()
+
+    async def _reload_triggers(self):
+        """Parse the triggers file off the event loop and apply the differences"""
+        generation = self.db.write_generation
+        triggers, signature = await asyncio.to_thread(self.db.read_trigger_file)
+
+        # Discard the result if the file is mid-write or we saved in the meantime
+        if triggers is None or generation != self.db.write_generation:
+            return
+
+        added, changed, removed = self.db.apply_trigger_snapshot(triggers, signature)
+        if added or changed or removed:
+            logger.info(f"Reloaded {self.db.trigger_path}: {len(added)} added, {len(changed)} changed, {len(removed)} removed")
+
+    async def _reload_prefixes(self):
+        """Parse the prefixes file off the event loop and apply the differences"""
+        generation = self.db.write_generation
+        prefixes, signature = await asyncio.to_thread(self.db.read_data_file, self.db.prefix_path)
+
+        # Discard the result if the file is mid-write or we saved in the meantime
+        if prefixes is None or generation != self.db.write_generation:
+            return
+
+        added, changed, removed = self.db.apply_prefix_snapshot(prefixes, signature)
+
+        # Cached guild settings reload on next use
+        for guild_id in removed + added + changed:
+            self.bot.guild_settings.invalidate(guild_id)
+
+        if added or changed or removed:
+            logger.info(f"Reloaded {self.db.prefix_path}: {len(added)} added, {len(changed)} changed, {len(removed)} removed")
@@ -0,0 +1,79 @@
+import time
+import logging
+from collections import OrderedDict
+from typing import Optional, Tuple, Union
+
+from utils.normalize import STANDARD, Normalizer, get_normalizer
+
+logger = logging.getLogger('guild_settings')
+
+class GuildSettings:
+    """Settings of one guild as held in the cache"""
+
+    __slots__ = ('guild_id', 'prefix', 'normalizer', 'matcher', 'loaded_at')
+
+    def __init__(self, guild_id: Optional[int], prefix: str, normalizer: Normalizer = STANDARD):
+        self.guild_id = guild_id
+        self.prefix = prefix
+        # Pipeline that messages and trigger names go through before matching
+        self.normalizer = normalizer
+        # Prefix/mention strings compiled by the message router on first use
+        self.matcher: Optional[Tuple[str, ...]] = None
+        self.loaded_at = time.monotonic()
+
+class GuildSettingsCache:
+    """Size-bounded LRU cache of guild settings, filled from storage on first use
+
+    Entries older than the TTL are reloaded on their next use, and the least
+    recently used entry is evicted once the cache is full.
+    """
+
+    def __init__(self, db_manager, default_prefix: str, max_size: int = 10000, ttl: float = 3600.0):
+        self.db = db_manager
+        self.default_prefix = default_prefix
+        self.max_size = max(1, max_size)
+        self.ttl = ttl
+
+        self._entries: 'OrderedDict[Optional[int], GuildSettings]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, guild_id: Optional[Union[int, str]]) -> GuildSettings:
+        """Get the settings of a guild (None for DMs), loading them if needed"""
+        key = int(guild_id) if guild_id is not None else None
+        settings = self._entries.get(key)
+
+        if settings is not None and (self.ttl <= 0 or time.monotonic() - settings.loaded_at < self.ttl):
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return settings
+
+        self.misses += 1
+        settings = self._load(key)
+        self._entries[key] = settings
+        self._entries.move_to_end(key)
+
+        # Evict the least recently used guilds
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+        return settings
+
+    def _load(self, guild_id: Optional[int]) -> GuildSettings:
+        """Read a guild's settings from storage"""
+        if guild_id is None:
+            return GuildSettings(None, self.default_prefix)
+        return GuildSettings(guild_id, self.db.get_prefix(guild_id, self.default_prefix),
+                             get_normalizer(self.db.get_matching(guild_id)))
+
+    def invalidate(self, guild_id: Optional[Union[int, str]] = None):
+        """Drop a guild's cached settings, or every guild's if no ID is given"""
+        if guild_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(int(guild_id), None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
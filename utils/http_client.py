@@ -0,0 +1,111 @@
+import asyncio
+import random
+import logging
+from typing import Optional
+
+import aiohttp
+
+logger = logging.getLogger('http_client')
+
+# Statuses worth another try: rate limits and server-side failures
+RETRY_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+
+class FetchError(Exception):
+    """Raised when a URL cannot be fetched"""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+class HttpClient:
+    """One pooled aiohttp session for everything the bot downloads
+
+    The connector caps open connections overall and per host, every request
+    has a timeout, bodies are read in chunks and abandoned once they pass
+    `max_bytes`, and rate limits, server errors and network errors are
+    retried with exponential backoff.
+    """
+
+    def __init__(self, pool_size: int = 20, per_host: int = 5, timeout: float = 10.0,
+                 max_bytes: int = 10 * 2**20, retries: int = 3, backoff: float = 0.5):
+        self.pool_size = pool_size
+        self.per_host = per_host
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=min(timeout, 5.0))
+        self.max_bytes = max_bytes
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """The shared session, opened on first use"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, limit_per_host=self.per_host, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
+
+    async def close(self):
+        """Close the session and its pooled connections"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _wait(self, attempt: int, retry_after: Optional[str] = None):
+        """Sleep before the next attempt, honouring a short Retry-After"""
+        delay = self.backoff * 2 ** attempt
+        if retry_after:
+            try:
+                delay = max(delay, min(float(retry_after), 30.0))
+            except ValueError:
+                pass
+        await asyncio.sleep(delay * (1 + random.random() / 2))
+
+    async def fetch(self, url: str, max_bytes: Optional[int] = None) -> bytes:
+        """Download a URL, raising FetchError if it fails or is too large"""
+        limit = max_bytes if max_bytes is not None else self.max_bytes
+        for attempt in range(self.retries + 1):
+            last_try = attempt == self.retries
+            try:
+                async with self.session.get(url) as response:
+                    if response.status in RETRY_STATUSES and not last_try:
+                        await self._wait(attempt, response.headers.get('Retry-After'))
+                        continue
+                    if response.status != 200:
+                        raise FetchError(f"HTTP {response.status}", response.status)
+
+                    # Refuse early when the size is announced, and check it anyway while reading
+                    if response.content_length is not None and response.content_length > limit:
+                        raise FetchError(f"File is larger than {limit / 2**20:.1f} MiB", response.status)
+                    body = bytearray()
+                    async for chunk in response.content.iter_chunked(64 * 1024):
+                        body += chunk
+                        if len(body) > limit:
+                            raise FetchError(f"File is larger than {limit / 2**20:.1f} MiB", response.status)
+                    return bytes(body)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if last_try:
+                    raise FetchError(f"Request failed: {str(e) or type(e).__name__}") from e
+                await self._wait(attempt)
+
+        raise FetchError("Request failed")
+
+    async def check(self, url: str) -> Optional[int]:
+        """Get the status a URL answers with without downloading it, or None if unreachable"""
+        for attempt in range(self.retries + 1):
+            last_try = attempt == self.retries
+            try:
+                async with self.session.head(url, allow_redirects=True) as response:
+                    status = response.status
+                # Some hosts do not implement HEAD; ask for the first byte instead
+                if status == 405:
+                    async with self.session.get(url, headers={"Range": "bytes=0-0"}) as response:
+                        status = response.status
+                if status in RETRY_STATUSES and not last_try:
+                    await self._wait(attempt)
+                    continue
+                return status
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if last_try:
+                    return None
+                await self._wait(attempt)
+        return None
@@ -0,0 +1,124 @@
+import time
+import logging
+from typing import Dict, Optional
+
+import discord
+
+logger = logging.getLogger('interactions')
+
+# Discord fails an interaction that is not answered within this many seconds
+RESPONSE_DEADLINE = 3.0
+
+class CommandTiming:
+    """How long one slash command takes and how often it had to be deferred"""
+
+    __slots__ = ('count', 'deferred', 'late', 'total', 'max', 'expected')
+
+    def __init__(self):
+        self.count = 0
+        self.deferred = 0
+        self.late = 0
+        self.total = 0.0
+        self.max = 0.0
+        # Moving average used to decide whether to defer at the first checkpoint
+        self.expected = 0.0
+
+    def record(self, duration: float, deferred: bool, late: bool):
+        """Add one run"""
+        self.count += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+        self.expected = duration if self.count == 1 else self.expected * 0.8 + duration * 0.2
+        if deferred:
+            self.deferred += 1
+        if late:
+            self.late += 1
+
+    @property
+    def average(self) -> float:
+        """Mean run time in seconds"""
+        return self.total / self.count if self.count else 0.0
+
+class InteractionTimings:
+    """Per-command timings of slash commands answered through a Responder"""
+
+    def __init__(self, budget: float = 1.0):
+        self.budget = budget
+        self.commands: Dict[str, CommandTiming] = {}
+
+    def get(self, name: str) -> CommandTiming:
+        """Get the timing of a command, creating it on first use"""
+        timing = self.commands.get(name)
+        if timing is None:
+            timing = self.commands[name] = CommandTiming()
+        return timing
+
+    def responder(self, interaction: discord.Interaction, ephemeral: bool = False) -> 'Responder':
+        """Get a responder for an interaction that defers once the budget is used up"""
+        name = interaction.command.qualified_name if interaction.command else 'unknown'
+        return Responder(interaction, self.get(name), self.budget, ephemeral)
+
+class Responder:
+    """Answers an interaction, deferring it when the work will not fit in the budget
+
+    Commands call checkpoint() right before their slow work (a render, a
+    fetch, a write), once they know whether the answer will be ephemeral.
+    The interaction is deferred there when the command usually takes
+    longer than the budget or the budget is already used up. Replies go to
+    the initial response if it is still open and to followups otherwise.
+    Use as an async context manager so the run is timed.
+    """
+
+    def __init__(self, interaction: discord.Interaction, timing: CommandTiming, budget: float, ephemeral: bool = False):
+        self.interaction = interaction
+        self.timing = timing
+        self.budget = budget
+        self.ephemeral = ephemeral
+        self.deferred = False
+        self.late = False
+        self.started = time.perf_counter()
+
+    async def __aenter__(self) -> 'Responder':
+        self.started = time.perf_counter()
+        return self
+
+    async def __aexit__(self, *exc_info) -> bool:
+        self.timing.record(time.perf_counter() - self.started, self.deferred, self.late)
+        return False
+
+    def _acknowledged(self):
+        """Note whether the first answer made it inside Discord's deadline"""
+        age = time.time() - self.interaction.created_at.timestamp()
+        if age > RESPONSE_DEADLINE:
+            self.late = True
+            logger.warning(f"Interaction {self.interaction.command.qualified_name if self.interaction.command else 'unknown'} "
+                           f"was answered after {age:.1f}s", extra={"event": "interaction_late"})
+
+    async def defer(self, ephemeral: Optional[bool] = None):
+        """Acknowledge the interaction now and answer with a followup later
+
+        Followups take the visibility of the defer, so pass that of the answer.
+        """
+        if self.interaction.response.is_done():
+            return
+        ephemeral = self.ephemeral if ephemeral is None else ephemeral
+        await self.interaction.response.defer(ephemeral=ephemeral, thinking=True)
+        self.deferred = True
+        self._acknowledged()
+
+    async def checkpoint(self, ephemeral: Optional[bool] = None):
+        """Call before slow work: defer if the command usually overruns the budget or has used it up"""
+        if self.deferred:
+            return
+        if self.timing.expected > self.budget or time.perf_counter() - self.started > self.budget:
+            await self.defer(ephemeral)
+
+    async def send(self, content: Optional[str] = None, *, ephemeral: Optional[bool] = None, **kwargs):
+        """Send the answer through whichever channel is still open"""
+        ephemeral = self.ephemeral if ephemeral is None else ephemeral
+        if self.interaction.response.is_done():
+            await self.interaction.followup.send(content, ephemeral=ephemeral, **kwargs)
+        else:
+            await self.interaction.response.send_message(content, ephemeral=ephemeral, **kwargs)
+            self._acknowledged()
@@ -0,0 +1,259 @@
+import asyncio
+import time
+import logging
+from typing import Dict, Iterable, List, Optional, Any, Set
+from urllib.parse import parse_qs, urlparse
+
+import discord
+
+import utils
+from utils import codec
+from utils.trigger_record import TriggerRecord, TriggerResponse
+
+logger = logging.getLogger('link_health')
+
+# Hosts whose attachment URLs are signed and expire, but can be re-signed
+DISCORD_CDN_HOSTS = frozenset({'cdn.discordapp.com', 'media.discordapp.net'})
+
+# Statuses that mean the file is gone rather than temporarily unavailable
+GONE_STATUSES = frozenset({401, 403, 404, 410})
+
+# Most URLs Discord re-signs per request
+REFRESH_BATCH = 50
+
+def discord_url_expiry(url: str) -> Optional[int]:
+    """Get when a signed Discord CDN URL expires, or None if it is not one"""
+    parsed = urlparse(url)
+    if parsed.hostname not in DISCORD_CDN_HOSTS:
+        return None
+    expires = parse_qs(parsed.query).get('ex')
+    try:
+        return int(expires[0], 16) if expires else None
+    except ValueError:
+        return None
+
+class LinkReport:
+    """What one link health pass found"""
+
+    __slots__ = ('links', 'checked', 'refreshed', 'dead', 'unreachable', 'finished_at')
+
+    def __init__(self):
+        self.links = 0
+        self.checked = 0
+        self.refreshed = 0
+        self.dead = 0
+        self.unreachable = 0
+        self.finished_at = 0
+
+    def __str__(self) -> str:
+        return (f"{self.links} links: {self.checked} checked, {self.refreshed} refreshed, "
+                f"{self.dead} dead, {self.unreachable} unreachable")
+
+class LinkHealthChecker:
+    """Checks stored attachment URLs in the background
+
+    Signed Discord CDN URLs that are about to expire, or that stopped
+    working, are re-signed and written back to their triggers. URLs that
+    answer with a "gone" status are flagged as dead, so triggers skip the
+    broken image instead of posting it. Checks run a few at a time with a
+    pause between them so they never compete with message handling.
+    """
+
+    def __init__(self, bot, path: str = 'data/link_health.json', interval: float = 21600.0,
+                 concurrency: int = 4, recheck_after: float = 86400.0, pause: float = 0.5):
+        self.bot = bot
+        self.db = bot.db_manager
+        self.path = path
+        self.interval = interval
+        self.concurrency = max(1, concurrency)
+        self.recheck_after = recheck_after
+        self.pause = pause
+
+        # url -> {"status": last status or None, "checked_at": timestamp, "dead": bool}
+        self._links: Dict[str, Dict[str, Any]] = self._load()
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self.last_report: Optional[LinkReport] = None
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        """Load the results of earlier checks"""
+        try:
+            with open(self.path, 'rb') as f:
+                return {str(url): dict(entry) for url, entry in codec.loads(f.read()).items()}
+        except FileNotFoundError:
+            return {}
+        except (ValueError, AttributeError, TypeError) as e:
+            logger.error(f"Error loading link health: {str(e)}")
+            return {}
+
+    def _write(self, data: Dict[str, Dict[str, Any]]):
+        """Write the check results; runs in a worker thread"""
+        try:
+            utils.atomic_write(self.path, codec.dumps(data))
+        except Exception as e:
+            logger.error(f"Error saving link health: {str(e)}")
+
+    def is_dead(self, url: str) -> bool:
+        """Whether a URL was found to be gone for good"""
+        entry = self._links.get(url)
+        return entry is not None and entry.get('dead', False)
+
+    @property
+    def dead_count(self) -> int:
+        """Number of stored URLs flagged as dead"""
+        return sum(1 for entry in self._links.values() if entry.get('dead'))
+
+    # ------ Scheduling ------
+
+    def start(self):
+        """Start checking links in the background"""
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run(), name="link-health")
+
+    async def stop(self):
+        """Stop the background checks"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        """Check loop"""
+        await self.bot.wait_until_ready()
+        while True:
+            try:
+                await self.check_all()
+            except Exception as e:
+                logger.error(f"Error checking attachment links: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    # ------ Checking ------
+
+    async def _referenced_links(self) -> Dict[str, List[str]]:
+        """Collect every stored attachment URL and the triggers that use it, a batch at a time"""
+        links: Dict[str, List[str]] = {}
+        triggers = self.db.get_all_triggers()
+        names = list(triggers)
+
+        for start in range(0, len(names), 200):
+            for name in names[start:start + 200]:
+                record = triggers.get(name)
+                if record is None:
+                    continue
+                for response in record.all_responses():
+                    if response.attachment_url:
+                        links.setdefault(response.attachment_url, []).append(name)
+            await asyncio.sleep(0)
+
+        return links
+
+    async def check_all(self, force: bool = False) -> LinkReport:
+        """Run one pass over every stored attachment URL"""
+        async with self._lock:
+            report = LinkReport()
+            now = int(time.time())
+            links = await self._referenced_links()
+            report.links = len(links)
+
+            # Forget URLs that no trigger uses any more
+            for url in set(self._links) - set(links):
+                del self._links[url]
+
+            # Re-sign Discord URLs that will expire before the next pass
+            expiring = []
+            for url in links:
+                expires = discord_url_expiry(url)
+                if expires is not None and expires <= now + self.interval:
+                    expiring.append(url)
+            for old, new in (await self._refresh(expiring)).items():
+                self._rewrite(links[old], old, new)
+                links[new] = links.pop(old)
+                self._links.pop(old, None)
+                report.refreshed += 1
+
+            due = [url for url in links
+                   if force or now - self._links.get(url, {}).get('checked_at', 0) >= self.recheck_after]
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def check(url: str):
+                async with semaphore:
+                    await self._check(url, links[url], report)
+                    await asyncio.sleep(self.pause)
+
+            await asyncio.gather(*(check(url) for url in due))
+
+            await asyncio.to_thread(self._write, dict(self._links))
+            report.finished_at = int(time.time())
+            self.last_report = report
+            logger.info(f"Checked attachment links: {report}")
+            return report
+
+    async def _check(self, url: str, names: List[str], report: LinkReport):
+        """Check one URL, re-signing it or flagging it dead if it is gone"""
+        status = await self.bot.fetcher.check(url)
+        report.checked += 1
+
+        if status in GONE_STATUSES and discord_url_expiry(url) is not None:
+            # An expired signature looks like a missing file; try re-signing first
+            new = (await self._refresh([url])).get(url)
+            if new is not None:
+                new_status = await self.bot.fetcher.check(new)
+                if new_status is not None and new_status < 400:
+                    self._rewrite(names, url, new)
+                    self._links.pop(url, None)
+                    self._links[new] = {"status": new_status, "checked_at": int(time.time()), "dead": False}
+                    report.refreshed += 1
+                    return
+
+        dead = status in GONE_STATUSES
+        if status is None:
+            report.unreachable += 1
+        elif dead:
+            report.dead += 1
+            if not self.is_dead(url):
+                logger.warning(f"Attachment link of {', '.join(names)} is dead (HTTP {status}): {url}")
+        self._links[url] = {"status": status, "checked_at": int(time.time()), "dead": dead}
+
+    async def _refresh(self, urls: Iterable[str]) -> Dict[str, str]:
+        """Ask Discord to re-sign CDN URLs; returns the ones it re-signed"""
+        urls = [url for url in urls if discord_url_expiry(url) is not None]
+        refreshed: Dict[str, str] = {}
+
+        for start in range(0, len(urls), REFRESH_BATCH):
+            batch = urls[start:start + REFRESH_BATCH]
+            try:
+                data = await self.bot.http.request(
+                    discord.http.Route('POST', '/attachments/refresh-urls'),
+                    json={"attachment_urls": batch}
+                )
+            except discord.HTTPException as e:
+                logger.error(f"Error refreshing attachment links: {str(e)}")
+                break
+            for entry in data.get('refreshed_urls', []):
+                original, new = entry.get('original'), entry.get('refreshed')
+                if original in batch and new and new != original:
+                    refreshed[original] = new
+
+        return refreshed
+
+    def _rewrite(self, names: List[str], old: str, new: str):
+        """Point the responses of the given triggers from one URL to another"""
+        seen: Set[str] = set()
+        for name in names:
+            if name in seen:
+                continue
+            seen.add(name)
+
+            record = self.db.get_trigger(name)
+            if record is None:
+                continue
+            responses = tuple(
+                TriggerResponse(response.content, new, response.weight) if response.attachment_url == old else response
+                for response in record.all_responses()
+            )
+            # Skip triggers edited since the pass started; the next pass picks them up
+            if not self.db.update_trigger(name, TriggerRecord.response_fields(responses), expected_version=record.version):
+                logger.info(f"Trigger {name} changed during the link check, not rewriting its link")
@@ -0,0 +1,119 @@
+import atexit
+import datetime
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import time
+from typing import Dict, Optional, Tuple
+
+from utils import codec
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_exit_hook_registered = False
+
+class JsonFormatter(logging.Formatter):
+    """Formats each record as one JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        # Fields added through `extra`, such as the event name
+        for key in ('event', 'suppressed'):
+            if hasattr(record, key):
+                entry[key] = getattr(record, key)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return codec.dumps_compact(entry).decode('utf-8')
+
+class EventSampler(logging.Filter):
+    """Samples and rate-limits records tagged with an event name
+
+    Records logged with `extra={"event": name}` are kept with the configured
+    probability and at most `rate_limit` times per second per event. The
+    first record let through after a suppressed burst carries the number of
+    records dropped in `suppressed`. Untagged records always pass.
+    """
+
+    def __init__(self, sampling: Optional[Dict[str, float]] = None, rate_limit: int = 50):
+        super().__init__()
+        self.sampling = dict(sampling or {})
+        self.rate_limit = rate_limit
+        # event -> (window start, records let through, records dropped)
+        self._windows: Dict[str, Tuple[int, int, int]] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        event = getattr(record, 'event', None)
+        if event is None:
+            return True
+
+        rate = self.sampling.get(event)
+        if rate is not None and random.random() >= rate:
+            return False
+
+        if self.rate_limit <= 0:
+            return True
+
+        now = int(time.monotonic())
+        start, passed, dropped = self._windows.get(event, (now, 0, 0))
+        if start != now:
+            start, passed = now, 0
+
+        if passed >= self.rate_limit:
+            self._windows[event] = (start, passed, dropped + 1)
+            return False
+
+        if dropped:
+            record.suppressed = dropped
+        self._windows[event] = (start, passed + 1, 0)
+        return True
+
+def setup_logging(level: str = 'INFO', json_output: bool = False,
+                  sampling: Optional[Dict[str, float]] = None, rate_limit: int = 50) -> logging.handlers.QueueListener:
+    """Route all logging through a queue to a writer thread
+
+    Logging calls on the event loop only filter the record and put it on
+    an in-memory queue; formatting and the write to stdout happen on the
+    listener's thread, so a slow terminal or pipe cannot stall the bot.
+    Calling this again replaces the previous configuration.
+    """
+    global _listener, _exit_hook_registered
+
+    stop_logging()
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if json_output else logging.Formatter(TEXT_FORMAT))
+
+    records: 'queue.SimpleQueue[logging.LogRecord]' = queue.SimpleQueue()
+    handler = logging.handlers.QueueHandler(records)
+    handler.addFilter(EventSampler(sampling, rate_limit))
+
+    root = logging.getLogger()
+    for old in root.handlers[:]:
+        root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel(getattr(logging, str(level).upper(), logging.INFO))
+
+    if not _exit_hook_registered:
+        # Write out whatever is still queued when the process exits
+        atexit.register(stop_logging)
+        _exit_hook_registered = True
+
+    _listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+def stop_logging():
+    """Flush the queue and stop the writer thread"""
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,146 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+import logging
+from collections import deque
+from typing import Deque, Dict, Optional
+
+logger = logging.getLogger('loop_monitor')
+
+# Frames from these files are what we point at when naming the blocking code
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class LoopMonitor:
+    """Measures event loop lag and logs what the loop was running when it stalls
+
+    A heartbeat coroutine records how late each wake-up is. A helper thread
+    watches the heartbeat and, when it goes quiet for longer than the
+    threshold, captures the loop thread's stack.
+    """
+
+    def __init__(self, interval: float = 0.25, threshold: float = 0.5,
+                 log_cooldown: float = 30.0, window: int = 2400):
+        self.interval = interval
+        self.threshold = threshold
+        self.log_cooldown = log_cooldown
+
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+        self.stalls = 0
+        self._suppressed = 0
+        self._last_report = 0.0
+
+    def start(self):
+        """Start measuring; must be called from the event loop thread"""
+        if self._task is not None or self.threshold <= 0:
+            return
+
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopped.clear()
+
+        self._task = asyncio.create_task(self._heartbeat(), name="loop-monitor-heartbeat")
+        self._thread = threading.Thread(target=self._watchdog, name="loop-monitor-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self):
+        """Stop the heartbeat and the watchdog thread"""
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._thread:
+            await asyncio.to_thread(self._thread.join, 1.0)
+            self._thread = None
+
+    async def _heartbeat(self):
+        """Record how late the loop wakes us up"""
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self._samples.append(max(0.0, loop.time() - started - self.interval))
+            self._last_beat = time.monotonic()
+
+    def _watchdog(self):
+        """Helper thread: report a stall once per missed heartbeat run"""
+        reported_beat = None
+        while not self._stopped.wait(self.interval):
+            last_beat = self._last_beat
+            blocked_for = time.monotonic() - last_beat
+            if blocked_for < self.threshold + self.interval or last_beat == reported_beat:
+                continue
+
+            reported_beat = last_beat
+            self.stalls += 1
+            self._report_stall(blocked_for)
+
+    def _report_stall(self, blocked_for: float):
+        """Log the loop thread's stack, rate limited"""
+        now = time.monotonic()
+        if now - self._last_report < self.log_cooldown:
+            self._suppressed += 1
+            return
+
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return
+
+        stack = traceback.extract_stack(frame)
+        handler = self._describe_handler(stack)
+
+        suppressed = f" ({self._suppressed} similar stalls suppressed)" if self._suppressed else ""
+        self._last_report = now
+        self._suppressed = 0
+
+        logger.warning(
+            f"Event loop blocked for {blocked_for:.2f}s in {handler}{suppressed}\n"
+            + "".join(traceback.format_list(stack))
+        )
+
+    def _describe_handler(self, stack: traceback.StackSummary) -> str:
+        """Name the running task and the innermost frame from our own code"""
+        task_name = "unknown task"
+        try:
+            task = asyncio.current_task(self._loop)
+            if task is not None:
+                task_name = task.get_name()
+        except RuntimeError:
+            pass
+
+        for frame in reversed(stack):
+            if frame.filename.startswith(PROJECT_ROOT) and not frame.filename.endswith('loop_monitor.py'):
+                location = os.path.relpath(frame.filename, PROJECT_ROOT)
+                return f"{task_name} at {frame.name} ({location}:{frame.lineno})"
+        return task_name
+
+    def percentiles(self) -> Dict[str, float]:
+        """Get lag percentiles in milliseconds over the recent window"""
+        samples = sorted(self._samples)
+        if not samples:
+            return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0, "samples": 0}
+
+        def pick(fraction: float) -> float:
+            return samples[min(len(samples) - 1, int(fraction * len(samples)))] * 1000
+
+        return {
+            "p50": pick(0.50),
+            "p95": pick(0.95),
+            "p99": pick(0.99),
+            "max": samples[-1] * 1000,
+            "samples": len(samples)
+        }
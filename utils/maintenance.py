@@ -0,0 +1,234 @@
+import asyncio
+import os
+import time
+import logging
+from typing import Dict, List, Optional, Any, Set
+
+import utils
+from utils import codec
+
+logger = logging.getLogger('maintenance')
+
+class CollectionReport:
+    """What one garbage collection pass reclaimed"""
+
+    __slots__ = ('guilds', 'triggers', 'trigger_bytes', 'prefixes', 'stats_entries', 'archived', 'finished_at')
+
+    def __init__(self):
+        self.guilds = 0
+        self.triggers = 0
+        self.trigger_bytes = 0
+        self.prefixes = 0
+        self.stats_entries = 0
+        self.archived = 0
+        self.finished_at = 0
+
+    def __str__(self) -> str:
+        return (f"{self.guilds} guilds: {self.triggers} triggers ({self.trigger_bytes / 1024:.1f} KiB), "
+                f"{self.prefixes} prefixes, {self.stats_entries} stats entries; {self.archived} triggers archived")
+
+class GuildDataCollector:
+    """Purges or archives the data of guilds the bot has left, in the background
+
+    Departures are remembered in a small JSON file. Once a guild has been gone
+    for the grace period its triggers, prefix and usage counters are removed,
+    a batch at a time so the event loop keeps serving messages.
+    """
+
+    def __init__(self, bot, path: str = 'data/departed_guilds.json', interval: float = 3600.0,
+                 grace_period: float = 7 * 86400, batch_size: int = 200, archive: bool = True,
+                 archive_dir: str = 'data/archive', slice_time: float = 0.01):
+        self.bot = bot
+        self.db = bot.db_manager
+        self.path = path
+        self.interval = interval
+        self.grace_period = grace_period
+        self.batch_size = max(1, batch_size)
+        self.archive = archive
+        self.archive_dir = archive_dir
+        # Longest the deletions run before yielding to the loop, in seconds
+        self.slice_time = slice_time
+
+        self._departed: Dict[str, int] = self._load()
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self.last_report: Optional[CollectionReport] = None
+
+    def _load(self) -> Dict[str, int]:
+        """Load the departed guilds and when they were first seen missing"""
+        try:
+            with open(self.path, 'rb') as f:
+                return {str(guild_id): int(left_at) for guild_id, left_at in codec.loads(f.read()).items()}
+        except FileNotFoundError:
+            return {}
+        except (ValueError, AttributeError, TypeError) as e:
+            logger.error(f"Error loading departed guilds: {str(e)}")
+            return {}
+
+    def _write(self, path: str, data: Any) -> bool:
+        """Atomically write a JSON file; runs in a worker thread"""
+        try:
+            utils.atomic_write(path, codec.dumps(data))
+            return True
+        except Exception as e:
+            logger.error(f"Error writing {path}: {str(e)}")
+            return False
+
+    async def _save(self):
+        """Persist the departed guilds off the event loop"""
+        await asyncio.to_thread(self._write, self.path, dict(self._departed))
+
+    # ------ Departures ------
+
+    async def mark_departed(self, guild_id: int):
+        """Remember that the bot left a guild"""
+        if str(guild_id) not in self._departed:
+            self._departed[str(guild_id)] = int(time.time())
+            await self._save()
+
+    async def mark_returned(self, guild_id: int):
+        """Cancel a pending purge because the bot rejoined the guild"""
+        if self._departed.pop(str(guild_id), None) is not None:
+            await self._save()
+
+    def capture_snapshot(self) -> Dict[str, int]:
+        """Get the departed guilds for a snapshot"""
+        return dict(self._departed)
+
+    async def install_snapshot(self, departed: Dict[str, int]):
+        """Replace the departed guilds with restored ones"""
+        self._departed = {str(guild_id): int(left_at) for guild_id, left_at in departed.items()}
+        await self._save()
+
+    @property
+    def pending(self) -> int:
+        """Number of departed guilds whose data has not been purged yet"""
+        return len(self._departed)
+
+    # ------ Scheduling ------
+
+    def start(self):
+        """Start collecting in the background"""
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run(), name="guild-data-collector")
+
+    async def stop(self):
+        """Stop the background collection"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        """Collection loop"""
+        await self.bot.wait_until_ready()
+        while True:
+            try:
+                await self.collect()
+            except Exception as e:
+                logger.error(f"Error collecting orphaned guild data: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    # ------ Collection ------
+
+    async def collect(self) -> CollectionReport:
+        """Run one pass: find orphaned data and purge guilds past the grace period"""
+        async with self._lock:
+            report = CollectionReport()
+            now = int(time.time())
+            current = {str(guild.id) for guild in self.bot.guilds}
+
+            # A guild we are back in is no longer departed
+            for guild_id in [guild_id for guild_id in self._departed if guild_id in current]:
+                del self._departed[guild_id]
+
+            # Guilds with data that we left while offline count as departed from now
+            referenced = await self._referenced_guilds()
+            for guild_id in referenced - current - set(self._departed):
+                self._departed[guild_id] = now
+
+            due = {guild_id for guild_id, left_at in self._departed.items() if now - left_at >= self.grace_period}
+            if due:
+                await self._purge(due, report)
+                for guild_id in due:
+                    del self._departed[guild_id]
+
+            await self._save()
+
+            report.finished_at = now
+            self.last_report = report
+            if report.guilds:
+                logger.info(f"Reclaimed data of {report}")
+            return report
+
+    async def _referenced_guilds(self) -> Set[str]:
+        """Collect the guild IDs that own triggers or prefixes, a batch at a time"""
+        guilds = set(self.db.get_all_prefixes())
+        names = list(self.db.get_all_triggers())
+
+        for start in range(0, len(names), self.batch_size):
+            for name in names[start:start + self.batch_size]:
+                guild_id = self.db.get_trigger_guild(name)
+                if guild_id is not None:
+                    guilds.add(str(guild_id))
+            await asyncio.sleep(0)
+
+        return guilds
+
+    async def _purge(self, due: Set[str], report: CollectionReport):
+        """Remove the data of the given guilds, yielding to the loop between batches"""
+        report.guilds = len(due)
+        triggers = self.db.get_all_triggers()
+        names = list(triggers)
+        doomed: List[str] = []
+        archived: Dict[str, Dict[str, Dict[str, Any]]] = {}
+
+        # Find the triggers to remove
+        for start in range(0, len(names), self.batch_size):
+            for name in names[start:start + self.batch_size]:
+                # Only the triggers being removed are decoded in full
+                if str(self.db.get_trigger_guild(name)) not in due:
+                    continue
+                record = triggers.get(name)
+                if record is None:
+                    continue
+
+                data = record.to_dict()
+                doomed.append(name)
+                report.trigger_bytes += len(codec.dumps_compact(data))
+                if self.archive:
+                    archived.setdefault(str(record.guild_id), {})[name] = data
+            await asyncio.sleep(0)
+
+        # Archive before deleting, off the loop, one file per guild
+        stamp = int(time.time())
+        for guild_id, records in archived.items():
+            path = os.path.join(self.archive_dir, f"guild_{guild_id}_{stamp}.json")
+            if not await asyncio.to_thread(self._write, path, records):
+                # Keep this guild's triggers rather than lose them
+                kept = set(records)
+                doomed = [name for name in doomed if name not in kept]
+                continue
+            report.archived += len(records)
+
+        # Delete one name at a time, yielding whenever a slice is used up; the saves are coalesced
+        slice_start = time.monotonic()
+        for name in doomed:
+            if self.db.delete_trigger(name):
+                report.triggers += 1
+            self.bot.trigger_stats.forget(name)
+            if time.monotonic() - slice_start >= self.slice_time:
+                await asyncio.sleep(0)
+                slice_start = time.monotonic()
+
+        for guild_id in due:
+            if self.db.delete_prefix(guild_id):
+                report.prefixes += 1
+            self.db.delete_matching(guild_id)
+            self.bot.guild_settings.invalidate(guild_id)
+            self.bot.scheduler.remove_guild(guild_id)
+            report.stats_entries += self.bot.trigger_stats.forget_guild(guild_id)
+            await asyncio.sleep(0)
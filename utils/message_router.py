@@ -0,0 +1,185 @@
+import asyncio
+import time
+import logging
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from discord.ext import commands
+from discord.ext.commands.view import StringView
+
+from utils.fair_queue import FairDispatcher
+from utils.tracing import span
+
+logger = logging.getLogger('message_router')
+
+class BranchTiming:
+    """Call count and time spent in one routing branch"""
+
+    __slots__ = ('count', 'total', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, elapsed: float):
+        """Add one timed call"""
+        self.count += 1
+        self.total += elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+
+    @property
+    def average(self) -> float:
+        """Mean time per call in seconds"""
+        return self.total / self.count if self.count else 0.0
+
+class MessageRouter:
+    """Classifies each message once as a command, a trigger or nothing
+
+    Prefix and mention matchers are built once per cached guild, so a
+    message that does not start with one never reaches the command parser,
+    and messages that invoke a command are never handed to the trigger path.
+    Trigger candidates are queued per guild and handled by a fair worker
+    pool, so a flood in one guild only delays that guild.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.trigger_handler: Optional[Callable[..., Awaitable[None]]] = None
+        self.timings: Dict[str, BranchTiming] = {
+            "command": BranchTiming(),
+            "trigger": BranchTiming(),
+            "ignore": BranchTiming()
+        }
+        self.dispatcher = FairDispatcher(
+            self._handle_queued,
+            workers=bot.config.get('trigger_workers', 8),
+            max_depth=bot.config.get('guild_queue_size', 50),
+            overload=bot.config.get('guild_queue_overload', 'drop')
+        )
+        # Cleared on shutdown so no new messages are taken
+        self.accepting = True
+        self.commands_in_flight = 0
+
+    def start(self):
+        """Start the trigger workers"""
+        self.dispatcher.start()
+
+    async def stop(self):
+        """Stop the trigger workers"""
+        await self.dispatcher.stop()
+
+    async def drain(self, timeout: float) -> int:
+        """Stop taking messages and wait for running commands and queued triggers
+
+        Returns the number of queued or running triggers dropped at the deadline.
+        """
+        self.accepting = False
+        deadline = time.monotonic() + timeout
+        while self.commands_in_flight and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if self.commands_in_flight:
+            logger.warning(f"{self.commands_in_flight} commands still running at shutdown")
+
+        return await self.dispatcher.drain(max(0.0, deadline - time.monotonic()))
+
+    def _matcher_for(self, guild_id: Optional[int]) -> Tuple[str, ...]:
+        """Get the prefixes to test for a guild, in the order when_mentioned_or uses
+
+        The result lives on the guild's cached settings, so it is rebuilt
+        whenever those are reloaded or evicted.
+        """
+        settings = self.bot.guild_settings.get(guild_id)
+        if settings.matcher is not None:
+            return settings.matcher
+
+        # Mentions only work once we know our own user ID
+        if self.bot.user is None:
+            return (settings.prefix,)
+
+        user_id = self.bot.user.id
+        settings.matcher = (f'<@{user_id}> ', f'<@!{user_id}> ', settings.prefix)
+        return settings.matcher
+
+    async def route(self, message):
+        """Send a message down exactly one of the command, trigger or ignore branches"""
+        started = time.perf_counter()
+
+        if message.author.bot or not self.accepting:
+            self.timings["ignore"].record(time.perf_counter() - started)
+            return
+
+        content = message.content
+        guild_id = message.guild.id if message.guild else None
+        trace = self.bot.tracer.begin('message', 'message', guild_id, message.created_at)
+
+        try:
+            with span('prefix'):
+                invoked_prefix = None
+                for prefix in self._matcher_for(guild_id):
+                    if content.startswith(prefix):
+                        invoked_prefix = prefix
+                        break
+
+            if invoked_prefix is not None:
+                ctx = self._build_context(message, invoked_prefix)
+                if ctx.command is not None:
+                    if trace is not None:
+                        trace.label = f"command {ctx.command.qualified_name}"
+                    self.commands_in_flight += 1
+                    try:
+                        with span('dispatch'):
+                            await self.bot.invoke(ctx)
+                    finally:
+                        self.commands_in_flight -= 1
+                    self.timings["command"].record(time.perf_counter() - started)
+                    return
+
+                # Not a known command, but it may still be a trigger such as "!hello"
+                if ctx.invoked_with:
+                    self.bot.dispatch('command_error', ctx, commands.CommandNotFound(f'Command "{ctx.invoked_with}" is not found'))
+
+            # Normalize once for the trigger lookup, with the guild's pipeline
+            normalizer = self.bot.guild_settings.get(guild_id).normalizer
+            with span('normalize'):
+                key = normalizer(content)
+            if key and self.trigger_handler is not None:
+                if trace is not None:
+                    trace.label = 'trigger'
+                # DMs are queued per channel, guild messages per guild
+                queue = guild_id if guild_id is not None else message.channel.id
+                if self.dispatcher.submit(queue, (message, key, normalizer, trace, time.perf_counter()), (message.channel.id, key)):
+                    # The worker finishes the trace once the trigger is handled
+                    trace = None
+                self.timings["trigger"].record(time.perf_counter() - started)
+            else:
+                self.timings["ignore"].record(time.perf_counter() - started)
+        finally:
+            self.bot.tracer.finish(trace)
+
+    async def _handle_queued(self, item):
+        """Run the trigger handler for a queued message on a worker"""
+        message, key, normalizer, trace, queued_at = item
+        self.bot.tracer.resume(trace)
+        try:
+            if trace is not None:
+                trace.add_span('queue', queued_at, time.perf_counter())
+            if self.trigger_handler is not None:
+                await self.trigger_handler(message, key, normalizer)
+        finally:
+            self.bot.tracer.finish(trace)
+
+    def _build_context(self, message, prefix: str) -> commands.Context:
+        """Build the command context for an already matched prefix, like Bot.get_context"""
+        view = StringView(message.content)
+        ctx = commands.Context(prefix=None, view=view, bot=self.bot, message=message)
+        view.skip_string(prefix)
+
+        if self.bot.strip_after_prefix:
+            view.skip_ws()
+
+        invoker = view.get_word()
+        ctx.invoked_with = invoker
+        ctx.prefix = prefix
+        ctx.command = self.bot.all_commands.get(invoker)
+        return ctx
@@ -0,0 +1,133 @@
+"""Check and upgrade triggers.json to the current schema
+
+Usage:
+    python -m utils.migrate [path] [--check] [--output PATH] [--drop-invalid] [--no-backup]
+
+The file is read one record at a time, so memory use does not grow with
+its size. Every record is validated and upgraded; the result is written
+to a temporary file that replaces the target only once it is complete.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import logging
+from typing import List, Optional, Set
+
+from utils.schema import SCHEMA_VERSION, SchemaError, TriggerStream, parse_record
+
+logger = logging.getLogger('migrate')
+
+# Most validation errors kept for the report
+MAX_ERRORS = 20
+
+class MigrationReport:
+    """What one migration run found and did"""
+
+    __slots__ = ('version', 'records', 'invalid', 'errors', 'written', 'backup')
+
+    def __init__(self):
+        self.version: Optional[int] = None
+        self.records = 0
+        self.invalid = 0
+        self.errors: List[str] = []
+        self.written = False
+        self.backup: Optional[str] = None
+
+    def __str__(self) -> str:
+        return f"schema {self.version}: {self.records} valid records, {self.invalid} invalid"
+
+def migrate_file(path: str, output: Optional[str] = None, check_only: bool = False,
+                 drop_invalid: bool = False, backup: bool = True) -> MigrationReport:
+    """Validate a triggers file and write it in the current schema
+
+    Nothing is written if any record is invalid, unless drop_invalid is set.
+    Raises SchemaError if the file itself cannot be parsed.
+    """
+    output = output or path
+    tmp_path = f"{output}.migrating"
+    report = MigrationReport()
+    seen: Set[str] = set()
+
+    out = None if check_only else open(tmp_path, 'w', encoding='utf-8')
+    try:
+        if out is not None:
+            out.write(f'{{\n  "schema": {SCHEMA_VERSION},\n  "triggers": {{')
+
+        with open(path, 'rb') as f:
+            stream = TriggerStream(f)
+            for name, data in stream:
+                try:
+                    if name in seen:
+                        raise SchemaError(f"Trigger {name!r} appears more than once")
+                    record = parse_record(name, data, stream.version)
+                except SchemaError as e:
+                    report.invalid += 1
+                    if len(report.errors) < MAX_ERRORS:
+                        report.errors.append(str(e))
+                    continue
+
+                seen.add(name)
+                if out is not None:
+                    # Same layout as the bot's own two-space indented saves
+                    body = json.dumps(record.to_dict(), indent=2).replace('\n', '\n    ')
+                    out.write(f'{"," if report.records else ""}\n    {json.dumps(name)}: {body}')
+                report.records += 1
+            report.version = stream.version
+
+        if out is None:
+            return report
+
+        out.write('\n  }\n}' if report.records else '}\n}')
+        out.flush()
+        os.fsync(out.fileno())
+        out.close()
+
+        if report.invalid and not drop_invalid:
+            os.remove(tmp_path)
+            return report
+
+        # Keep the original next to the upgraded file
+        if backup and os.path.exists(output):
+            report.backup = f"{output}.v{report.version}.bak"
+            shutil.copy2(output, report.backup)
+        os.replace(tmp_path, output)
+        report.written = True
+        return report
+    finally:
+        if out is not None and not out.closed:
+            out.close()
+            os.remove(tmp_path)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Check and upgrade triggers.json to the current schema")
+    parser.add_argument('path', nargs='?', default='data/triggers.json', help="Triggers file to migrate")
+    parser.add_argument('--output', help="Write the upgraded file here instead of replacing the input")
+    parser.add_argument('--check', action='store_true', help="Only validate, do not write anything")
+    parser.add_argument('--drop-invalid', action='store_true', help="Leave invalid records out instead of refusing to write")
+    parser.add_argument('--no-backup', action='store_true', help="Do not keep a copy of the original file")
+    args = parser.parse_args(argv)
+
+    try:
+        report = migrate_file(args.path, args.output, args.check, args.drop_invalid, not args.no_backup)
+    except (OSError, SchemaError) as e:
+        print(f"Could not read {args.path}: {str(e)}", file=sys.stderr)
+        return 2
+
+    print(f"{args.path}: {report}")
+    for error in report.errors:
+        print(f"  {error}")
+    if report.invalid > len(report.errors):
+        print(f"  ... and {report.invalid - len(report.errors)} more")
+
+    if report.written:
+        print(f"Wrote schema {SCHEMA_VERSION} to {args.output or args.path}" + (f", original kept as {report.backup}" if report.backup else ""))
+    elif not args.check and report.invalid:
+        print("Nothing written because of invalid records; fix them or rerun with --drop-invalid")
+    return 1 if report.invalid and not report.written else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
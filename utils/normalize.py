@@ -0,0 +1,90 @@
+import unicodedata
+import logging
+from typing import Dict, FrozenSet, Iterable, Optional
+
+logger = logging.getLogger('normalize')
+
+# Steps a guild can add on top of the standard NFKC, casefold and whitespace collapse
+OPTIONAL_STEPS = ('accents', 'punctuation', 'emoji')
+
+# Unicode categories removed by each stripping step
+_PUNCTUATION_CATEGORIES = frozenset({'Pc', 'Pd', 'Ps', 'Pe', 'Pi', 'Pf', 'Po'})
+_EMOJI_CATEGORIES = frozenset({'So'})
+# Joiners, variation selectors, skin tone modifiers and tag characters that hold emoji sequences together
+_EMOJI_JOINERS = frozenset({0x200D, 0x20E3, 0xFE0E, 0xFE0F} | set(range(0x1F3FB, 0x1F400)) | set(range(0xE0020, 0xE0080)))
+
+class _DropTable(dict):
+    """str.translate table that deletes characters of some Unicode categories, filled on first sight"""
+
+    def __init__(self, categories: FrozenSet[str], codepoints: FrozenSet[int] = frozenset()):
+        super().__init__()
+        self.categories = categories
+        self.codepoints = codepoints
+
+    def __missing__(self, codepoint: int) -> Optional[int]:
+        drop = codepoint in self.codepoints or unicodedata.category(chr(codepoint)) in self.categories
+        value = None if drop else codepoint
+        self[codepoint] = value
+        return value
+
+class Normalizer:
+    """A text normalization pipeline used to match messages against trigger names
+
+    Every pipeline applies NFKC (so fullwidth and other compatibility forms
+    match their plain equivalents), casefolding and whitespace collapsing.
+    Optional steps strip accents, punctuation or emoji. ASCII text skips the
+    Unicode steps, which leave it unchanged. Instances are shared through
+    get_normalizer, so trigger keys are computed once per pipeline in use.
+    """
+
+    __slots__ = ('steps', 'name', '_ascii_table', '_table')
+
+    def __init__(self, steps: Iterable[str] = ()):
+        self.steps = frozenset(steps)
+        unknown = self.steps - set(OPTIONAL_STEPS)
+        if unknown:
+            raise ValueError(f"Unknown normalization steps: {', '.join(sorted(unknown))}")
+        self.name = '+'.join(step for step in OPTIONAL_STEPS if step in self.steps) or 'standard'
+
+        categories = set()
+        codepoints = set()
+        if 'punctuation' in self.steps:
+            categories |= _PUNCTUATION_CATEGORIES
+        if 'emoji' in self.steps:
+            categories |= _EMOJI_CATEGORIES
+            codepoints |= _EMOJI_JOINERS
+        self._table = _DropTable(frozenset(categories), frozenset(codepoints)) if categories else None
+        # The same rule applied to ASCII up front, for the fast path
+        dropped = [chr(codepoint) for codepoint in range(128) if self._table is not None and self._table[codepoint] is None]
+        self._ascii_table = str.maketrans('', '', ''.join(dropped)) if dropped else None
+
+    def __call__(self, text: str) -> str:
+        if text.isascii():
+            text = text.lower()
+            if self._ascii_table is not None:
+                text = text.translate(self._ascii_table)
+            return ' '.join(text.split())
+
+        text = unicodedata.normalize('NFKC', text)
+        if 'accents' in self.steps:
+            decomposed = unicodedata.normalize('NFD', text)
+            text = unicodedata.normalize('NFC', ''.join(char for char in decomposed if not unicodedata.combining(char)))
+        text = text.casefold()
+        if self._table is not None:
+            text = text.translate(self._table)
+        return ' '.join(text.split())
+
+    def __repr__(self) -> str:
+        return f"Normalizer({self.name})"
+
+_normalizers: Dict[FrozenSet[str], Normalizer] = {}
+
+def get_normalizer(steps: Iterable[str] = ()) -> Normalizer:
+    """Get the shared normalizer for a set of optional steps"""
+    key = frozenset(steps)
+    normalizer = _normalizers.get(key)
+    if normalizer is None:
+        normalizer = _normalizers[key] = Normalizer(key)
+    return normalizer
+
+STANDARD = get_normalizer()
@@ -0,0 +1,66 @@
+import os
+import sqlite3
+import logging
+from collections.abc import MutableMapping
+from typing import Dict, Iterator
+
+logger = logging.getLogger('prefix_store')
+
+class PrefixStore(MutableMapping):
+    """Guild prefixes in an SQLite file, read one guild at a time
+
+    Nothing is loaded up front: each lookup is an indexed query and SQLite
+    pages in only what it touches, so memory use and startup time do not
+    grow with the number of guilds. Writes are committed as they are made.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+        # Autocommit; the write-ahead log keeps commits cheap without risking the file on a crash
+        self._conn = sqlite3.connect(path, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS prefixes (guild_id TEXT PRIMARY KEY, prefix TEXT NOT NULL) WITHOUT ROWID')
+
+    # ------ Mapping Interface ------
+
+    def __getitem__(self, guild_id: str) -> str:
+        row = self._conn.execute('SELECT prefix FROM prefixes WHERE guild_id = ?', (guild_id,)).fetchone()
+        if row is None:
+            raise KeyError(guild_id)
+        return row[0]
+
+    def __setitem__(self, guild_id: str, prefix: str):
+        self._conn.execute('INSERT OR REPLACE INTO prefixes (guild_id, prefix) VALUES (?, ?)', (guild_id, prefix))
+
+    def __delitem__(self, guild_id: str):
+        if self._conn.execute('DELETE FROM prefixes WHERE guild_id = ?', (guild_id,)).rowcount == 0:
+            raise KeyError(guild_id)
+
+    def __contains__(self, guild_id: object) -> bool:
+        return self._conn.execute('SELECT 1 FROM prefixes WHERE guild_id = ?', (guild_id,)).fetchone() is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter([row[0] for row in self._conn.execute('SELECT guild_id FROM prefixes')])
+
+    def __len__(self) -> int:
+        return self._conn.execute('SELECT COUNT(*) FROM prefixes').fetchone()[0]
+
+    def __bool__(self) -> bool:
+        # Stops at the first row instead of counting them all
+        return self._conn.execute('SELECT 1 FROM prefixes LIMIT 1').fetchone() is not None
+
+    # ------ Bulk Operations ------
+
+    def replace_all(self, prefixes: Dict[str, str]):
+        """Swap in a whole set of prefixes in one transaction"""
+        with self._conn:
+            self._conn.execute('BEGIN')
+            self._conn.execute('DELETE FROM prefixes')
+            self._conn.executemany('INSERT INTO prefixes (guild_id, prefix) VALUES (?, ?)', prefixes.items())
+
+    def close(self):
+        """Close the database connection"""
+        self._conn.close()
@@ -0,0 +1,85 @@
+import asyncio
+import cProfile
+import io
+import pstats
+import tracemalloc
+import logging
+
+logger = logging.getLogger('profiler')
+
+class Profiler:
+    """Runs on-demand profiling sessions against the live bot, one at a time
+
+    Nothing is hooked until a session starts, so there is no cost while idle.
+    """
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+
+    @property
+    def busy(self) -> bool:
+        """Whether a profiling session is running"""
+        return self._lock.locked()
+
+    async def profile_cpu(self, seconds: float, sort: str = 'cumulative', limit: int = 60) -> str:
+        """Profile the event loop thread for a number of seconds and return a text report"""
+        async with self._lock:
+            profile = cProfile.Profile()
+            logger.info(f"Starting {seconds}s CPU profile")
+
+            profile.enable()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                profile.disable()
+
+            return await asyncio.to_thread(self._format_cpu_report, profile, seconds, sort, limit)
+
+    @staticmethod
+    def _format_cpu_report(profile: cProfile.Profile, seconds: float, sort: str, limit: int) -> str:
+        """Render a cProfile session sorted by the given key"""
+        buffer = io.StringIO()
+        buffer.write(f"CPU profile of the event loop thread over {seconds}s, sorted by {sort}\n\n")
+        stats = pstats.Stats(profile, stream=buffer)
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+        return buffer.getvalue()
+
+    async def profile_memory(self, seconds: float, limit: int = 50) -> str:
+        """Diff two tracemalloc snapshots taken a number of seconds apart"""
+        async with self._lock:
+            # Leave tracing on afterwards if someone else started it
+            was_tracing = tracemalloc.is_tracing()
+            if not was_tracing:
+                tracemalloc.start()
+            logger.info(f"Starting {seconds}s memory profile")
+
+            try:
+                # Snapshots of a large heap take a while; take them in a worker thread like the comparison
+                before = await asyncio.to_thread(tracemalloc.take_snapshot)
+                await asyncio.sleep(seconds)
+                after = await asyncio.to_thread(tracemalloc.take_snapshot)
+                current, peak = tracemalloc.get_traced_memory()
+            finally:
+                if not was_tracing:
+                    tracemalloc.stop()
+
+            return await asyncio.to_thread(self._format_memory_report, before, after, seconds, current, peak, limit)
+
+    @staticmethod
+    def _format_memory_report(before: tracemalloc.Snapshot, after: tracemalloc.Snapshot,
+                              seconds: float, current: int, peak: int, limit: int) -> str:
+        """Render the allocation differences between two snapshots, largest first"""
+        lines = [
+            f"Allocation changes over {seconds}s, largest first",
+            f"Traced memory: {current / 1024:.1f} KiB current, {peak / 1024:.1f} KiB peak",
+            ""
+        ]
+
+        differences = after.compare_to(before, 'lineno')
+        for stat in differences[:limit]:
+            lines.append(str(stat))
+
+        total = sum(stat.size_diff for stat in differences)
+        lines.append("")
+        lines.append(f"Net change: {total / 1024:+.1f} KiB across {len(differences)} locations")
+        return "\n".join(lines)
@@ -0,0 +1,73 @@
+import random
+import logging
+from typing import List, Optional, Sequence, Tuple
+
+from utils.templates import CompiledTemplate, compile_template
+from utils.trigger_record import TriggerRecord, TriggerResponse
+
+logger = logging.getLogger('responses')
+
+class AliasTable:
+    """Walker's alias table for O(1) weighted random choice
+
+    Built in O(n) from the weights. Each pick draws one random number and
+    does one table lookup, whatever the number of entries.
+    """
+
+    __slots__ = ('probability', 'alias', 'size')
+
+    def __init__(self, weights: Sequence[float]):
+        size = len(weights)
+        total = float(sum(weights))
+        if size == 0 or total <= 0:
+            raise ValueError("Weights must contain at least one positive value")
+
+        # Scale so the average column holds exactly 1
+        scaled = [weight * size / total for weight in weights]
+        small = [i for i, value in enumerate(scaled) if value < 1.0]
+        large = [i for i, value in enumerate(scaled) if value >= 1.0]
+        probability = [1.0] * size
+        alias = list(range(size))
+
+        # Fill each short column with the surplus of a tall one
+        while small and large:
+            short, tall = small.pop(), large.pop()
+            probability[short] = scaled[short]
+            alias[short] = tall
+            scaled[tall] -= 1.0 - scaled[short]
+            (small if scaled[tall] < 1.0 else large).append(tall)
+
+        # Whatever is left over is full up to rounding error
+        self.probability = tuple(probability)
+        self.alias = tuple(alias)
+        self.size = size
+
+    def pick(self, rng=random.random) -> int:
+        """Draw an index with probability proportional to its weight"""
+        value = rng() * self.size
+        column = min(int(value), self.size - 1)
+        return column if value - column < self.probability[column] else self.alias[column]
+
+class ResponsePicker:
+    """A trigger's responses with their compiled templates and alias table"""
+
+    __slots__ = ('responses', 'templates', 'table', 'uses_args')
+
+    def __init__(self, record: TriggerRecord):
+        self.responses: Tuple[TriggerResponse, ...] = record.all_responses()
+        self.templates: Tuple[Optional[CompiledTemplate], ...] = tuple(
+            compile_template(response.content) if response.content else None for response in self.responses
+        )
+        # A lone response needs no table
+        self.table: Optional[AliasTable] = AliasTable([response.weight for response in self.responses]) if len(self.responses) > 1 else None
+        self.uses_args = any(template is not None and template.uses_args for template in self.templates)
+
+    def pick(self) -> Tuple[TriggerResponse, Optional[CompiledTemplate]]:
+        """Choose a response at random by weight"""
+        index = self.table.pick() if self.table is not None else 0
+        return self.responses[index], self.templates[index]
+
+    def chances(self) -> List[float]:
+        """Get the probability of each response"""
+        total = sum(response.weight for response in self.responses)
+        return [response.weight / total for response in self.responses]
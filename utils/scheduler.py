@@ -0,0 +1,349 @@
+import asyncio
+import time
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Any, Set
+
+import utils
+from utils import codec
+
+logger = logging.getLogger('scheduler')
+
+class ScheduledJob:
+    """A trigger response posted to a channel every `interval` seconds"""
+
+    __slots__ = ('job_id', 'trigger_name', 'guild_id', 'channel_id', 'interval', 'next_run', 'created_by')
+
+    def __init__(self, job_id: int, trigger_name: str, guild_id: int, channel_id: int,
+                 interval: int, next_run: int, created_by: Optional[int] = None):
+        self.job_id = job_id
+        self.trigger_name = trigger_name
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.interval = interval
+        self.next_run = next_run
+        self.created_by = created_by
+
+    @classmethod
+    def from_dict(cls, job_id: int, data: Dict[str, Any]) -> 'ScheduledJob':
+        """Build a job from its stored JSON form"""
+        return cls(
+            job_id=job_id,
+            trigger_name=data['trigger_name'],
+            guild_id=int(data['guild_id']),
+            channel_id=int(data['channel_id']),
+            interval=int(data['interval']),
+            next_run=int(data['next_run']),
+            created_by=data.get('created_by')
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the stored JSON form of the job"""
+        return {
+            "trigger_name": self.trigger_name,
+            "guild_id": self.guild_id,
+            "channel_id": self.channel_id,
+            "interval": self.interval,
+            "next_run": self.next_run,
+            "created_by": self.created_by
+        }
+
+class TimerWheel:
+    """Hierarchical timing wheel with one-second ticks
+
+    Four levels of 64 slots cover about 194 days; later deadlines wait in an
+    overflow set until they come into range. Adding and removing a timer is
+    O(1), and each tick only touches the slot it lands on, plus the slot of a
+    coarser level when a boundary is crossed (its timers cascade down).
+    """
+
+    SLOT_BITS = 6
+    SLOTS = 1 << SLOT_BITS
+    LEVELS = 4
+
+    def __init__(self, now: int):
+        self.current = now
+        self._wheels: List[List[Set[int]]] = [[set() for _ in range(self.SLOTS)] for _ in range(self.LEVELS)]
+        self._overflow: Set[int] = set()
+        self._due: List[int] = []
+        self._deadlines: Dict[int, int] = {}
+        self._slots: Dict[int, Set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def add(self, timer_id: int, deadline: int):
+        """Schedule a timer; deadlines in the past fire on the next advance"""
+        self.remove(timer_id)
+        self._deadlines[timer_id] = deadline
+        self._place(timer_id, deadline)
+
+    def remove(self, timer_id: int):
+        """Cancel a timer if it is scheduled"""
+        if self._deadlines.pop(timer_id, None) is None:
+            return
+        bucket = self._slots.pop(timer_id, None)
+        if bucket is not None:
+            bucket.discard(timer_id)
+        else:
+            self._due.remove(timer_id)
+
+    def _place(self, timer_id: int, deadline: int):
+        """Put a timer in the slot of the finest level that can hold its deadline"""
+        delta = deadline - self.current
+        if delta <= 0:
+            self._due.append(timer_id)
+            return
+
+        for level in range(self.LEVELS):
+            if delta < 1 << (self.SLOT_BITS * (level + 1)):
+                bucket = self._wheels[level][(deadline >> (self.SLOT_BITS * level)) & (self.SLOTS - 1)]
+                break
+        else:
+            bucket = self._overflow
+        bucket.add(timer_id)
+        self._slots[timer_id] = bucket
+
+    def advance(self, now: int) -> List[int]:
+        """Move the wheel up to `now` and return the timers that came due, in deadline order"""
+        while self.current < now:
+            self.current += 1
+
+            # Cascade coarser slots whose range starts at this tick
+            for level in range(1, self.LEVELS):
+                if self.current & ((1 << (self.SLOT_BITS * level)) - 1):
+                    break
+                self._cascade(self._wheels[level][(self.current >> (self.SLOT_BITS * level)) & (self.SLOTS - 1)])
+            else:
+                self._cascade(self._overflow)
+
+            self._cascade(self._wheels[0][self.current & (self.SLOTS - 1)])
+
+        due, self._due = self._due, []
+        due.sort(key=self._deadlines.__getitem__)
+        for timer_id in due:
+            del self._deadlines[timer_id]
+        return due
+
+    def _cascade(self, bucket: Set[int]):
+        """Re-place every timer in a slot relative to the current tick"""
+        if not bucket:
+            return
+        timers = list(bucket)
+        bucket.clear()
+        for timer_id in timers:
+            del self._slots[timer_id]
+            self._place(timer_id, self._deadlines[timer_id])
+
+class ScheduleLag:
+    """How late scheduled jobs fired"""
+
+    __slots__ = ('count', 'total', 'max', 'last')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def record(self, lag: float):
+        """Add one firing"""
+        self.count += 1
+        self.total += lag
+        self.last = lag
+        if lag > self.max:
+            self.max = lag
+
+    @property
+    def average(self) -> float:
+        """Mean lag per firing in seconds"""
+        return self.total / self.count if self.count else 0.0
+
+class TriggerScheduler:
+    """Posts trigger responses on schedules, all driven by one loop task
+
+    Jobs live in a JSON file and in a timer wheel keyed by job ID. A job that
+    came due while the bot was offline fires once on startup and then
+    resumes its normal cadence.
+    """
+
+    def __init__(self, bot, path: str = 'data/schedules.json', flush_interval: float = 30.0,
+                 max_per_guild: int = 50, min_interval: int = 60, batch_size: int = 50):
+        self.bot = bot
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_per_guild = max_per_guild
+        self.min_interval = min_interval
+        self.batch_size = max(1, batch_size)
+
+        # Posts a job's trigger response; set by the trigger cog
+        self.fire_handler: Optional[Callable[[ScheduledJob], Awaitable[bool]]] = None
+
+        self._jobs: Dict[int, ScheduledJob] = self._load()
+        self._next_id = max(self._jobs, default=0) + 1
+        self._wheel = TimerWheel(int(time.time()))
+        for job in self._jobs.values():
+            self._wheel.add(job.job_id, job.next_run)
+
+        self.lag = ScheduleLag()
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+
+    def _load(self) -> Dict[int, ScheduledJob]:
+        """Load the stored jobs"""
+        try:
+            with open(self.path, 'rb') as f:
+                data = codec.loads(f.read())
+            return {int(job_id): ScheduledJob.from_dict(int(job_id), job) for job_id, job in data.items()}
+        except FileNotFoundError:
+            return {}
+        except (ValueError, KeyError, AttributeError, TypeError) as e:
+            logger.error(f"Error loading schedules: {str(e)}")
+            return {}
+
+    def _write(self, data: Dict[str, Dict[str, Any]]) -> bool:
+        """Write the jobs to disk; runs in a worker thread"""
+        try:
+            utils.atomic_write(self.path, codec.dumps(data))
+            return True
+        except Exception as e:
+            logger.error(f"Error saving schedules: {str(e)}")
+            return False
+
+    async def flush(self) -> bool:
+        """Write the jobs to disk if anything changed since the last flush"""
+        if not self._dirty:
+            return True
+
+        data = {str(job_id): job.to_dict() for job_id, job in self._jobs.items()}
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        success = await asyncio.to_thread(self._write, data)
+        if not success:
+            self._dirty = True
+        return success
+
+    # ------ Jobs ------
+
+    def add(self, trigger_name: str, guild_id: int, channel_id: int, interval: int,
+            created_by: Optional[int] = None) -> ScheduledJob:
+        """Schedule a trigger to post every `interval` seconds, starting one interval from now"""
+        if interval < self.min_interval:
+            raise ValueError(f"The interval must be at least {self.min_interval} seconds")
+        if len(self.for_guild(guild_id)) >= self.max_per_guild:
+            raise ValueError(f"A server can have at most {self.max_per_guild} schedules")
+
+        job = ScheduledJob(self._next_id, trigger_name, guild_id, channel_id, interval,
+                           int(time.time()) + interval, created_by)
+        self._next_id += 1
+        self._jobs[job.job_id] = job
+        self._wheel.add(job.job_id, job.next_run)
+        self._dirty = True
+        return job
+
+    def remove(self, job_id: int) -> bool:
+        """Cancel a job"""
+        if self._jobs.pop(job_id, None) is None:
+            return False
+        self._wheel.remove(job_id)
+        self._dirty = True
+        return True
+
+    def remove_guild(self, guild_id) -> int:
+        """Cancel every job of a guild; returns how many were cancelled"""
+        doomed = [job.job_id for job in self._jobs.values() if job.guild_id == int(guild_id)]
+        for job_id in doomed:
+            self.remove(job_id)
+        return len(doomed)
+
+    def capture_snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Get the stored JSON form of all jobs"""
+        return {str(job_id): job.to_dict() for job_id, job in self._jobs.items()}
+
+    def install_snapshot(self, jobs: Dict[int, ScheduledJob]):
+        """Replace all jobs with restored ones"""
+        self._jobs = dict(jobs)
+        self._next_id = max(self._jobs, default=0) + 1
+        self._wheel = TimerWheel(int(time.time()))
+        for job in self._jobs.values():
+            self._wheel.add(job.job_id, job.next_run)
+        self._dirty = True
+
+    def get(self, job_id: int) -> Optional[ScheduledJob]:
+        """Get a job by ID"""
+        return self._jobs.get(job_id)
+
+    def for_guild(self, guild_id: int) -> List[ScheduledJob]:
+        """Get a guild's jobs, soonest first"""
+        return sorted((job for job in self._jobs.values() if job.guild_id == guild_id), key=lambda job: job.next_run)
+
+    @property
+    def depth(self) -> int:
+        """Number of jobs waiting in the wheel"""
+        return len(self._wheel)
+
+    # ------ Running ------
+
+    def start(self):
+        """Start the scheduler loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="trigger-scheduler")
+
+    async def stop(self):
+        """Stop the scheduler loop and save the jobs"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        """Tick once a second, on the second, and fire whatever came due"""
+        await self.bot.wait_until_ready()
+        while True:
+            await asyncio.sleep(1.0 - time.time() % 1.0)
+            try:
+                await self.tick()
+            except Exception as e:
+                logger.error(f"Error running scheduled triggers: {str(e)}")
+
+            if self._dirty and time.monotonic() - self._last_flush >= self.flush_interval:
+                await self.flush()
+
+    async def tick(self):
+        """Advance the wheel to now and fire the due jobs in batches"""
+        now = time.time()
+        due = [self._jobs[job_id] for job_id in self._wheel.advance(int(now)) if job_id in self._jobs]
+        if not due:
+            return
+
+        for job in due:
+            self.lag.record(max(0.0, now - job.next_run))
+            # Fire once for any number of missed runs, then keep the original cadence
+            missed = max(0, int(now) - job.next_run) // job.interval
+            job.next_run += (missed + 1) * job.interval
+            self._wheel.add(job.job_id, job.next_run)
+        self._dirty = True
+
+        for start in range(0, len(due), self.batch_size):
+            batch = due[start:start + self.batch_size]
+            results = await asyncio.gather(*(self._fire(job) for job in batch))
+
+            # Jobs whose trigger or channel is gone are dropped
+            for job, keep in zip(batch, results):
+                if not keep:
+                    logger.info(f"Dropping schedule {job.job_id}: trigger {job.trigger_name} or its channel no longer exists")
+                    self.remove(job.job_id)
+
+    async def _fire(self, job: ScheduledJob) -> bool:
+        """Post one job; returns False if the job can never fire again"""
+        if self.fire_handler is None:
+            return True
+        try:
+            return await self.fire_handler(job)
+        except Exception as e:
+            logger.error(f"Error firing schedule {job.job_id}: {str(e)}")
+            return True
@@ -0,0 +1,256 @@
+import codecs
+import json
+import logging
+from typing import Any, BinaryIO, Callable, Dict, Iterator, Optional, Tuple
+
+from utils.trigger_record import TriggerRecord, TriggerScope
+
+logger = logging.getLogger('schema')
+
+# Version written to the header of triggers.json
+#   1: a bare object of name -> record, without a header
+#   2: {"schema": 2, "triggers": {name -> record}}; IDs are integers
+SCHEMA_VERSION = 2
+
+class SchemaError(ValueError):
+    """Raised when a data file or record does not match the expected schema"""
+
+# ------ Records ------
+
+def _migrate_v1(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Version 1 files may hold IDs as strings and creation times as float timestamps"""
+    data = dict(data)
+    for field in ('creator_id', 'guild_id'):
+        value = data.get(field)
+        if isinstance(value, str) and value.isdigit():
+            data[field] = int(value)
+    created_at = data.get('created_at')
+    if isinstance(created_at, float):
+        data['created_at'] = int(created_at)
+    return data
+
+# Steps that upgrade a record from the given version to the next one
+MIGRATIONS: Dict[int, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+    1: _migrate_v1
+}
+
+def _check_type(name: str, data: Dict[str, Any], field: str, types: Tuple[type, ...]):
+    """Check an optional field's type"""
+    value = data.get(field)
+    if value is not None and (not isinstance(value, types) or isinstance(value, bool)):
+        raise SchemaError(f"Trigger {name!r}: {field} must be {' or '.join(t.__name__ for t in types)}, not {type(value).__name__}")
+
+def parse_record(name: Any, data: Any, version: int = SCHEMA_VERSION) -> TriggerRecord:
+    """Upgrade a stored record to the current schema, validate it and build it"""
+    if not isinstance(name, str) or not name.strip():
+        raise SchemaError(f"Invalid trigger name {name!r}")
+    if not isinstance(data, dict):
+        raise SchemaError(f"Trigger {name!r}: record must be an object, not {type(data).__name__}")
+
+    for step in range(version, SCHEMA_VERSION):
+        data = MIGRATIONS[step](data)
+
+    for field in ('creator_id', 'guild_id', 'version'):
+        _check_type(name, data, field, (int,))
+    # Whole seconds are stored, but a float timestamp is still a valid time
+    _check_type(name, data, 'created_at', (int, float))
+    for field in ('creator_name', 'content', 'attachment_url'):
+        _check_type(name, data, field, (str,))
+
+    responses = data.get('responses')
+    if responses is not None:
+        if not isinstance(responses, list) or not all(isinstance(response, dict) for response in responses):
+            raise SchemaError(f"Trigger {name!r}: responses must be a list of objects")
+        for response in responses:
+            _check_type(name, response, 'content', (str,))
+            _check_type(name, response, 'attachment_url', (str,))
+            _check_type(name, response, 'weight', (int,))
+            if not response.get('content') and not response.get('attachment_url'):
+                raise SchemaError(f"Trigger {name!r}: every response needs content or an attachment")
+    # A lone response may be empty: older versions of /trigger create saved such triggers
+
+    scope = data.get('scope')
+    if scope is not None:
+        if not isinstance(scope, dict):
+            raise SchemaError(f"Trigger {name!r}: scope must be an object")
+        for field in TriggerScope.FIELDS:
+            ids = scope.get(field, [])
+            if not isinstance(ids, list) or not all(isinstance(value, int) and not isinstance(value, bool) for value in ids):
+                raise SchemaError(f"Trigger {name!r}: scope {field} must be a list of IDs")
+
+    return TriggerRecord.from_dict(data)
+
+# ------ Whole files ------
+
+def wrap_triggers(records: Dict[str, Any]) -> Dict[str, Any]:
+    """Put the schema header around the stored form of the triggers"""
+    return {"schema": SCHEMA_VERSION, "triggers": records}
+
+def unwrap_triggers(data: Any) -> Tuple[int, Dict[str, Any]]:
+    """Get the schema version and the stored triggers of a parsed triggers file"""
+    if not isinstance(data, dict):
+        raise SchemaError("Top level is not an object")
+
+    version = data.get('schema')
+    if not isinstance(version, int) or isinstance(version, bool):
+        # No header: version 1, where every top-level key is a trigger
+        return 1, data
+    if version > SCHEMA_VERSION:
+        raise SchemaError(f"Schema version {version} is newer than this bot supports ({SCHEMA_VERSION})")
+    if version < 1:
+        raise SchemaError(f"Invalid schema version {version}")
+
+    triggers = data.get('triggers')
+    if not isinstance(triggers, dict):
+        raise SchemaError("The triggers entry is missing or not an object")
+    return version, triggers
+
+def parse_triggers(data: Any, invalid: Optional[Dict[str, Any]] = None) -> Dict[str, TriggerRecord]:
+    """Validate a parsed triggers file of any supported version and build its records
+
+    An invalid record raises SchemaError, unless an `invalid` mapping is
+    given: then the record is logged, left out and its stored form is put there.
+    """
+    version, triggers = unwrap_triggers(data)
+    records: Dict[str, TriggerRecord] = {}
+    for name, record in triggers.items():
+        try:
+            records[name] = parse_record(name, record, version)
+        except SchemaError as e:
+            if invalid is None:
+                raise
+            logger.error(f"Skipping invalid record: {str(e)}")
+            invalid[name] = record
+    return records
+
+# ------ Streaming ------
+
+class TriggerStream:
+    """Reads a triggers file one record at a time
+
+    Only the record being parsed and one read chunk are held in memory, so
+    files far larger than RAM can be checked and migrated; a single record
+    larger than `max_record` characters is refused. `version` is
+    known once the first entry has been read. Iterating yields
+    (name, stored record) pairs in file order.
+    """
+
+    def __init__(self, file: BinaryIO, chunk_size: int = 64 * 1024, max_record: int = 16 * 2**20):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.max_record = max_record
+        self.version: Optional[int] = None
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+        # Characters dropped from the front of the buffer, for error offsets
+        self._consumed = 0
+
+    def _fill(self) -> bool:
+        """Read another chunk; returns False at the end of the file"""
+        if self._eof:
+            return False
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            self._eof = True
+            self._buffer += self._text.decode(b'', final=True)
+            return False
+
+        # Drop what has been parsed so the buffer stays about one chunk long
+        if self._pos > self.chunk_size:
+            self._consumed += self._pos
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+        self._buffer += self._text.decode(chunk)
+        return True
+
+    def _error(self, message: str) -> SchemaError:
+        """Build an error that points at the current position"""
+        return SchemaError(f"{message} (character {self._consumed + self._pos})")
+
+    def _next_char(self) -> str:
+        """Skip whitespace and get the next character without consuming it"""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in ' \t\r\n':
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                raise self._error("Unexpected end of file")
+
+    def _expect(self, char: str):
+        """Consume one structural character"""
+        if self._next_char() != char:
+            raise self._error(f"Expected {char!r}")
+        self._pos += 1
+
+    def _value(self) -> Any:
+        """Parse the next JSON value, reading more of the file until it is complete"""
+        self._next_char()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError as e:
+                if len(self._buffer) - self._pos > self.max_record:
+                    raise self._error(f"Invalid JSON or a record over {self.max_record} characters: {e.msg}")
+                if self._fill():
+                    continue
+                raise self._error(f"Invalid JSON: {e.msg}")
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def _entries(self) -> Iterator[str]:
+        """Yield the keys of the object at the current position; the caller parses each value"""
+        self._expect('{')
+        if self._next_char() == '}':
+            self._pos += 1
+            return
+        while True:
+            key = self._value()
+            if not isinstance(key, str):
+                raise self._error("Expected a string key")
+            self._expect(':')
+            yield key
+            separator = self._next_char()
+            self._pos += 1
+            if separator == '}':
+                return
+            if separator != ',':
+                raise self._error("Expected ',' or '}'")
+
+    def __iter__(self) -> Iterator[Tuple[str, Any]]:
+        entries = self._entries()
+        for key in entries:
+            if self.version is None:
+                if key == 'schema' and self._next_char() in '0123456789':
+                    self.version = self._value()
+                    if self.version > SCHEMA_VERSION:
+                        raise SchemaError(f"Schema version {self.version} is newer than this bot supports ({SCHEMA_VERSION})")
+                    continue
+                self.version = 1
+
+            if self.version == 1:
+                yield key, self._value()
+            elif key == 'triggers':
+                for name in self._entries():
+                    yield name, self._value()
+            else:
+                # Unknown header fields are skipped
+                self._value()
+
+        if self.version is None:
+            self.version = 1
+        if self._next_char_or_none() is not None:
+            raise self._error("Unexpected data after the top-level object")
+
+    def _next_char_or_none(self) -> Optional[str]:
+        """Like _next_char, but None at the end of the file"""
+        try:
+            return self._next_char()
+        except SchemaError:
+            return None
@@ -0,0 +1,281 @@
+import asyncio
+import datetime
+import hashlib
+import io
+import os
+import tempfile
+import zipfile
+import logging
+from typing import Dict, List, Optional, Any, Tuple
+
+import utils
+from utils import codec
+from utils.compact_store import CompactTriggerStore
+from utils.normalize import get_normalizer
+from utils.scheduler import ScheduledJob
+from utils.schema import parse_triggers, wrap_triggers
+from utils.trigger_stats import TriggerUsage
+
+logger = logging.getLogger('snapshots')
+
+SNAPSHOT_FORMAT = 1
+
+# Label of the snapshot taken before a restore; these are rotated apart from the others
+PRE_RESTORE = "pre-restore"
+
+class SnapshotError(Exception):
+    """A snapshot could not be written, read or validated"""
+
+class SnapshotManager:
+    """Writes compressed point-in-time snapshots of all bot data and restores them
+
+    State is captured on the event loop in O(n) pointer copies; compressing
+    and writing the archive happens in a worker thread, so message handling
+    carries on while a snapshot is taken.
+    """
+
+    def __init__(self, bot, directory: str = 'data/snapshots', interval: float = 86400.0, keep: int = 7):
+        self.bot = bot
+        self.db = bot.db_manager
+        self.directory = directory
+        self.interval = interval
+        self.keep = max(1, keep)
+
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    # ------ Scheduling ------
+
+    def start(self):
+        """Start taking snapshots in the background"""
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run(), name="snapshot-scheduler")
+
+    async def stop(self):
+        """Stop the background snapshots"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        """Snapshot loop"""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.create("scheduled")
+            except Exception as e:
+                logger.error(f"Error taking scheduled snapshot: {str(e)}")
+
+    # ------ Creating ------
+
+    async def create(self, label: str = "manual") -> str:
+        """Take a snapshot and return its file name"""
+        async with self._lock:
+            return await self._create(label)
+
+    async def _create(self, label: str, protect: Optional[str] = None) -> str:
+        """Capture all state in one step on the loop, then write it out in a worker thread"""
+        captured = {
+            "data": self.db.capture_snapshot(),
+            "stats": self.bot.trigger_stats.capture_snapshot(),
+            "departed": self.bot.guild_collector.capture_snapshot(),
+            "schedules": self.bot.scheduler.capture_snapshot()
+        }
+
+        stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        name = f"snapshot-{stamp}-{label}.zip"
+        path = os.path.join(self.directory, name)
+
+        await asyncio.to_thread(self._write_snapshot, path, captured)
+        await asyncio.to_thread(self._rotate, protect)
+
+        logger.info(f"Wrote snapshot {name}")
+        return name
+
+    def _write_snapshot(self, path: str, captured: Dict[str, Any]):
+        """Serialize and compress a captured state; runs in a worker thread"""
+        data = captured["data"]
+        members: Dict[str, bytes] = {}
+
+        triggers = data["triggers"]
+        if data["storage_format"] == 'compact':
+            with triggers["handle"] as handle:
+                members["triggers.dat"] = handle.read(triggers["size"])
+        else:
+            members["triggers.json"] = codec.dumps(wrap_triggers({name: record.to_dict() for name, record in triggers.items()}))
+
+        members["prefixes.json"] = codec.dumps(data["prefixes"])
+        members["matching.json"] = codec.dumps(data["matching"])
+        members["trigger_stats.json"] = codec.dumps(captured["stats"])
+        members["departed_guilds.json"] = codec.dumps(captured["departed"])
+        members["schedules.json"] = codec.dumps(captured["schedules"])
+
+        manifest = {
+            "format": SNAPSHOT_FORMAT,
+            "created_at": int(datetime.datetime.now().timestamp()),
+            "storage_format": data["storage_format"],
+            "checksums": {member: hashlib.sha256(content).hexdigest() for member, content in members.items()}
+        }
+
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("manifest.json", codec.dumps(manifest))
+            for member, content in members.items():
+                archive.writestr(member, content)
+        utils.atomic_write(path, buffer.getvalue())
+
+    def _rotate(self, protect: Optional[str] = None):
+        """Delete the oldest snapshots beyond the retention count
+
+        Pre-restore snapshots have their own count, so restores never push out
+        the regular ones, and the protected snapshot is never deleted.
+        """
+        names = [name for name, _, _ in self.list() if name != protect]
+        regular = [name for name in names if not name.endswith(f"-{PRE_RESTORE}.zip")]
+        pre_restore = [name for name in names if name.endswith(f"-{PRE_RESTORE}.zip")]
+        for name in regular[self.keep:] + pre_restore[self.keep:]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+                logger.info(f"Rotated out snapshot {name}")
+            except OSError as e:
+                logger.error(f"Error removing snapshot {name}: {str(e)}")
+
+    def list(self) -> List[Tuple[str, int, float]]:
+        """List snapshots as (name, size, mtime), newest first"""
+        try:
+            names = [name for name in os.listdir(self.directory) if name.startswith('snapshot-') and name.endswith('.zip')]
+        except FileNotFoundError:
+            return []
+
+        snapshots = []
+        for name in names:
+            stat = os.stat(os.path.join(self.directory, name))
+            snapshots.append((name, stat.st_size, stat.st_mtime))
+        return sorted(snapshots, key=lambda snapshot: snapshot[2], reverse=True)
+
+    # ------ Restoring ------
+
+    async def restore(self, name: str) -> str:
+        """Validate a snapshot, then swap it in for the live data"""
+        if os.path.basename(name) != name or not name.endswith('.zip'):
+            raise SnapshotError("Invalid snapshot name")
+
+        path = os.path.join(self.directory, name)
+        if not os.path.exists(path):
+            raise SnapshotError(f"No snapshot named {name}")
+
+        async with self._lock:
+            # Parse and check everything before touching live data
+            restored = await asyncio.to_thread(self._validate, path)
+
+            # Keep a way back, without rotating out the snapshot being restored
+            safety = await self._create(PRE_RESTORE, protect=name)
+
+            await asyncio.to_thread(self._stage, restored)
+            self._swap(restored)
+
+        logger.info(f"Restored snapshot {name}")
+        return safety
+
+    def _validate(self, path: str) -> Dict[str, Any]:
+        """Read a snapshot and check its checksums and contents; runs in a worker thread"""
+        try:
+            with zipfile.ZipFile(path) as archive:
+                manifest = codec.loads(archive.read("manifest.json"))
+                members = {member: archive.read(member) for member in manifest["checksums"]}
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile) as e:
+            raise SnapshotError(f"Could not read snapshot: {str(e)}")
+
+        if manifest.get("format") != SNAPSHOT_FORMAT:
+            raise SnapshotError(f"Unsupported snapshot format {manifest.get('format')}")
+        if manifest.get("storage_format") != self.db.storage_format:
+            raise SnapshotError(f"Snapshot uses {manifest.get('storage_format')} storage but the bot uses {self.db.storage_format}")
+
+        for member, checksum in manifest["checksums"].items():
+            if hashlib.sha256(members[member]).hexdigest() != checksum:
+                raise SnapshotError(f"Checksum mismatch for {member}")
+
+        # Every record is built here, so nothing can fail once the swap has started
+        restored: Dict[str, Any] = {"members": members, "triggers": None}
+        try:
+            if "triggers.dat" in members:
+                restored["count"] = self._validate_compact(members["triggers.dat"])
+            else:
+                restored["triggers"] = parse_triggers(codec.loads(members["triggers.json"]))
+                restored["count"] = len(restored["triggers"])
+
+            restored["prefixes"] = {str(guild_id): str(prefix) for guild_id, prefix in codec.loads(members["prefixes.json"]).items()}
+            # Older snapshots have no matching settings or schedules; the current ones are kept
+            if "matching.json" in members:
+                restored["matching"] = {str(guild_id): [str(step) for step in steps]
+                                        for guild_id, steps in codec.loads(members["matching.json"]).items()}
+                for steps in restored["matching"].values():
+                    get_normalizer(steps)
+            if "schedules.json" in members:
+                restored["schedules"] = {int(job_id): ScheduledJob.from_dict(int(job_id), job)
+                                         for job_id, job in codec.loads(members["schedules.json"]).items()}
+            restored["stats"] = {name: TriggerUsage.from_dict(usage) for name, usage in codec.loads(members["trigger_stats.json"]).items()}
+            restored["departed"] = {str(guild_id): int(left_at) for guild_id, left_at in codec.loads(members["departed_guilds.json"]).items()}
+        except (KeyError, ValueError, TypeError, AttributeError) as e:
+            raise SnapshotError(f"Snapshot contents are invalid: {str(e)}")
+
+        return restored
+
+    @staticmethod
+    def _validate_compact(content: bytes) -> int:
+        """Open a compact store image in a scratch file and decode every record"""
+        with tempfile.TemporaryDirectory() as scratch:
+            scratch_path = os.path.join(scratch, "triggers.dat")
+            with open(scratch_path, 'wb') as f:
+                f.write(content)
+
+            store = CompactTriggerStore(scratch_path)
+            try:
+                for name in store:
+                    store[name]
+                return len(store)
+            finally:
+                store.close()
+
+    def _stage(self, restored: Dict[str, Any]):
+        """Write the restored files next to the live ones; runs in a worker thread"""
+        members = restored["members"]
+        for member, path in self._targets().items():
+            if member in members:
+                with open(f"{path}.restore", 'wb') as f:
+                    f.write(members[member])
+                    f.flush()
+                    os.fsync(f.fileno())
+
+    def _swap(self, restored: Dict[str, Any]):
+        """Move the staged files into place and adopt them, without yielding to the loop"""
+        members = restored["members"]
+        for member, path in self._targets().items():
+            if member in members:
+                os.replace(f"{path}.restore", path)
+
+        self.db.install_state(restored["triggers"], restored["prefixes"], restored.get("matching"))
+        self.bot.trigger_stats.install_snapshot(restored["stats"])
+        if "schedules" in restored:
+            self.bot.scheduler.install_snapshot(restored["schedules"])
+        self.bot.guild_settings.invalidate()
+
+        # Departed guilds are saved in the background
+        asyncio.create_task(self.bot.guild_collector.install_snapshot(restored["departed"]))
+
+    def _targets(self) -> Dict[str, str]:
+        """Map snapshot members to the live files they replace; a prefix store is refilled by install_state instead"""
+        targets = {
+            "triggers.dat" if self.db.compact_store is not None else "triggers.json": self.db.trigger_store_path,
+            "matching.json": self.db.matching_path,
+            "trigger_stats.json": self.bot.trigger_stats.path,
+            "departed_guilds.json": self.bot.guild_collector.path,
+            "schedules.json": self.bot.scheduler.path
+        }
+        if self.db.prefix_store is None:
+            targets["prefixes.json"] = self.db.prefix_path
+        return targets
@@ -0,0 +1,106 @@
+import logging
+from typing import Dict, List, Optional, Tuple, Union
+
+logger = logging.getLogger('templates')
+
+# Placeholders a trigger response may use
+VARIABLES = ('user', 'channel', 'guild', 'args')
+
+# Discord rejects messages longer than this, so no render may produce more
+MAX_OUTPUT = 2000
+MAX_PLACEHOLDERS = 25
+
+class TemplateError(ValueError):
+    """A trigger response is not a valid template"""
+
+class CompiledTemplate:
+    """A response parsed once into literal text and variable slots
+
+    Rendering is a single pass over the parts. Substituted values are never
+    parsed again and the output is cut off at MAX_OUTPUT characters, so the
+    cost of a render is bounded by the template length plus MAX_OUTPUT no
+    matter what the template or the values contain.
+    """
+
+    __slots__ = ('parts', 'variables', 'static')
+
+    def __init__(self, parts: Tuple[Union[str, int], ...]):
+        # Literal strings, and indexes into VARIABLES for placeholders
+        self.parts = parts
+        self.variables = frozenset(VARIABLES[part] for part in parts if isinstance(part, int))
+        # Text of a template without placeholders, returned as is
+        self.static: Optional[str] = None if self.variables else ''.join(parts)[:MAX_OUTPUT]
+
+    @property
+    def uses_args(self) -> bool:
+        """Whether the template wants the text after the trigger name"""
+        return 'args' in self.variables
+
+    def render(self, values: Dict[str, str]) -> str:
+        """Fill in the placeholders, stopping at MAX_OUTPUT characters"""
+        if self.static is not None:
+            return self.static
+
+        budget = MAX_OUTPUT
+        out: List[str] = []
+        for part in self.parts:
+            text = part if isinstance(part, str) else values.get(VARIABLES[part], '')
+            if len(text) >= budget:
+                out.append(text[:budget])
+                break
+            out.append(text)
+            budget -= len(text)
+        return ''.join(out)
+
+def compile_template(text: str, strict: bool = False) -> CompiledTemplate:
+    """Parse a trigger response into a CompiledTemplate
+
+    `{{` and `}}` stand for literal braces. In strict mode, used when a trigger
+    is created, unknown placeholders and stray braces are errors; otherwise
+    they are kept as literal text so responses written before templates
+    existed still render unchanged.
+    """
+    # Most responses have no braces at all and keep their (interned) string
+    if '{' not in text and '}' not in text:
+        return CompiledTemplate((text,))
+
+    parts: List[Union[str, int]] = []
+    literal: List[str] = []
+    placeholders = 0
+    i = 0
+    length = len(text)
+
+    while i < length:
+        char = text[i]
+
+        if char in '{}' and text.startswith(char * 2, i):
+            literal.append(char)
+            i += 2
+            continue
+
+        if char == '{':
+            end = text.find('}', i + 1)
+            name = text[i + 1:end] if end != -1 else None
+            if name in VARIABLES and placeholders < MAX_PLACEHOLDERS:
+                if literal:
+                    parts.append(''.join(literal))
+                    literal = []
+                parts.append(VARIABLES.index(name))
+                placeholders += 1
+                i = end + 1
+                continue
+            if strict:
+                if end == -1:
+                    raise TemplateError("Unclosed `{` in response; write `{{` for a literal brace")
+                if name in VARIABLES:
+                    raise TemplateError(f"Too many placeholders; at most {MAX_PLACEHOLDERS} are allowed")
+                raise TemplateError(f"Unknown placeholder `{{{name}}}`; use one of " + ", ".join(f"`{{{v}}}`" for v in VARIABLES))
+        elif char == '}' and strict:
+            raise TemplateError("Unmatched `}` in response; write `}}` for a literal brace")
+
+        literal.append(char)
+        i += 1
+
+    if literal:
+        parts.append(''.join(literal))
+    return CompiledTemplate(tuple(parts))
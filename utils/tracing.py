@@ -0,0 +1,220 @@
+import asyncio
+import contextvars
+import datetime
+import os
+import random
+import time
+import logging
+from collections import deque
+from typing import Deque, Dict, List, Optional, Any, Tuple
+
+import discord
+from discord import app_commands
+
+from utils import codec
+
+logger = logging.getLogger('tracing')
+
+# The trace of the message or interaction being handled by the current task
+_current_trace: contextvars.ContextVar[Optional['Trace']] = contextvars.ContextVar('current_trace', default=None)
+
+class Trace:
+    """Timed stages of handling one message or interaction"""
+
+    __slots__ = ('kind', 'label', 'guild_id', 'started', 'wall_time', 'age', 'spans', 'duration')
+
+    def __init__(self, kind: str, label: str, guild_id: Optional[int] = None, created_at: Optional[datetime.datetime] = None):
+        self.kind = kind
+        self.label = label
+        self.guild_id = guild_id
+        self.started = time.perf_counter()
+        self.wall_time = time.time()
+        # How old the event was when we started on it, per Discord's timestamp
+        self.age = max(0.0, self.wall_time - created_at.timestamp()) if created_at else None
+        # (stage, offset from start, duration) in seconds
+        self.spans: List[Tuple[str, float, float]] = []
+        self.duration = 0.0
+
+    def add_span(self, stage: str, started: float, ended: float):
+        """Record a stage timed with perf_counter"""
+        self.spans.append((stage, started - self.started, ended - started))
+
+    def stage_totals(self) -> Dict[str, float]:
+        """Sum the time spent in each stage, in seconds"""
+        totals: Dict[str, float] = {}
+        for stage, _, duration in self.spans:
+            totals[stage] = totals.get(stage, 0.0) + duration
+        return totals
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the JSONL form of the trace, with times in milliseconds"""
+        return {
+            "time": self.wall_time,
+            "kind": self.kind,
+            "label": self.label,
+            "guild_id": self.guild_id,
+            "age_ms": round(self.age * 1000, 3) if self.age is not None else None,
+            "duration_ms": round(self.duration * 1000, 3),
+            "spans": [
+                {"stage": stage, "offset_ms": round(offset * 1000, 3), "duration_ms": round(duration * 1000, 3)}
+                for stage, offset, duration in self.spans
+            ]
+        }
+
+class Span:
+    """Context manager that records one stage into a trace"""
+
+    __slots__ = ('trace', 'stage', 'started')
+
+    def __init__(self, trace: Trace, stage: str):
+        self.trace = trace
+        self.stage = stage
+        self.started = 0.0
+
+    def __enter__(self) -> 'Span':
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        self.trace.add_span(self.stage, self.started, time.perf_counter())
+        return False
+
+class _NullSpan:
+    """Shared no-op span for untraced work"""
+
+    __slots__ = ()
+
+    def __enter__(self) -> '_NullSpan':
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+def span(stage: str):
+    """Time a stage of the current trace; a no-op when the current work is not sampled"""
+    trace = _current_trace.get()
+    if trace is None:
+        return _NULL_SPAN
+    return Span(trace, stage)
+
+class Tracer:
+    """Samples traces, keeps the recent ones in memory and appends them to a JSONL file
+
+    Deciding not to sample costs one random draw, and every span of an
+    unsampled message is a shared no-op. Finished traces are written in
+    batches from a worker thread.
+    """
+
+    def __init__(self, path: str = 'data/traces.jsonl', sample_rate: float = 0.01, keep: int = 500,
+                 flush_interval: float = 5.0, max_bytes: int = 10 * 2**20):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+
+        self.recent: Deque[Trace] = deque(maxlen=keep)
+        self._pending: List[Dict[str, Any]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    # ------ Tracing ------
+
+    def begin(self, kind: str, label: str, guild_id: Optional[int] = None,
+              created_at: Optional[datetime.datetime] = None) -> Optional[Trace]:
+        """Start tracing the current task's work if it is sampled"""
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return None
+
+        trace = Trace(kind, label, guild_id, created_at)
+        _current_trace.set(trace)
+        return trace
+
+    def resume(self, trace: Optional[Trace]):
+        """Make a trace begun in another task the current task's trace"""
+        if trace is not None:
+            _current_trace.set(trace)
+
+    def finish(self, trace: Optional[Trace]):
+        """Close a trace and queue it for writing"""
+        if trace is None:
+            return
+
+        trace.duration = time.perf_counter() - trace.started
+        if _current_trace.get() is trace:
+            _current_trace.set(None)
+
+        self.recent.append(trace)
+        self._pending.append(trace.to_dict())
+
+    def slowest(self, count: int) -> List[Trace]:
+        """Get the slowest of the recent traces"""
+        return sorted(self.recent, key=lambda trace: trace.duration, reverse=True)[:count]
+
+    # ------ Writing ------
+
+    def start(self):
+        """Start writing traces in the background"""
+        if self._task is None and self.sample_rate > 0:
+            self._task = asyncio.create_task(self._run(), name="trace-writer")
+
+    async def stop(self):
+        """Stop the background writer and write out anything pending"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        """Write loop"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self):
+        """Append the finished traces to the JSONL file"""
+        if not self._pending:
+            return
+
+        lines, self._pending = self._pending, []
+        await asyncio.to_thread(self._append, lines)
+
+    def _append(self, traces: List[Dict[str, Any]]):
+        """Append traces, rotating the file once it grows past max_bytes; runs in a worker thread"""
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            if os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+                os.replace(self.path, f"{self.path}.1")
+            with open(self.path, 'ab') as f:
+                f.write(b''.join(codec.dumps_compact(trace) + b'\n' for trace in traces))
+        except Exception as e:
+            logger.error(f"Error writing traces: {str(e)}")
+
+class TracedCommandTree(app_commands.CommandTree):
+    """Command tree that traces slash commands from receipt to completion"""
+
+    async def interaction_check(self, interaction: discord.Interaction, /) -> bool:
+        trace = self.client.tracer.begin('interaction', self._command_name(interaction), interaction.guild_id, interaction.created_at)
+        if trace is not None:
+            interaction.extras['trace'] = trace
+        return True
+
+    @staticmethod
+    def _command_name(interaction: discord.Interaction) -> str:
+        """Get the full name of the invoked command, e.g. `/trigger schedule add`"""
+        data = interaction.data or {}
+        names = [data.get('name', 'unknown')]
+        options = data.get('options', [])
+        # Subcommand groups (2) and subcommands (1) nest their options
+        while options and options[0].get('type') in (1, 2):
+            names.append(options[0]['name'])
+            options = options[0].get('options', [])
+        return '/' + ' '.join(names)
+
+    async def on_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError, /):
+        self.client.tracer.finish(interaction.extras.pop('trace', None))
+        await super().on_error(interaction, error)
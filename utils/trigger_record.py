@@ -0,0 +1,187 @@
+import sys
+from typing import Callable, Dict, FrozenSet, Iterable, Optional, Any, Tuple
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    """Intern a string so identical values share one object"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+class TriggerResponse:
+    """One of the responses a trigger picks from, with its relative weight"""
+
+    __slots__ = ('content', 'attachment_url', 'weight')
+
+    def __init__(self, content: Optional[str] = None, attachment_url: Optional[str] = None, weight: int = 1):
+        self.content = _intern(content)
+        self.attachment_url = _intern(attachment_url)
+        self.weight = int(weight)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'TriggerResponse':
+        """Build a response from its stored JSON form"""
+        return cls(
+            content=data.get('content'),
+            attachment_url=data.get('attachment_url'),
+            weight=data.get('weight', 1)
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the stored JSON form of the response"""
+        return {
+            "content": self.content,
+            "attachment_url": self.attachment_url,
+            "weight": self.weight
+        }
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, TriggerResponse):
+            return NotImplemented
+        return (self.content, self.attachment_url, self.weight) == (other.content, other.attachment_url, other.weight)
+
+class TriggerScope:
+    """Channels and roles a trigger is limited to, as sets built once when the record is loaded
+
+    A deny entry always wins. Non-empty allow sets require the channel, or
+    one of the author's roles, to be listed. Channels are checked with set
+    tests; roles by asking about each listed role, so the cost follows the
+    scope rather than how many roles the author has.
+    """
+
+    __slots__ = ('allow_channels', 'deny_channels', 'allow_roles', 'deny_roles')
+
+    FIELDS = ('allow_channels', 'deny_channels', 'allow_roles', 'deny_roles')
+
+    def __init__(self, allow_channels: Iterable[int] = (), deny_channels: Iterable[int] = (),
+                 allow_roles: Iterable[int] = (), deny_roles: Iterable[int] = ()):
+        self.allow_channels: FrozenSet[int] = frozenset(allow_channels)
+        self.deny_channels: FrozenSet[int] = frozenset(deny_channels)
+        self.allow_roles: FrozenSet[int] = frozenset(allow_roles)
+        self.deny_roles: FrozenSet[int] = frozenset(deny_roles)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> Optional['TriggerScope']:
+        """Build a scope from its stored JSON form; None if it limits nothing"""
+        scope = cls(**{field: (int(value) for value in data.get(field) or ()) for field in cls.FIELDS})
+        return scope if scope else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the stored JSON form of the scope, leaving out empty lists"""
+        return {field: sorted(getattr(self, field)) for field in self.FIELDS if getattr(self, field)}
+
+    def replace(self, **changes: Iterable[int]) -> Optional['TriggerScope']:
+        """Get a copy with some sets changed; None if it no longer limits anything"""
+        values = {field: getattr(self, field) for field in self.FIELDS}
+        values.update(changes)
+        scope = TriggerScope(**values)
+        return scope if scope else None
+
+    def allows(self, channel_id: int, parent_id: Optional[int], has_role: Callable[[int], bool]) -> bool:
+        """Check whether a message in a channel (or a thread of parent_id) from an author with has_role may fire the trigger"""
+        if channel_id in self.deny_channels or parent_id in self.deny_channels:
+            return False
+        if self.allow_channels and channel_id not in self.allow_channels and parent_id not in self.allow_channels:
+            return False
+        if self.deny_roles and any(has_role(role_id) for role_id in self.deny_roles):
+            return False
+        if self.allow_roles and not any(has_role(role_id) for role_id in self.allow_roles):
+            return False
+        return True
+
+    def __bool__(self) -> bool:
+        return bool(self.allow_channels or self.deny_channels or self.allow_roles or self.deny_roles)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, TriggerScope):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in self.FIELDS)
+
+class TriggerRecord:
+    """A single trigger as held in memory
+
+    Slots keep per-trigger overhead low, strings that repeat across triggers
+    (creator names, identical responses) are interned, and timestamps are
+    whole seconds. The version starts at 1 and is bumped on every update, so
+    writers can detect that a record changed since they read it.
+
+    A trigger with a single response keeps it in content/attachment_url and
+    has no responses tuple. One with several holds them all in responses,
+    and content/attachment_url mirror the first so older readers still work.
+    A trigger limited to some channels or roles has a scope; others have None.
+    """
+
+    __slots__ = ('creator_id', 'creator_name', 'created_at', 'guild_id', 'attachment_url', 'content', 'version', 'responses', 'scope')
+
+    def __init__(self, creator_id: Optional[int] = None, creator_name: Optional[str] = None,
+                 created_at: int = 0, guild_id: Optional[int] = None,
+                 attachment_url: Optional[str] = None, content: Optional[str] = None, version: int = 1,
+                 responses: Optional[Tuple[TriggerResponse, ...]] = None, scope: Optional[TriggerScope] = None):
+        self.creator_id = creator_id
+        self.creator_name = _intern(creator_name)
+        self.created_at = int(created_at or 0)
+        self.guild_id = guild_id
+        self.attachment_url = _intern(attachment_url)
+        self.content = _intern(content)
+        self.version = int(version or 1)
+        self.responses = tuple(responses) if responses else None
+        self.scope = scope if scope else None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'TriggerRecord':
+        """Build a record from its stored JSON form"""
+        return cls(
+            creator_id=data.get('creator_id'),
+            creator_name=data.get('creator_name'),
+            created_at=data.get('created_at', 0),
+            guild_id=data.get('guild_id'),
+            attachment_url=data.get('attachment_url'),
+            content=data.get('content'),
+            version=data.get('version', 1),
+            responses=tuple(TriggerResponse.from_dict(response) for response in data['responses']) if data.get('responses') else None,
+            scope=TriggerScope.from_dict(data['scope']) if data.get('scope') else None
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the stored JSON form of the record"""
+        data = {
+            "creator_id": self.creator_id,
+            "creator_name": self.creator_name,
+            "created_at": self.created_at,
+            "guild_id": self.guild_id,
+            "attachment_url": self.attachment_url,
+            "content": self.content,
+            "version": self.version
+        }
+        if self.responses:
+            data["responses"] = [response.to_dict() for response in self.responses]
+        if self.scope:
+            data["scope"] = self.scope.to_dict()
+        return data
+
+    def all_responses(self) -> Tuple[TriggerResponse, ...]:
+        """Get every response of the trigger, including a lone one"""
+        if self.responses:
+            return self.responses
+        return (TriggerResponse(self.content, self.attachment_url),)
+
+    @staticmethod
+    def response_fields(responses: Tuple[TriggerResponse, ...]) -> Dict[str, Any]:
+        """Get the record fields that store a list of responses, for replace or update_trigger"""
+        first = responses[0]
+        return {
+            "content": first.content,
+            "attachment_url": first.attachment_url,
+            "responses": responses if len(responses) > 1 else None
+        }
+
+    def replace(self, **changes: Any) -> 'TriggerRecord':
+        """Get a copy of the record with some fields changed"""
+        values = {field: getattr(self, field) for field in self.__slots__}
+        values.update(changes)
+        return TriggerRecord(**values)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, TriggerRecord):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in self.__slots__)
+
+    def __repr__(self) -> str:
+        return f"TriggerRecord(creator_name={self.creator_name!r}, guild_id={self.guild_id!r})"
@@ -0,0 +1,168 @@
+import asyncio
+import heapq
+import json
+import time
+import logging
+from typing import Dict, Iterable, List, Optional, Any, Tuple
+
+import utils
+from utils import codec
+
+logger = logging.getLogger('trigger_stats')
+
+class TriggerUsage:
+    """Usage counters for a single trigger"""
+
+    __slots__ = ('hits', 'last_used', 'guild_hits')
+
+    def __init__(self, hits: int = 0, last_used: int = 0, guild_hits: Optional[Dict[str, int]] = None):
+        self.hits = hits
+        self.last_used = last_used
+        self.guild_hits: Dict[str, int] = guild_hits or {}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'TriggerUsage':
+        """Build usage counters from their stored JSON form"""
+        return cls(
+            hits=int(data.get('hits', 0)),
+            last_used=int(data.get('last_used', 0)),
+            guild_hits={str(guild_id): int(hits) for guild_id, hits in data.get('guilds', {}).items()}
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the stored JSON form of the counters"""
+        return {
+            "hits": self.hits,
+            "last_used": self.last_used,
+            "guilds": dict(self.guild_hits)
+        }
+
+class TriggerStats:
+    """In-memory trigger usage counters, flushed to disk in batches"""
+
+    def __init__(self, path: str = 'data/trigger_stats.json', flush_interval: float = 60.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._usage: Dict[str, TriggerUsage] = self._load()
+        self._dirty = False
+        self._task: Optional[asyncio.Task] = None
+
+    def _load(self) -> Dict[str, TriggerUsage]:
+        """Load stored counters"""
+        try:
+            with open(self.path, 'rb') as f:
+                data = codec.loads(f.read())
+            return {name: TriggerUsage.from_dict(usage) for name, usage in data.items()}
+        except FileNotFoundError:
+            return {}
+        except (json.JSONDecodeError, AttributeError, TypeError, ValueError) as e:
+            logger.error(f"Error loading trigger stats: {str(e)}")
+            return {}
+
+    def _write(self, data: Dict[str, Dict[str, Any]]) -> bool:
+        """Write a snapshot of the counters to disk"""
+        try:
+            utils.atomic_write(self.path, codec.dumps(data))
+            return True
+        except Exception as e:
+            logger.error(f"Error saving trigger stats: {str(e)}")
+            return False
+
+    # ------ Counting ------
+
+    def record_hit(self, name: str, guild_id: Optional[int]):
+        """Count one use of a trigger; only touches memory"""
+        usage = self._usage.get(name)
+        if usage is None:
+            usage = self._usage[name] = TriggerUsage()
+
+        usage.hits += 1
+        usage.last_used = int(time.time())
+        if guild_id is not None:
+            key = str(guild_id)
+            usage.guild_hits[key] = usage.guild_hits.get(key, 0) + 1
+
+        self._dirty = True
+
+    def forget(self, name: str):
+        """Drop the counters of a deleted trigger"""
+        if self._usage.pop(name, None) is not None:
+            self._dirty = True
+
+    def forget_guild(self, guild_id) -> int:
+        """Drop one guild's share of every trigger's counters; returns how many were dropped"""
+        key = str(guild_id)
+        dropped = 0
+        for usage in self._usage.values():
+            if usage.guild_hits.pop(key, None) is not None:
+                dropped += 1
+        if dropped:
+            self._dirty = True
+        return dropped
+
+    # ------ Queries ------
+
+    def get(self, name: str) -> Optional[TriggerUsage]:
+        """Get the counters for a trigger"""
+        return self._usage.get(name)
+
+    def top(self, count: int, guild_id: Optional[int] = None) -> List[Tuple[str, int]]:
+        """Get the most used triggers, optionally counting only one guild"""
+        if guild_id is None:
+            pairs = ((name, usage.hits) for name, usage in self._usage.items())
+        else:
+            key = str(guild_id)
+            pairs = ((name, usage.guild_hits.get(key, 0)) for name, usage in self._usage.items())
+        return heapq.nlargest(count, (pair for pair in pairs if pair[1] > 0), key=lambda pair: pair[1])
+
+    def never_used(self, names: Iterable[str]) -> List[str]:
+        """Get the names that have never fired"""
+        return [name for name in names if name not in self._usage or self._usage[name].hits == 0]
+
+    # ------ Snapshots ------
+
+    def capture_snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Get the stored JSON form of all counters"""
+        return {name: usage.to_dict() for name, usage in self._usage.items()}
+
+    def install_snapshot(self, usage: Dict[str, TriggerUsage]):
+        """Replace all counters with restored ones"""
+        self._usage = dict(usage)
+        self._dirty = True
+
+    # ------ Flushing ------
+
+    def start(self):
+        """Start flushing counters in the background"""
+        if self._task is None and self.flush_interval > 0:
+            self._task = asyncio.create_task(self._run(), name="trigger-stats-flush")
+
+    async def stop(self):
+        """Stop the background flush and write out anything pending"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        """Flush loop"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self) -> bool:
+        """Write the counters to disk if anything changed since the last flush"""
+        if not self._dirty:
+            return True
+
+        # Snapshot on the loop, write in a worker thread
+        data = {name: usage.to_dict() for name, usage in self._usage.items()}
+        self._dirty = False
+        success = await asyncio.to_thread(self._write, data)
+        if not success:
+            self._dirty = True
+        return success